@@ -0,0 +1,124 @@
+"""Compare shared memory position batches with pickled dispatch of Boards.
+
+python -m benchmarks.shared_batch --positions 2000 --processes 4
+
+Both variants evaluate the same positions with the same function in a new
+process pool of the same size. The pool start is not measured, the packing
+of the batch is. The positions are the ones of the reference game and the
+FEN positions of the suite, repeated. --depth -1 only scores the material,
+which leaves mostly the cost of the dispatch.
+"""
+
+import argparse
+import pickle
+import sys
+import time
+from multiprocessing import Pool
+from typing import List, Optional, Tuple
+
+from benchmarks.suite import (
+    CHECK_FEN,
+    CHECKMATE_FEN,
+    ENDGAME_FEN,
+    MIDGAME_FEN,
+    REFERENCE_GAME,
+)
+from chess import notation
+from chess.my_types import Board
+from chess.position_batch import (
+    DEFAULT_TASK_SIZE,
+    PositionBatch,
+    PositionResult,
+    evaluate_position,
+)
+
+
+def reference_boards(count: int) -> List[Board]:
+    boards = [
+        Board.from_fen(fen)
+        for fen in [MIDGAME_FEN, CHECK_FEN, CHECKMATE_FEN, ENDGAME_FEN]
+    ]
+    board = Board(None)
+
+    for chess_notation in REFERENCE_GAME:
+        promotions, moves = notation.parse_notation(chess_notation)
+
+        for i, move in enumerate(moves):
+            notation.replay_move(board, move, promotions[i])
+            boards.append(Board.from_bytes(board.to_bytes()))
+
+    return [boards[i % len(boards)] for i in range(count)]
+
+
+def _evaluate_pickled(job: Tuple[Board, int]) -> PositionResult:
+    board, depth = job
+    return evaluate_position(board, depth)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--positions", type=int, default=2000)
+    parser.add_argument("--processes", type=int)
+    parser.add_argument("--task-size", type=int, default=DEFAULT_TASK_SIZE)
+    parser.add_argument(
+        "--depth",
+        type=int,
+        default=0,
+        help="search depth, 0: material, -1: material without legal moves",
+    )
+    args = parser.parse_args(argv)
+
+    boards = reference_boards(args.positions)
+
+    # a new pool per variant, no worker starts with a filled legal moves cache
+    with Pool(args.processes) as pool:
+        pool.map(abs, range(64))  # start all workers before measuring
+
+        start = time.perf_counter()
+        pickled_results = pool.map(
+            _evaluate_pickled,
+            [(board, args.depth) for board in boards],
+            args.task_size,
+        )
+        pickled_elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch = PositionBatch.create(boards)
+    pack_elapsed = time.perf_counter() - start
+
+    try:
+        with Pool(args.processes) as pool:
+            pool.map(abs, range(64))
+
+            start = time.perf_counter()
+            batch.evaluate(depth=args.depth, task_size=args.task_size, pool=pool)
+            shared_results = [batch.result(i) for i in range(len(batch))]
+            shared_elapsed = pack_elapsed + time.perf_counter() - start
+
+        tasks = batch.tasks(args.task_size, args.depth)
+    finally:
+        batch.close()
+
+    if shared_results != [tuple(result) for result in pickled_results]:
+        print("results differ", file=sys.stderr)
+        return 1
+
+    task_bytes = len(pickle.dumps(tasks[0]))
+    board_bytes = len(pickle.dumps(boards[0]))
+
+    print(f"positions: {args.positions}, task size: {args.task_size}")
+    print(f"pickled Board: {board_bytes} bytes, task: {task_bytes} bytes")
+    print(f"packing into shared memory: {pack_elapsed * 1000:.1f} ms")
+
+    for name, elapsed in [
+        ("pickled", pickled_elapsed),
+        ("shared memory", shared_elapsed),
+    ]:
+        rate = args.positions / elapsed
+        print(f"{name:<14} {elapsed:8.3f} sec {rate:10.1f} positions/sec")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
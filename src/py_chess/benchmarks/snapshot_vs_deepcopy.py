@@ -0,0 +1,53 @@
+"""Compare Board snapshots (to_bytes/from_bytes) with deepcopy.
+
+python -m benchmarks.snapshot_vs_deepcopy --number 200
+"""
+
+import argparse
+import sys
+import timeit
+from copy import deepcopy
+from typing import List, Optional
+
+from chess.my_types import SNAPSHOT_SIZE, Board
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--number", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    board = Board(None)
+    board.move((6, 4), (4, 4))
+    board.move((1, 4), (3, 4))
+
+    snapshot = board.to_bytes()
+    buffer = bytearray(SNAPSHOT_SIZE * 2)
+    view = memoryview(buffer)
+
+    results = {
+        "deepcopy": timeit.timeit(lambda: deepcopy(board), number=args.number),
+        "to_bytes": timeit.timeit(board.to_bytes, number=args.number),
+        "pack_into": timeit.timeit(
+            lambda: board.pack_into(view, SNAPSHOT_SIZE), number=args.number
+        ),
+        "from_bytes": timeit.timeit(
+            lambda: Board.from_bytes(snapshot), number=args.number
+        ),
+        "to_bytes + from_bytes": timeit.timeit(
+            lambda: Board.from_bytes(board.to_bytes()), number=args.number
+        ),
+    }
+
+    print(f"snapshot size: {SNAPSHOT_SIZE} bytes")
+
+    for name, total in results.items():
+        mean_us = total / args.number * 1e6
+        ratio = results["deepcopy"] / total
+        print(f"{name:<24} {mean_us:10.1f} us  {ratio:6.2f}x deepcopy")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
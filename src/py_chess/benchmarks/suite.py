@@ -0,0 +1,245 @@
+"""Time and memory benchmarks of the chess core with regression check.
+
+    python -m benchmarks.suite --output baseline.json
+    python -m benchmarks.suite --output current.json --compare baseline.json
+
+Every iteration of a case gets a fresh setup (e.g. a new board to move
+on), which is not measured. The iterations are timed without tracemalloc,
+then one more runs under tracemalloc for the peak memory. The compare mode
+flags every case whose median time or peak memory grew by more than the
+threshold and exits with 1.
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from copy import deepcopy
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from chess import logic, notation
+from chess.my_types import START_FEN, Board
+
+# setup() -> run(), only run() is measured
+Case = Callable[[], Callable[[], Any]]
+
+MIDGAME_FEN = "r1bqk2r/pppp1ppp/2n2n2/2b1p3/2B1P3/2N2N2/PPPP1PPP/R1BQK2R w KQkq - 4 5"
+CHECK_FEN = "rnb1kbnr/pppp1ppp/8/4p3/5PPq/8/PPPPP2P/RNBQKBNR w KQkq - 1 3"
+CHECKMATE_FEN = "rnb1kbnr/pppp1ppp/8/4p3/6Pq/5P2/PPPPP2P/RNBQKBNR w KQkq - 1 3"
+ENDGAME_FEN = "8/5k2/3p4/1p1Pp2p/pP2Pp1P/P4P1K/8/8 b - - 99 50"
+
+REFERENCE_GAME = [
+    "1. e2–e4 e7–e5",
+    "2. Ng1–f3 Nb8–c6",
+    "3. Bf1–c4 Bf8–c5",
+    "4. c2–c3 Ng8–f6",
+    "5. d2–d4 e5×d4",
+    "6. c3×d4 Bc5–b4",
+    "7. Nb1–c3 Nf6×e4",
+    "8. 0–0 Ne4×c3",
+    "9. b2×c3 Bb4×c3",
+    "10. Qd1–b3 d7–d5",
+    "11. Bc4×d5 0–0",
+    "12. Bd5×f7 Rf8×f7",
+]
+
+
+def board_construction() -> Callable[[], Any]:
+    return lambda: Board(None)
+
+
+def board_deepcopy() -> Callable[[], Any]:
+    board = Board.from_fen(MIDGAME_FEN)
+    return lambda: deepcopy(board)
+
+
+def board_move() -> Callable[[], Any]:
+    board = Board.from_fen(MIDGAME_FEN)
+    return lambda: board.move((7, 3), (6, 4))
+
+
+def reinitialize_threatenings() -> Callable[[], Any]:
+    return Board.from_fen(MIDGAME_FEN).reinitialize_threatenings
+
+
+def get_possible_moves(fen: str) -> Case:
+    def setup() -> Callable[[], Any]:
+        board = Board.from_fen(fen)
+        logic.legal_moves_cache.clear()
+        return lambda: logic.get_legal_moves(board, board.next_move_color)
+
+    return setup
+
+
+def checkmated_kings(fen: str) -> Case:
+    def setup() -> Callable[[], Any]:
+        board = Board.from_fen(fen)
+        logic.legal_moves_cache.clear()
+        return lambda: logic.checkmated_kings(board)
+
+    return setup
+
+
+def parse_moves() -> Callable[[], Any]:
+    # the parser behind ReplayManager._parse_move
+    tokens = [line.split()[1:] for line in REFERENCE_GAME]
+    return lambda: [notation.parse_move(move_tokens) for move_tokens in tokens]
+
+
+def replay_game() -> Callable[[], Any]:
+    logic.legal_moves_cache.clear()
+
+    def run() -> Board:
+        board = Board(None)
+
+        for chess_notation in REFERENCE_GAME:
+            promotions, moves = notation.parse_notation(chess_notation)
+
+            for i, move in enumerate(moves):
+                notation.replay_move(board, move, promotions[i])
+
+        return board
+
+    return run
+
+
+# name -> (case, iterations)
+CASES: Dict[str, Tuple[Case, int]] = {
+    "board_construction": (board_construction, 200),
+    "board_deepcopy": (board_deepcopy, 200),
+    "board_move": (board_move, 200),
+    "reinitialize_threatenings": (reinitialize_threatenings, 200),
+    "get_possible_moves_start": (get_possible_moves(START_FEN), 10),
+    "get_possible_moves_midgame": (get_possible_moves(MIDGAME_FEN), 10),
+    "get_possible_moves_check": (get_possible_moves(CHECK_FEN), 10),
+    "get_possible_moves_endgame": (get_possible_moves(ENDGAME_FEN), 10),
+    "checkmated_kings_check": (checkmated_kings(CHECK_FEN), 10),
+    "checkmated_kings_checkmate": (checkmated_kings(CHECKMATE_FEN), 10),
+    "parse_moves": (parse_moves, 1000),
+    "replay_game": (replay_game, 5),
+}
+
+
+def measure(case: Case, iterations: int) -> Dict[str, float]:
+    timings = []
+
+    for _ in range(iterations):
+        run = case()
+        start = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - start)
+
+    run = case()
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "iterations": iterations,
+        "median_us": statistics.median(timings) * 1e6,
+        "mean_us": statistics.mean(timings) * 1e6,
+        "min_us": min(timings) * 1e6,
+        "stdev_us": statistics.stdev(timings) * 1e6 if len(timings) > 1 else 0.0,
+        "peak_kib": peak / 1024,
+    }
+
+
+def run_suite(names: Optional[List[str]] = None, scale: float = 1.0) -> Dict[str, Any]:
+    results = {}
+
+    for name, (case, iterations) in CASES.items():
+        if names and name not in names:
+            continue
+
+        results[name] = measure(case, max(1, int(iterations * scale)))
+        print(
+            f"{name:<28} {results[name]['median_us']:12.1f} us "
+            f"{results[name]['peak_kib']:10.1f} KiB",
+            file=sys.stderr,
+        )
+
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "cases": results,
+    }
+
+
+def compare(
+    current: Dict[str, Any], baseline: Dict[str, Any], threshold: float
+) -> List[str]:
+    """Regressions of current against baseline, as messages."""
+
+    regressions = []
+
+    for name, result in current["cases"].items():
+        base = baseline["cases"].get(name)
+
+        if base is None:
+            continue
+
+        for key in ["median_us", "peak_kib"]:
+            if base[key] and result[key] > base[key] * (1 + threshold):
+                regressions.append(
+                    f"{name}: {key} {base[key]:.1f} -> {result[key]:.1f} "
+                    f"(+{(result[key] / base[key] - 1) * 100:.0f} %)"
+                )
+
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--compare", help="baseline JSON to compare against")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.2,
+        help="allowed relative growth of time and memory, default 0.2",
+    )
+    parser.add_argument(
+        "--scale", type=float, default=1.0, help="factor of the iterations"
+    )
+    parser.add_argument("cases", nargs="*", help="cases to run, default: all")
+    args = parser.parse_args(argv)
+
+    unknown_cases = set(args.cases) - set(CASES)
+
+    if unknown_cases:
+        parser.error(f"unknown cases {sorted(unknown_cases)}, known: {list(CASES)}")
+
+    results = run_suite(args.cases, args.scale)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf8") as f:
+            json.dump(results, f, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+
+    if args.compare:
+        with open(args.compare, encoding="utf8") as f:
+            baseline = json.load(f)
+
+        regressions = compare(results, baseline, args.threshold)
+
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+
+        if regressions:
+            return 1
+
+        print("no regressions", file=sys.stderr)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,30 @@
+"""Compile the Qt Designer .ui files into Python modules.
+
+Run once after checkout and after every change of a .ui file:
+
+    python build_ui.py
+
+The generated gui/ui/<name>_ui.py modules are picked up by gui.ui_loader and
+save parsing the .ui xml at every start of the application.
+"""
+
+import sys
+
+from gui.ui_loader import UI_DIR, compiled_module_path
+from PyQt5 import uic
+
+
+def main() -> int:
+    for ui_path in sorted(UI_DIR.glob("*.ui")):
+        py_path = compiled_module_path(ui_path.stem)
+
+        with open(py_path, "w", encoding="utf8") as f:
+            uic.compileUi(str(ui_path), f)
+
+        print(f"{ui_path.name} -> {py_path.name}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
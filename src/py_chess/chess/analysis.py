@@ -0,0 +1,140 @@
+"""Continuous analysis of positions in a separate process.
+
+The position is sent as Position value together with a generation number,
+so nothing bound to the GUI is pickled. A new position supersedes the old
+one at once: the search of the worker stops as soon as the shared latest
+generation differs from the generation it is searching.
+"""
+
+import multiprocessing
+import queue
+from typing import Any, Dict, List, Optional
+
+from chess.my_types import Board, Position
+from chess.search import Search, SearchInfo, SearchLimits, pv_to_uci
+
+# the search is stopped by a new position long before
+MAX_DEPTH = 64
+
+
+class _GenerationStop:
+    """Stop event of a search, set when a newer position arrives."""
+
+    def __init__(self, latest_generation: Any, generation: int) -> None:
+        self.latest_generation = latest_generation
+        self.generation = generation
+
+    def is_set(self) -> bool:
+        return self.latest_generation.value != self.generation
+
+    def set(self) -> None:
+        pass
+
+
+def run_analysis(
+    jobs: "multiprocessing.Queue",
+    infos: "multiprocessing.Queue",
+    latest_generation: Any,
+) -> None:
+    """Main loop of the worker process, ends with a job None."""
+
+    while True:
+        job = jobs.get()
+
+        # only the newest position is searched
+        while job is not None:
+            try:
+                job = jobs.get_nowait()
+            except queue.Empty:
+                break
+
+        if job is None:
+            return
+
+        generation, position = job
+
+        if latest_generation.value != generation:
+            continue
+
+        board = position.to_board()
+
+        def on_info(info: SearchInfo) -> None:
+            infos.put(
+                (
+                    generation,
+                    {
+                        "depth": info.depth,
+                        "score": info.score,
+                        "mate_in": info.mate_in,
+                        "nodes": info.nodes,
+                        "nps": info.nps,
+                        "pv": pv_to_uci(board, info.pv),
+                        "color": board.next_move_color,
+                    },
+                )
+            )
+
+        Search(
+            board,
+            SearchLimits(depth=MAX_DEPTH),
+            on_info,
+            _GenerationStop(latest_generation, generation),  # type: ignore
+        ).run()
+
+
+class AnalysisWorker:
+    """Owns the analysis process, used from the GUI thread.
+
+    Nothing of the search runs in the calling process, analyse() and poll()
+    only pass snapshots and results through queues.
+    """
+
+    def __init__(self) -> None:
+        # spawn: the worker must not inherit the state of the Qt application
+        context = multiprocessing.get_context("spawn")
+
+        self.generation = 0
+        self.latest_generation = context.Value("q", 0, lock=False)
+        self.jobs = context.Queue()
+        self.infos = context.Queue()
+        self.process = context.Process(
+            target=run_analysis,
+            args=(self.jobs, self.infos, self.latest_generation),
+            daemon=True,
+        )
+        self.process.start()
+
+    def analyse(self, board: Board) -> None:
+        """Cancel the running search and search board."""
+
+        self.generation += 1
+        self.latest_generation.value = self.generation
+        self.jobs.put((self.generation, Position.from_board(board)))
+
+    def cancel(self) -> None:
+        self.generation += 1
+        self.latest_generation.value = self.generation
+
+    def poll(self) -> List[Dict[str, Any]]:
+        """Infos of the current position received since the last poll."""
+
+        infos = []
+
+        while True:
+            try:
+                generation, info = self.infos.get_nowait()
+            except queue.Empty:
+                break
+
+            if generation == self.generation:
+                infos.append(info)
+
+        return infos
+
+    def close(self, timeout: Optional[float] = 1.0) -> None:
+        self.cancel()
+        self.jobs.put(None)
+        self.process.join(timeout)
+
+        if self.process.is_alive():
+            self.process.terminate()
@@ -0,0 +1,403 @@
+"""Attack maps, checks and move counts of many positions at once in NumPy.
+
+A BoardBatch holds N positions as arrays:
+    codes          (N, 64) int8, piece code per square (PIECE_CODES without
+                   the promoted flag), square i * 8 + j, row 0 is rank 8
+    black_to_move  (N,) bool
+    castling       (N,) uint8, CASTLING_* bits of the castling rights
+    en_passant     (N,) int8, square passed by a last two step move, else -1
+
+The functions work on whole chunks of positions with array operations: the
+knight, king and pawn attacks are products with per square attack tables,
+the slider attacks and moves look for the first occupied square of every ray
+in shifted views of the boards. chess.logic.to_board_batch() converts
+Boards, BoardBatch.from_snapshots() packed snapshots without Boards.
+
+    batch = BoardBatch.from_boards(boards)
+    attacks = attack_masks(batch)
+    checks = in_check(batch, attacks)
+    counts = pseudo_legal_move_counts(batch)
+    attacks, checks, counts = analyse(batch)  # all three in one pass
+
+Move counts are (from, to) pairs like in chess.logic: a promotion counts once
+and castling counts as one king move.
+"""
+
+from dataclasses import dataclass
+from typing import Iterable, Iterator, Optional, Tuple, Union
+
+import numpy as np
+
+from chess.my_types import (
+    PIECE_CODE_BLACK,
+    PIECE_CODE_PROMOTED,
+    SNAPSHOT_BLACK_TO_MOVE,
+    SNAPSHOT_SIZE,
+    Board,
+)
+
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = range(1, 7)
+
+CASTLING_WHITE_KINGSIDE = 1
+CASTLING_WHITE_QUEENSIDE = 2
+CASTLING_BLACK_KINGSIDE = 4
+CASTLING_BLACK_QUEENSIDE = 8
+
+# positions computed at once, bounds the memory of the ray lookups
+CHUNK_SIZE = 4096
+
+SNAPSHOT_DTYPE = np.dtype(
+    [
+        ("placement", "u1", (64,)),
+        ("moved", "<u8"),
+        ("flags", "u1"),
+        ("two_step_from", "u1"),
+        ("two_step_to", "u1"),
+        ("halfmove_clock", "u1"),
+    ]
+)
+assert SNAPSHOT_DTYPE.itemsize == SNAPSHOT_SIZE
+
+# orthogonal directions first, then the diagonal ones
+DIRECTIONS = [(-1, 0), (1, 0), (0, -1), (0, 1), (-1, -1), (-1, 1), (1, -1), (1, 1)]
+SLIDERS = [(ROOK, QUEEN)] * 4 + [(BISHOP, QUEEN)] * 4
+
+# code beyond the rays, an occupied square which is no piece
+RAY_END = 7
+
+# castling bit, king square, squares to be empty, squares not attacked
+CASTLINGS = [
+    (CASTLING_WHITE_KINGSIDE, 60, [61, 62], [60, 61, 62]),
+    (CASTLING_WHITE_QUEENSIDE, 60, [57, 58, 59], [58, 59, 60]),
+    (CASTLING_BLACK_KINGSIDE, 4, [5, 6], [4, 5, 6]),
+    (CASTLING_BLACK_QUEENSIDE, 4, [1, 2, 3], [2, 3, 4]),
+]
+# castling bit, king square, rook square
+CASTLING_ROOKS = [
+    (CASTLING_WHITE_KINGSIDE, 60, 63),
+    (CASTLING_WHITE_QUEENSIDE, 60, 56),
+    (CASTLING_BLACK_KINGSIDE, 4, 7),
+    (CASTLING_BLACK_QUEENSIDE, 4, 0),
+]
+
+FEN_LETTERS = " PNBRQK  pnbrqk"
+
+
+def _step_table(steps: Iterable[Tuple[int, int]]) -> np.ndarray:
+    table = np.zeros((64, 64), dtype=np.float32)
+
+    for i in range(8):
+        for j in range(8):
+            for di, dj in steps:
+                if 0 <= i + di < 8 and 0 <= j + dj < 8:
+                    table[i * 8 + j, (i + di) * 8 + j + dj] = 1
+
+    return table
+
+
+KNIGHT_ATTACKS = _step_table(
+    [(-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1)]
+)
+KING_ATTACKS = _step_table(DIRECTIONS)
+# white pawns attack towards row 0, black ones towards row 7
+PAWN_ATTACKS = [_step_table([(-1, -1), (-1, 1)]), _step_table([(1, -1), (1, 1)])]
+
+
+@dataclass
+class BoardBatch:
+    codes: np.ndarray
+    black_to_move: np.ndarray
+    castling: np.ndarray
+    en_passant: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    @classmethod
+    def from_snapshots(
+        cls, data: Union[bytes, bytearray, memoryview], count: Optional[int] = None
+    ) -> "BoardBatch":
+        """Batch of snapshots written back to back by Board.pack_into(),
+        e.g. the positions of a PositionBatch, without creating Boards."""
+
+        snapshots = np.frombuffer(data, dtype=SNAPSHOT_DTYPE, count=count or -1)
+        placement = snapshots["placement"] & np.uint8(0xFF ^ PIECE_CODE_PROMOTED)
+        codes = placement.astype(np.int8)
+        moved = snapshots["moved"]
+
+        castling = np.zeros(len(snapshots), dtype=np.uint8)
+
+        for bit, king_square, rook_square in CASTLING_ROOKS:
+            black = PIECE_CODE_BLACK if king_square < 8 else 0
+            moved_pieces = (moved >> np.uint64(king_square)) | (
+                moved >> np.uint64(rook_square)
+            )
+            unmoved = moved_pieces & np.uint64(1) == 0
+            castling |= np.where(
+                (codes[:, king_square] == KING | black)
+                & (codes[:, rook_square] == ROOK | black)
+                & unmoved,
+                np.uint8(bit),
+                np.uint8(0),
+            )
+
+        two_step_from = snapshots["two_step_from"].astype(np.int16)
+        two_step_to = snapshots["two_step_to"].astype(np.int16)
+        en_passant = np.where(
+            two_step_to > 0, (two_step_from + two_step_to - 2) // 2, -1
+        ).astype(np.int8)
+
+        return cls(
+            codes,
+            snapshots["flags"] & SNAPSHOT_BLACK_TO_MOVE != 0,
+            castling,
+            en_passant,
+        )
+
+    @classmethod
+    def from_boards(cls, boards: Iterable[Board]) -> "BoardBatch":
+        buffer = bytearray()
+
+        for board in boards:
+            buffer += board.to_bytes()
+
+        return cls.from_snapshots(buffer)
+
+    def fen(self, index: int) -> str:
+        """FEN of a position, without halfmove clock and move number."""
+
+        rows = []
+
+        for row in self.codes[index].reshape(8, 8).tolist():
+            text = ""
+            empty = 0
+
+            for code in row:
+                if code == 0:
+                    empty += 1
+                    continue
+
+                if empty:
+                    text += str(empty)
+                    empty = 0
+
+                text += FEN_LETTERS[code]
+
+            rows.append(text + (str(empty) if empty else ""))
+
+        castling = int(self.castling[index])
+        rights = "".join(
+            letter for bit, letter in zip([1, 2, 4, 8], "KQkq") if castling & bit
+        )
+        en_passant = int(self.en_passant[index])
+        target = (
+            "abcdefgh"[en_passant % 8] + str(8 - en_passant // 8)
+            if en_passant >= 0
+            else "-"
+        )
+        color = "b" if self.black_to_move[index] else "w"
+
+        return f"{'/'.join(rows)} {color} {rights or '-'} {target}"
+
+    def board(self, index: int) -> Board:
+        return Board.from_fen(self.fen(index))
+
+    def chunks(self, size: int = CHUNK_SIZE) -> Iterator["BoardBatch"]:
+        for start in range(0, len(self), size):
+            stop = start + size
+            yield BoardBatch(
+                self.codes[start:stop],
+                self.black_to_move[start:stop],
+                self.castling[start:stop],
+                self.en_passant[start:stop],
+            )
+
+
+def _first_blockers(codes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Per direction and square the empty squares before the first occupied
+    one of the ray and its code, RAY_END at the edge, shape (8, N, 64)."""
+
+    # the board framed by RAY_END, a step along a ray is a shifted view
+    grid = np.full((len(codes), 24, 24), RAY_END, dtype=np.int8)
+    grid[:, 8:16, 8:16] = codes.reshape(-1, 8, 8)
+    first = np.zeros((len(DIRECTIONS), len(codes), 8, 8), dtype=np.int8)
+    blockers = np.empty_like(first)
+
+    for d, (di, dj) in enumerate(DIRECTIONS):
+        for k in range(1, 9):
+            top = 8 + k * di
+            bottom = top + 8
+            left = 8 + k * dj
+            right = left + 8
+            step = grid[:, top:bottom, left:right]
+
+            if k == 1:
+                blockers[d] = step
+                continue
+
+            empty = blockers[d] == 0
+
+            if not empty.any():
+                break
+
+            first[d] += empty
+            np.copyto(blockers[d], step, where=empty)
+
+    return first.reshape(len(DIRECTIONS), -1, 64), blockers.reshape(
+        len(DIRECTIONS), -1, 64
+    )
+
+
+def _is_color(codes: np.ndarray, black: Union[bool, np.ndarray]) -> np.ndarray:
+    black_bits = np.where(black, PIECE_CODE_BLACK, 0)
+    return (
+        (codes != 0) & (codes != RAY_END) & ((codes & PIECE_CODE_BLACK) == black_bits)
+    )
+
+
+def _attacks(codes: np.ndarray, blockers: np.ndarray) -> np.ndarray:
+    attacks = np.zeros((len(codes), 2, 64), dtype=bool)
+
+    for color, black in enumerate([0, PIECE_CODE_BLACK]):
+        attacked = (codes == PAWN | black).astype(np.float32) @ PAWN_ATTACKS[color]
+        attacked += (codes == KNIGHT | black).astype(np.float32) @ KNIGHT_ATTACKS
+        attacked += (codes == KING | black).astype(np.float32) @ KING_ATTACKS
+        by_slider = np.zeros(codes.shape, dtype=bool)
+
+        for d, pieces in enumerate(SLIDERS):
+            for piece in pieces:
+                by_slider |= blockers[d] == piece | black
+
+        attacks[:, color] = (attacked > 0) | by_slider
+
+    return attacks
+
+
+def _in_check(codes: np.ndarray, black: np.ndarray, attacks: np.ndarray) -> np.ndarray:
+    king_code = np.where(black, KING | PIECE_CODE_BLACK, KING)[:, None]
+    # attacked by the other side
+    enemy_attacks = attacks[np.arange(len(codes)), 1 - black.astype(int)]
+
+    return ((codes == king_code) & enemy_attacks).any(axis=1)
+
+
+def _pawn_move_counts(
+    codes: np.ndarray, black: np.ndarray, en_passant: np.ndarray
+) -> np.ndarray:
+    own_pawn = np.where(black, PAWN | PIECE_CODE_BLACK, PAWN)[:, None]
+    pawns = (codes == own_pawn).reshape(-1, 8, 8)
+    empty = (codes == 0).reshape(-1, 8, 8)
+    enemies = _is_color(codes, ~black[:, None])
+    rows = np.arange(len(codes))
+    has_target = en_passant >= 0
+    enemies[rows[has_target], en_passant[has_target]] = True
+    enemies = enemies.reshape(-1, 8, 8)
+
+    # black moves towards row 7, flipped it moves like white towards row 0
+    pawns[black] = pawns[black, ::-1]
+    empty[black] = empty[black, ::-1]
+    enemies[black] = enemies[black, ::-1]
+
+    pawns_ahead = pawns[:, 1:]
+    empty_ahead = empty[:, :-1]
+    enemies_ahead = enemies[:, :-1]
+
+    counts = (pawns_ahead & empty_ahead).sum(axis=(1, 2))
+    counts += (pawns[:, 6] & empty[:, 5] & empty[:, 4]).sum(axis=1)
+    counts += (pawns_ahead[:, :, 1:] & enemies_ahead[:, :, :-1]).sum(axis=(1, 2))
+    counts += (pawns_ahead[:, :, :-1] & enemies_ahead[:, :, 1:]).sum(axis=(1, 2))
+
+    return counts
+
+
+def _move_counts(
+    chunk: BoardBatch, first: np.ndarray, blockers: np.ndarray, attacks: np.ndarray
+) -> np.ndarray:
+    codes = chunk.codes
+    black = chunk.black_to_move
+    black_bits = np.where(black, PIECE_CODE_BLACK, 0)[:, None]
+    own = _is_color(codes, black[:, None])
+    not_own = (~own).astype(np.float32)
+
+    counts = _pawn_move_counts(codes, black, chunk.en_passant)
+
+    for piece, table in [(KNIGHT, KNIGHT_ATTACKS), (KING, KING_ATTACKS)]:
+        targets = (codes == piece | black_bits).astype(np.float32) @ table
+        counts += (targets * not_own).sum(axis=1).astype(counts.dtype)
+
+    piece_types = np.where(own, codes & 7, 0)
+    # moves along a ray: the empty squares and a capture of its blocker
+    ray_moves = first + _is_color(blockers, ~black[:, None])
+
+    for pieces, rays in [
+        ((ROOK, QUEEN), ray_moves[:4]),
+        ((BISHOP, QUEEN), ray_moves[4:]),
+    ]:
+        sliders = (piece_types == pieces[0]) | (piece_types == pieces[1])
+        counts += (rays * sliders).sum(axis=(0, 2))
+
+    enemy_attacks = attacks[np.arange(len(codes)), 1 - black.astype(int)]
+
+    for bit, king_square, empty_squares, safe_squares in CASTLINGS:
+        counts += (
+            (chunk.castling & bit != 0)
+            & (codes[:, empty_squares] == 0).all(axis=1)
+            & ~enemy_attacks[:, safe_squares].any(axis=1)
+            & (black == (king_square < 8))
+        )
+
+    return counts
+
+
+def analyse(batch: BoardBatch) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """attack_masks(), in_check() and pseudo_legal_move_counts() in one pass
+    over the rays."""
+
+    attacks = []
+    checks = []
+    counts = []
+
+    for chunk in batch.chunks():
+        first, blockers = _first_blockers(chunk.codes)
+        chunk_attacks = _attacks(chunk.codes, blockers)
+        attacks.append(chunk_attacks)
+        checks.append(_in_check(chunk.codes, chunk.black_to_move, chunk_attacks))
+        counts.append(_move_counts(chunk, first, blockers, chunk_attacks))
+
+    if not attacks:
+        return np.zeros((0, 2, 64), bool), np.zeros(0, bool), np.zeros(0, np.int32)
+
+    return (
+        np.concatenate(attacks),
+        np.concatenate(checks),
+        np.concatenate(counts).astype(np.int32),
+    )
+
+
+def attack_masks(batch: BoardBatch) -> np.ndarray:
+    """(N, 2, 64) bool, the squares attacked by white [:, 0] and black [:, 1].
+
+    Unlike Square.threatened_by, which holds the squares a piece can move
+    to, the masks include defended pieces and the squares diagonal to pawns.
+    """
+
+    attacks = [
+        _attacks(chunk.codes, _first_blockers(chunk.codes)[1])
+        for chunk in batch.chunks()
+    ]
+
+    return np.concatenate(attacks) if attacks else np.zeros((0, 2, 64), bool)
+
+
+def in_check(batch: BoardBatch, attacks: Optional[np.ndarray] = None) -> np.ndarray:
+    """(N,) bool, the king of the side to move is attacked."""
+
+    attacks = attack_masks(batch) if attacks is None else attacks
+    return _in_check(batch.codes, batch.black_to_move, attacks)
+
+
+def pseudo_legal_move_counts(batch: BoardBatch) -> np.ndarray:
+    """(N,) int32, moves of the side to move which may leave its king in
+    check; castling needs the king and the passed squares unattacked."""
+
+    return analyse(batch)[2]
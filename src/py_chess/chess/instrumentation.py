@@ -0,0 +1,196 @@
+"""Opt-in counters and timers for the hot paths of the chess core.
+
+Instrumentation is off by default and an instrumented function is then the
+undecorated one, without any overhead. Switch it on with the environment
+variable PYCHESS_INSTRUMENT=1 or with enable(), which puts the counting
+wrappers in place of the functions in their modules and classes.
+
+Timings are inclusive: the time of reinitialize_threatenings contains the
+time of the move generation it calls.
+"""
+
+import functools
+import logging
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypeVar
+
+INSTRUMENT_ENV = "PYCHESS_INSTRUMENT"
+LOG_LEVEL_ENV = "PYCHESS_LOG_LEVEL"
+
+MOVE_GENERATION = "move_generation"
+CLONE = "clone"
+REINITIALIZE_THREATENINGS = "reinitialize_threatenings"
+LEGALITY_CHECK = "legality_check"
+CHECKMATE_DETECTION = "checkmate_detection"
+
+logger = logging.getLogger(__name__)
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+_enabled = bool(os.environ.get(INSTRUMENT_ENV))
+_counters: Dict[str, int] = defaultdict(int)
+_timings: Dict[str, float] = defaultdict(float)
+# instrumented functions and their counting wrappers
+_instrumented: List[Tuple[Callable[..., Any], Callable[..., Any]]] = []
+
+
+def _install(func: Callable[..., Any], replacement: Callable[..., Any]) -> None:
+    """Replace func by replacement in its module or class."""
+
+    owner: Any = sys.modules[func.__module__]
+
+    for name in func.__qualname__.split(".")[:-1]:
+        owner = getattr(owner, name)
+
+    setattr(owner, func.__name__, replacement)
+
+
+def enable() -> None:
+    global _enabled
+    _enabled = True
+
+    for func, wrapper in _instrumented:
+        _install(func, wrapper)
+
+
+def disable() -> None:
+    global _enabled
+    _enabled = False
+
+    for func, _ in _instrumented:
+        _install(func, func)
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def reset() -> None:
+    _counters.clear()
+    _timings.clear()
+
+
+def instrumented(name: str) -> Callable[[F], F]:
+    """Count the calls of the decorated function and sum up its run time.
+
+    Only module level functions and methods of module level classes can be
+    instrumented, enable() looks them up by their qualified name.
+    """
+
+    def decorator(func: F) -> F:
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                _timings[name] += time.perf_counter() - start
+                _counters[name] += 1
+
+        _instrumented.append((func, wrapper))
+
+        return wrapper if _enabled else func  # type: ignore
+
+    return decorator
+
+
+def report() -> Dict[str, Dict[str, float]]:
+    return {
+        name: {
+            "calls": _counters[name],
+            "total_ms": _timings[name] * 1000,
+            "mean_us": (
+                _timings[name] / _counters[name] * 1e6 if _counters[name] else 0.0
+            ),
+        }
+        for name in sorted(_counters)
+    }
+
+
+def log_report() -> None:
+    for name, values in report().items():
+        logger.info(
+            "instrumentation name=%s calls=%d total_ms=%.3f mean_us=%.3f",
+            name,
+            values["calls"],
+            values["total_ms"],
+            values["mean_us"],
+        )
+
+
+def configure_logging(level: Optional[str] = None) -> None:
+    """Log the chess core as "key=value" lines to stderr.
+
+    The level defaults to PYCHESS_LOG_LEVEL or WARNING.
+    """
+
+    level = level or os.environ.get(LOG_LEVEL_ENV, "WARNING")
+
+    handler = logging.StreamHandler()
+    handler.setFormatter(
+        logging.Formatter(
+            "time=%(asctime)s level=%(levelname)s logger=%(name)s %(message)s"
+        )
+    )
+
+    chess_logger = logging.getLogger("chess")
+    chess_logger.addHandler(handler)
+    chess_logger.setLevel(level.upper())
+
+
+class StackSampler:
+    """Samples the stack of one thread and writes collapsed stacks.
+
+    The output ("frame;frame;frame count" per line) is the input format of
+    flamegraph.pl, speedscope and inferno.
+    """
+
+    def __init__(self, interval_in_sec: float = 0.001) -> None:
+        self.interval_in_sec = interval_in_sec
+        self.stacks: Dict[str, int] = defaultdict(int)
+        self._thread_id = threading.get_ident()
+        self._stop = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+
+    def __enter__(self) -> "StackSampler":
+        self.start()
+        return self
+
+    def __exit__(self, *_: Any) -> None:
+        self.stop()
+
+    def start(self) -> None:
+        self._thread_id = threading.get_ident()
+        self._stop.clear()
+        self._sampler = threading.Thread(target=self._run, daemon=True)
+        self._sampler.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+        if self._sampler is not None:
+            self._sampler.join()
+            self._sampler = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_in_sec):
+            frame = sys._current_frames().get(self._thread_id)
+            frames = []
+
+            while frame is not None:
+                code = frame.f_code
+                file_name = os.path.basename(code.co_filename)
+                frames.append(f"{code.co_name} ({file_name}:{code.co_firstlineno})")
+                frame = frame.f_back
+
+            if frames:
+                self.stacks[";".join(reversed(frames))] += 1
+
+    def write(self, path: str) -> None:
+        with open(path, "w", encoding="utf8") as f:
+            for stack, samples in sorted(self.stacks.items()):
+                f.write(f"{stack} {samples}\n")
@@ -1,7 +1,31 @@
+import logging
 from copy import deepcopy
-from typing import List, Optional, Tuple
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional, Tuple
 
-from chess.my_types import Board, GameState, Piece, Square, MoveType
+from chess import instrumentation
+from chess.instrumentation import instrumented
+from chess.my_types import (
+    Board,
+    GameState,
+    LegalMovesCache,
+    MoveType,
+    Piece,
+    Square,
+)
+
+if TYPE_CHECKING:
+    from chess.board_batch import BoardBatch
+
+logger = logging.getLogger(__name__)
+
+# symbols per color in the order of the material signature
+MATERIAL_LETTERS = {
+    "white": {"♔": "K", "♕": "Q", "♖": "R", "♗": "B", "♘": "N", "♙": "P"},
+    "black": {"♚": "k", "♛": "q", "♜": "r", "♝": "b", "♞": "n", "♟": "p"},
+}
+
+# shared between all boards, keyed by Board.position_key()
+legal_moves_cache = LegalMovesCache(maxsize=4096)
 
 
 def is_collision_free_move(
@@ -10,8 +34,8 @@ def is_collision_free_move(
     return board.is_collision_free_move(attacker_piece, threatened_square)
 
 
-def threatened_by_enemy(square: Square, piece: Piece) -> bool:
-    return Board.threatened_by_enemy(square, piece)
+def threatened_by_enemy(board: Board, square: Square, piece: Piece) -> bool:
+    return board.threatened_by_enemy(square, piece)
 
 
 def get_square(board: Board, i: int, j: int) -> Square:
@@ -23,25 +47,91 @@ def get_piece(board: Board, i: int, j: int) -> Optional[Piece]:
 
 
 def get_captured_pieces(board: Board, player_color: str) -> List[Piece]:
-    if player_color == "black":
-        return [piece for piece in board.player[0].pieces if piece.captured]
-    else:
-        return [piece for piece in board.player[1].pieces if piece.captured]
+    """Captured pieces in the order of capture."""
+
+    return list(board.get_player(player_color).captured_pieces)
 
 
 def get_active_pieces(board: Board, player_color: str) -> List[Piece]:
-    if player_color == "black":
-        return [piece for piece in board.player[0].pieces if not piece.captured]
-    else:
-        return [piece for piece in board.player[1].pieces if not piece.captured]
+    return list(board.get_player(player_color).active_pieces)
+
+
+def get_active_pieces_by_symbol(board: Board, symbol: str) -> List[Piece]:
+    color = "white" if symbol in MATERIAL_LETTERS["white"] else "black"
+    return list(board.get_player(color).active_pieces_by_symbol[symbol])
+
+
+def get_material_balance(board: Board) -> int:
+    """Material of white minus material of black, in pawns."""
+
+    return board.material_balance
 
 
+def get_material_signature(board: Board) -> str:
+    """Pieces on the board as letters, e.g. "KQRRBBNNPPPPPPPP/kqrrbbnnpppppppp"."""
+
+    return "/".join(
+        "".join(
+            letter * board.material_counts[symbol] for symbol, letter in letters.items()
+        )
+        for letters in MATERIAL_LETTERS.values()
+    )
+
+
+def get_legal_moves_cache_stats() -> Dict[str, int]:
+    return legal_moves_cache.stats()
+
+
+@instrumented(instrumentation.LEGALITY_CHECK)
 def get_possible_moves(board: Board, piece: Piece) -> List[Tuple[int, int]]:
+    return list(iter_possible_moves(board, piece))
+
+
+def iter_possible_moves(
+    board: Board, piece: Optional[Piece]
+) -> Iterator[Tuple[int, int]]:
+    """Legal moves of piece, checked one at a time while iterating.
+
+    Stopping early skips the checks of the remaining moves. Only a complete
+    iteration fills the legal moves cache.
+    """
+
     if piece is None:
-        return []
+        return
+
+    position_key = board.position_key()
+    cached_moves = legal_moves_cache.get(position_key, piece.position)
+
+    if cached_moves is not None:
+        yield from cached_moves
+        return
 
+    possible_moves = []
+
+    for possible_move in _iter_possible_moves(board, piece):
+        possible_moves.append(possible_move)
+        yield possible_move
+
+    legal_moves_cache.put(position_key, piece.position, possible_moves)
+
+
+def has_possible_move(board: Board, piece: Optional[Piece]) -> bool:
+    return next(iter_possible_moves(board, piece), None) is not None
+
+
+def _get_king_threatenings(board: Board, king: Piece) -> List[str]:
+    enemy_color = "white" if king.get_color() == "black" else "black"
+    king_threatenings = [
+        threatener_piece.symbol
+        for threatener_piece in board.attackers_of(king.position, enemy_color)
+    ]
+
+    king_threatenings.sort()
+    return king_threatenings
+
+
+def _iter_possible_moves(board: Board, piece: Piece) -> Iterator[Tuple[int, int]]:
     possible_moves = board._get_possible_moves(piece)
-    king_in_check_positions: List[Tuple[int, int]] = []
 
     if piece.symbol in ["♚", "♔"]:
         king_pos = piece.position
@@ -57,74 +147,109 @@ def get_possible_moves(board: Board, piece: Piece) -> List[Tuple[int, int]]:
                 to_square = cloned_board.get_square(pos_i, pos_j)
 
                 if cloned_board.threatened_by_enemy(to_square, piece):
-                    king_in_check_positions.append(possible_move)
-    else:
-        possible_rescuing_moves_for_king = []
+                    continue
+
+            yield possible_move
 
+        return
+
+    # simulate one move and compare the threatenings of the own king:
+    # - changed and none left: the move rescues the king from check
+    # - changed and some left: the move leads the own king into check
+    # - unchanged: allowed if the king is not in check or can not be rescued
+    color = piece.get_color()
+    king = board.king_black_piece if color == "black" else board.king_white_piece
+    king_threatenings = _get_king_threatenings(board, king)
+
+    def simulated_moves() -> Iterator[Tuple[Tuple[int, int], List[str]]]:
         for possible_move in possible_moves:
             cloned_board = deepcopy(board)
-
-            color = piece.get_color()
-            king = (
+            cloned_king = (
                 cloned_board.king_black_piece
                 if color == "black"
                 else cloned_board.king_white_piece
             )
 
-            king_threatenings = [
-                threatener_piece.symbol
-                for threatener_piece in cloned_board.get_square(
-                    *king.position
-                ).threatened_by
-                if king.get_color() != threatener_piece.get_color()
-            ]
+            cloned_board.move(piece.position, possible_move)
 
-            king_threatenings.sort()
+            yield possible_move, _get_king_threatenings(cloned_board, cloned_king)
 
-            cloned_board.move(piece.position, possible_move)
+    simulations: Iterable[Tuple[Tuple[int, int], List[str]]] = simulated_moves()
 
-            new_king_threatenings = [
-                threatener_piece.symbol
-                for threatener_piece in cloned_board.get_square(
-                    *king.position
-                ).threatened_by
-                if king.get_color() != threatener_piece.get_color()
-            ]
+    if len(king_threatenings) > 1:
+        # one move into another check forbids all moves, so all are simulated
+        simulations = list(simulations)
 
-            new_king_threatenings.sort()
+        if any(
+            new_king_threatenings and new_king_threatenings != king_threatenings
+            for _, new_king_threatenings in simulations
+        ):
+            logger.debug("double check, no rescuing move piece=%s", piece.name)
+            return
 
-            if king_threatenings != new_king_threatenings and new_king_threatenings:
-                if len(king_threatenings) > 1:
-                    print("Schach matt?")
-                    return []
+    unchanged_moves = []
+    can_rescue_the_king = False
 
-                king_in_check_positions.append(possible_move)
-            elif (
-                king_threatenings != new_king_threatenings and not new_king_threatenings
-            ):
-                possible_rescuing_moves_for_king.append(possible_move)
-                # return [possible_move]
-
-        if possible_rescuing_moves_for_king:
-            return possible_rescuing_moves_for_king
-
-        # simulate only one move and check if own king get into check position/state
-        # 1. get current moving color
-        # 2. get current list of threatenings of own king
-        # 3. one move of possible moves
-        # 4. get current list of threatenings of own king
-        # 5. compare the two threatening lists
-        # 5.1 if different & new list >= 1 -> move leads own king in check state
-        # 5.2 is list is equal -> no problemo! :)
-
-    return [
-        possible_move
-        for possible_move in possible_moves
-        if possible_move not in king_in_check_positions
-    ]
+    for possible_move, new_king_threatenings in simulations:
+        if new_king_threatenings == king_threatenings:
+            if king_threatenings:
+                unchanged_moves.append(possible_move)
+            else:
+                yield possible_move
+        elif not new_king_threatenings:
+            can_rescue_the_king = True
+            yield possible_move
+
+    if not can_rescue_the_king:
+        yield from unchanged_moves
+
+
+def get_legal_moves(
+    board: Board, player_color: str
+) -> Dict[Tuple[int, int], List[Tuple[int, int]]]:
+    legal_moves = {}
 
+    for piece in get_active_pieces(board, player_color):
+        possible_moves = get_possible_moves(board, piece)
+
+        if possible_moves:
+            legal_moves[piece.position] = possible_moves
+
+    return legal_moves
+
+
+def iter_legal_moves(
+    board: Board, player_color: str
+) -> Iterator[Tuple[Tuple[int, int], Tuple[int, int]]]:
+    """(from_pos, to_pos) of all legal moves, produced lazily."""
+
+    for piece in get_active_pieces(board, player_color):
+        from_pos = piece.position
+
+        for to_pos in iter_possible_moves(board, piece):
+            yield from_pos, to_pos
+
+
+def has_legal_move(board: Board, player_color: str) -> bool:
+    return next(iter_legal_moves(board, player_color), None) is not None
+
+
+def count_legal_moves(board: Board, player_color: str) -> int:
+    return sum(1 for _ in iter_legal_moves(board, player_color))
+
+
+def move(board: Board, from_pos: Tuple[int, int], to_pos: Tuple[int, int]) -> GameState:
+    """apply_move() followed by get_game_state(), for a move of the game."""
+
+    apply_move(board, from_pos, to_pos)
+    return get_game_state(board)
+
+
+def apply_move(
+    board: Board, from_pos: Tuple[int, int], to_pos: Tuple[int, int]
+) -> None:
+    """Move without evaluating the game state, see get_game_state()."""
 
-def move(board: Board, from_pos: Tuple[int, int], to_pos: Tuple[int, int]) -> None:
     attacker_piece_i, attacker_piece_j = from_pos
     threatened_square_i, threatened_square_j = to_pos
 
@@ -168,80 +293,91 @@ def move(board: Board, from_pos: Tuple[int, int], to_pos: Tuple[int, int]) -> No
     else:
         board.move(from_pos, to_pos)
 
+
+def get_game_state(board: Board) -> GameState:
     if checkmated_kings(board):
         if board.next_move_color == "black":
             return GameState.CHECKMATE_BLACK
         else:
             return GameState.CHECKMATE_WHITE
 
+    if board.is_draw():
+        logger.debug(
+            "draw repetition=%s fifty_move_rule=%s insufficient_material=%s",
+            board.is_threefold_repetition(),
+            board.is_fifty_move_rule(),
+            board.is_insufficient_material(),
+        )
+        return GameState.REMIS
+
     return GameState.CONTINUE
 
 
+@instrumented(instrumentation.CHECKMATE_DETECTION)
 def checkmated_kings(board: Board) -> bool:
-    # check if one of the kings are in check/mate/checkmate
-    if board.next_move_color == "black":
-        black_king = board.king_black_piece
-        black_king_square = board.get_square(*black_king.position)
-
-        if board.threatened_by_enemy(black_king_square, black_king):
-            kings_possible_moves = get_possible_moves(board, black_king)
-
-            if not kings_possible_moves:
-                active_black_pieces = get_active_pieces(board, "black")
-                can_rescue_the_king = False
-
-                for piece in active_black_pieces:
-                    for possible_move in get_possible_moves(board, piece):
-                        cloned_board = deepcopy(board)
-                        cloned_black_king = cloned_board.king_black_piece
-                        cloned_black_king_square = cloned_board.get_square(
-                            *cloned_black_king.position
-                        )
-
-                        move(cloned_board, piece.position, possible_move)
-
-                        if not cloned_board.threatened_by_enemy(
-                            cloned_black_king_square, cloned_black_king
-                        ):
-                            can_rescue_the_king = True
-                            break
-                    if can_rescue_the_king:
-                        break
-
-                if not can_rescue_the_king:
-                    print("Schach matt...")
-                    return True
-    else:
-        white_king = board.king_white_piece
-        white_king_square = board.get_square(*white_king.position)
-
-        if board.threatened_by_enemy(white_king_square, white_king):
-            kings_possible_moves = get_possible_moves(board, white_king)
-
-            if not kings_possible_moves:
-                active_white_pieces = get_active_pieces(board, "white")
-                can_rescue_the_king = False
-
-                for piece in active_white_pieces:
-                    for possible_move in get_possible_moves(board, piece):
-                        cloned_board = deepcopy(board)
-                        cloned_white_king = cloned_board.king_white_piece
-                        cloned_white_king_square = cloned_board.get_square(
-                            *cloned_white_king.position
-                        )
-
-                        move(cloned_board, piece.position, possible_move)
-
-                        if not cloned_board.threatened_by_enemy(
-                            cloned_white_king_square, cloned_white_king
-                        ):
-                            can_rescue_the_king = True
-                            break
-                    if can_rescue_the_king:
-                        break
-
-                if not can_rescue_the_king:
-                    print("Schach matt...")
-                    return True
-
-    return False
+    """Whether the king of the color to move is checkmated.
+
+    The rescuing moves are only applied to clones, see apply_move(), so no
+    nested game state is evaluated.
+    """
+
+    color = board.next_move_color
+    king = board.king_black_piece if color == "black" else board.king_white_piece
+    king_square = board.get_square(*king.position)
+
+    if not board.threatened_by_enemy(king_square, king):
+        return False
+
+    if has_possible_move(board, king):
+        return False
+
+    for piece in get_active_pieces(board, color):
+        for possible_move in iter_possible_moves(board, piece):
+            cloned_board = deepcopy(board)
+            cloned_king = (
+                cloned_board.king_black_piece
+                if color == "black"
+                else cloned_board.king_white_piece
+            )
+
+            apply_move(cloned_board, piece.position, possible_move)
+
+            if not cloned_board.threatened_by_enemy(
+                cloned_board.get_square(*cloned_king.position), cloned_king
+            ):
+                return False
+
+    logger.debug("checkmate color=%s", color)
+    return True
+
+
+def perft(board: Board, depth: int) -> int:
+    """Count the leaf nodes of the legal move tree down to depth."""
+
+    if depth == 0:
+        return 1
+
+    nodes = 0
+
+    for from_pos, possible_moves in get_legal_moves(
+        board, board.next_move_color
+    ).items():
+        for to_pos in possible_moves:
+            cloned_board = deepcopy(board)
+            apply_move(cloned_board, from_pos, to_pos)
+            nodes += perft(cloned_board, depth - 1)
+
+    return nodes
+
+
+def to_board_batch(boards: Iterable[Board]) -> "BoardBatch":
+    """Boards in the array layout of chess.board_batch."""
+
+    # imported here, NumPy is not needed to play
+    from chess.board_batch import BoardBatch
+
+    return BoardBatch.from_boards(boards)
+
+
+def from_board_batch(batch: "BoardBatch", index: int) -> Board:
+    return batch.board(index)
@@ -0,0 +1,261 @@
+"""Prove or refute a forced mate in N moves.
+
+    python -m chess.mate_solver puzzles.epd --processes 4
+
+A depth-first mate search: the attacker tries checking moves only (all
+moves with checks_only=False), the defender every legal evasion, proven and
+refuted positions are kept in a transposition cache. Refuted means no mate
+within the tried attacker moves, so with checks only a quiet mate may
+remain and the result is unknown, not refuted.
+
+A puzzle line holds a FEN (or the four EPD fields) and "dm <n>", e.g.
+"6k1/5ppp/8/8/8/8/8/R3K3 w - - dm 1;".
+"""
+
+import argparse
+import re
+import sys
+import time
+from copy import deepcopy
+from dataclasses import dataclass, field
+from multiprocessing import Pool
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from chess.my_types import Board
+from chess.search import Move, get_moves, is_in_check, play_move, pv_to_uci
+
+# entries of the transposition cache before it is cleared
+MAX_CACHE_ENTRIES = 200_000
+
+PUZZLE_PATTERN = re.compile(r"^(.*?)\s+dm\s+(\d+)")
+
+
+class MateSearchStopped(Exception):
+    pass
+
+
+@dataclass
+class MateResult:
+    # True: mate proven, False: refuted by an exhaustive search,
+    # None: unknown, no checking mate or the node limit reached
+    mate: Optional[bool]
+    moves: int
+    # attacker key move and a main line, empty unless proven
+    line: List[Move] = field(default_factory=list)
+    nodes: int = 0
+    elapsed_in_sec: float = 0.0
+    # the node limit ended the search
+    stopped: bool = False
+
+
+def _children(board: Board) -> Iterator[Tuple[Move, Board]]:
+    """Legal moves with the positions after them, produced lazily.
+
+    In check chess.logic also lists moves which do not resolve it, they are
+    skipped here like in Search.
+    """
+
+    color = board.next_move_color
+
+    for move in get_moves(board):
+        child = deepcopy(board)
+        play_move(child, move)
+
+        if not is_in_check(child, color):
+            yield move, child
+
+
+class MateSolver:
+    def __init__(self, checks_only: bool = True, max_nodes: Optional[int] = None):
+        self.checks_only = checks_only
+        self.max_nodes = max_nodes
+        self.nodes = 0
+        # position key -> mate in at most this many moves
+        self.proven: Dict[Tuple, int] = {}
+        # position key -> no mate in this many moves
+        self.refuted: Dict[Tuple, int] = {}
+        # position key -> key move of the proven mate
+        self.key_moves: Dict[Tuple, Move] = {}
+
+    def solve(self, board: Board, moves: int) -> MateResult:
+        """Whether the side to move can force mate in moves moves."""
+
+        start = time.perf_counter()
+        self.nodes = 0
+        stopped = False
+
+        try:
+            mate: Optional[bool] = self._attack(board, moves)
+        except MateSearchStopped:
+            mate = None
+            stopped = True
+
+        if mate is False and self.checks_only:
+            mate = None
+
+        line = self._main_line(board, moves) if mate else []
+
+        return MateResult(
+            mate, moves, line, self.nodes, time.perf_counter() - start, stopped
+        )
+
+    def _count_node(self) -> None:
+        self.nodes += 1
+
+        if self.max_nodes is not None and self.nodes > self.max_nodes:
+            raise MateSearchStopped()
+
+    def _attack(self, board: Board, moves: int) -> bool:
+        """The side to move mates in at most moves moves."""
+
+        self._count_node()
+        key = board.position_key()
+
+        if self.proven.get(key, moves + 1) <= moves:
+            return True
+
+        if self.refuted.get(key, 0) >= moves:
+            return False
+
+        if len(self.proven) + len(self.refuted) > MAX_CACHE_ENTRIES:
+            self.proven.clear()
+            self.refuted.clear()
+            self.key_moves.clear()
+
+        defender = "black" if board.next_move_color == "white" else "white"
+
+        for move, child in _children(board):
+            gives_check = is_in_check(child, defender)
+
+            if self.checks_only and not gives_check:
+                continue
+
+            if self._defend(child, moves, gives_check):
+                self.proven[key] = moves
+                self.key_moves[key] = move
+                return True
+
+        self.refuted[key] = moves
+        return False
+
+    def _defend(self, board: Board, moves: int, in_check: bool) -> bool:
+        """Every defence loses, the attacker has moves - 1 moves left."""
+
+        self._count_node()
+        has_move = False
+
+        for _, child in _children(board):
+            has_move = True
+
+            if moves == 1 or not self._attack(child, moves - 1):
+                return False
+
+        # no legal move: checkmate, or stalemate without check
+        return has_move or in_check
+
+    def _main_line(self, board: Board, moves: int) -> List[Move]:
+        line: List[Move] = []
+        board = deepcopy(board)
+
+        for left in range(moves, 0, -1):
+            key_move = self.key_moves.get(board.position_key())
+
+            if key_move is None:
+                break
+
+            line.append(key_move)
+            play_move(board, key_move)
+
+            # a defence which is refuted the longest, the first one if equal
+            replies = [
+                (move, child)
+                for move, child in _children(board)
+                if self.proven.get(child.position_key(), 0) <= left - 1
+            ]
+
+            if not replies:
+                break
+
+            move, board = max(
+                replies, key=lambda reply: self.proven.get(reply[1].position_key(), 0)
+            )
+            line.append(move)
+
+        return line
+
+
+def parse_puzzle(line: str) -> Tuple[str, int]:
+    """FEN and number of moves of a puzzle line."""
+
+    match = PUZZLE_PATTERN.match(line.strip())
+
+    if match is None:
+        raise ValueError(f"No 'dm <n>' in puzzle '{line.strip()}'.")
+
+    return match.group(1), int(match.group(2))
+
+
+def solve_puzzle(
+    job: Tuple[int, str, bool, Optional[int]],
+) -> Tuple[int, str, MateResult, List[str]]:
+    """Solve one puzzle line, runs in a worker process."""
+
+    index, line, checks_only, max_nodes = job
+    fen, moves = parse_puzzle(line)
+    board = Board.from_fen(fen)
+    result = MateSolver(checks_only, max_nodes).solve(board, moves)
+
+    return index, fen, result, pv_to_uci(board, result.line)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("puzzles", help="file with one puzzle per line")
+    parser.add_argument("--processes", type=int)
+    parser.add_argument("--max-nodes", type=int, help="node limit per puzzle")
+    parser.add_argument(
+        "--all-moves",
+        action="store_true",
+        help="try quiet attacker moves too, not only checks",
+    )
+    args = parser.parse_args(argv)
+
+    with open(args.puzzles, encoding="utf8") as f:
+        lines = [
+            line for line in f if line.strip() and not line.lstrip().startswith("#")
+        ]
+
+    jobs = [
+        (index, line, not args.all_moves, args.max_nodes)
+        for index, line in enumerate(lines, start=1)
+    ]
+    start = time.perf_counter()
+    solved = 0
+
+    with Pool(args.processes) as pool:
+        for index, fen, result, line in pool.imap(solve_puzzle, jobs):
+            if result.mate:
+                solved += 1
+                verdict = f"mate in {result.moves}: {' '.join(line)}"
+            elif result.stopped:
+                verdict = "node limit reached"
+            elif result.mate is None:
+                verdict = f"no checking mate in {result.moves}"
+            else:
+                verdict = f"no mate in {result.moves}"
+
+            print(
+                f"{index}: {verdict} ({result.nodes} nodes, "
+                f"{result.elapsed_in_sec * 1000:.0f} ms) {fen}"
+            )
+
+    print(
+        f"{solved}/{len(jobs)} solved in {time.perf_counter() - start:.2f} sec",
+        file=sys.stderr,
+    )
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,8 +1,167 @@
 from __future__ import annotations
 
+import hashlib
+import logging
+import struct
+import threading
+from collections import OrderedDict, defaultdict
 from copy import deepcopy
 from enum import Enum
-from typing import Callable, List, Optional, Set, Tuple
+from typing import (
+    Callable,
+    Dict,
+    Hashable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
+
+from chess import instrumentation
+from chess.instrumentation import instrumented
+
+logger = logging.getLogger(__name__)
+
+# Binary snapshot of a Board, see Board.to_bytes():
+#   64 bytes  piece code per square, row by row from (0, 0) to (7, 7)
+#   8 bytes   bit mask of the squares whose piece has moved at least once
+#   1 byte    flags, SNAPSHOT_BLACK_TO_MOVE | SNAPSHOT_GAME_OVER
+#   2 bytes   from and to square index + 1 of a last two step move, else 0
+#   1 byte    halfmove clock (fifty-move rule), capped at 255
+# A piece code is the piece type 1-6 (pawn, knight, bishop, rook, queen,
+# king), | 8 for black and | 16 for a promoted piece; 0 is an empty square.
+SNAPSHOT_STRUCT = struct.Struct("<64sQBBBB")
+SNAPSHOT_SIZE = SNAPSHOT_STRUCT.size
+SNAPSHOT_BLACK_TO_MOVE = 1
+SNAPSHOT_GAME_OVER = 2
+
+PIECE_CODE_BLACK = 8
+PIECE_CODE_PROMOTED = 16
+PIECE_CODES = {
+    "♙": 1,
+    "♘": 2,
+    "♗": 3,
+    "♖": 4,
+    "♕": 5,
+    "♔": 6,
+    "♟": 1 | PIECE_CODE_BLACK,
+    "♞": 2 | PIECE_CODE_BLACK,
+    "♝": 3 | PIECE_CODE_BLACK,
+    "♜": 4 | PIECE_CODE_BLACK,
+    "♛": 5 | PIECE_CODE_BLACK,
+    "♚": 6 | PIECE_CODE_BLACK,
+}
+PIECE_SYMBOLS = {code: symbol for symbol, code in PIECE_CODES.items()}
+
+FIFTY_MOVE_RULE_PLIES = 100
+
+# piece prefixes of the replay notation, pawns have none
+NOTATION_PIECE_LETTERS = {
+    "♔": "K",
+    "♕": "Q",
+    "♖": "R",
+    "♗": "B",
+    "♘": "N",
+    "♚": "K",
+    "♛": "Q",
+    "♜": "R",
+    "♝": "B",
+    "♞": "N",
+}
+
+# pieces of one color at the start of a game, per symbol
+START_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+FEN_SYMBOLS = {
+    "P": "♙",
+    "N": "♘",
+    "B": "♗",
+    "R": "♖",
+    "Q": "♕",
+    "K": "♔",
+    "p": "♟",
+    "n": "♞",
+    "b": "♝",
+    "r": "♜",
+    "q": "♛",
+    "k": "♚",
+}
+# castling right -> square index of the rook, which must not have moved
+FEN_CASTLING_ROOKS = {"K": 63, "Q": 56, "k": 7, "q": 0}
+# squares of kings and rooks whose moves matter for castling, see Position
+CASTLING_SQUARES_MASK = sum(1 << index for index in [0, 4, 7, 56, 60, 63])
+
+INITIAL_PIECE_COUNTS = {
+    "white": {"♙": 8, "♖": 2, "♘": 2, "♗": 2, "♕": 1, "♔": 1},
+    "black": {"♟": 8, "♜": 2, "♞": 2, "♝": 2, "♛": 1, "♚": 1},
+}
+
+# attacking symbols per color: pawn, knight, bishop, rook, queen, king
+ATTACKER_SYMBOLS = {
+    "white": ("♙", "♘", "♗", "♖", "♕", "♔"),
+    "black": ("♟", "♞", "♝", "♜", "♛", "♚"),
+}
+ENEMY_COLORS = {"white": "black", "black": "white"}
+
+
+def _leaper_squares(steps: List[Tuple[int, int]]) -> List[List[List[Tuple[int, int]]]]:
+    return [
+        [
+            [
+                (i + di, j + dj)
+                for di, dj in steps
+                if 0 <= i + di < 8 and 0 <= j + dj < 8
+            ]
+            for j in range(8)
+        ]
+        for i in range(8)
+    ]
+
+
+def _rays(directions: List[Tuple[int, int]]) -> List[List[List[List[Tuple[int, int]]]]]:
+    return [
+        [
+            [
+                [
+                    (i + k * di, j + k * dj)
+                    for k in range(1, 8)
+                    if 0 <= i + k * di < 8 and 0 <= j + k * dj < 8
+                ]
+                for di, dj in directions
+            ]
+            for j in range(8)
+        ]
+        for i in range(8)
+    ]
+
+
+# per square the squares a knight or king attacks it from, and the rays
+# along which a rook or bishop (or queen) does, nearest square first
+KNIGHT_SQUARES = _leaper_squares(
+    [(-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1)]
+)
+KING_SQUARES = _leaper_squares(
+    [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)]
+)
+STRAIGHT_RAYS = _rays([(-1, 0), (1, 0), (0, -1), (0, 1)])
+DIAGONAL_RAYS = _rays([(-1, -1), (-1, 1), (1, -1), (1, 1)])
+
+# material in pawns, black negative, see Board.material_balance
+MATERIAL_VALUES = {
+    "♙": 1,
+    "♘": 3,
+    "♗": 3,
+    "♖": 5,
+    "♕": 9,
+    "♔": 0,
+    "♟": -1,
+    "♞": -3,
+    "♝": -3,
+    "♜": -5,
+    "♛": -9,
+    "♚": 0,
+}
 
 
 class ChessNotationList(list):
@@ -27,6 +186,110 @@ class MoveType(str, Enum):
     PROMOTION = "Promotion"
 
 
+def square_name(position: Tuple[int, int]) -> str:
+    i, j = position
+    return f"{'abcdefgh'[j]}{8 - i}"
+
+
+def format_move(
+    symbol: str,
+    from_pos: Tuple[int, int],
+    to_pos: Tuple[int, int],
+    move_type: MoveType,
+    promotion_piece: Optional[str],
+    is_capture: bool,
+) -> str:
+    """One move in the notation of the replay files, e.g. "Ng1–f3", "e5×d6 e.p."
+    or "e7–e8Q". Castlings are formatted by Board.move()."""
+
+    move_notation = (
+        NOTATION_PIECE_LETTERS.get(symbol, "")
+        + square_name(from_pos)
+        + ("×" if is_capture else "–")
+        + square_name(to_pos)
+    )
+
+    if promotion_piece:
+        move_notation += NOTATION_PIECE_LETTERS[promotion_piece]
+
+    if move_type == MoveType.EN_PASSANT:
+        move_notation += " e.p."
+
+    return move_notation
+
+
+class LegalMovesCache:
+    """Bounded LRU cache of legal moves, keyed by Board.position_key().
+
+    Every entry holds the legal moves of all queried pieces of one position,
+    so a changed position simply misses and old positions age out.
+    The cache is shared with the move hint worker thread, hence the lock.
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self._positions: OrderedDict[
+            Hashable, Dict[Tuple[int, int], List[Tuple[int, int]]]
+        ] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def get(
+        self, position_key: Hashable, piece_position: Tuple[int, int]
+    ) -> Optional[List[Tuple[int, int]]]:
+        with self._lock:
+            position_moves = self._positions.get(position_key)
+
+            if position_moves is None or piece_position not in position_moves:
+                self.misses += 1
+                return None
+
+            self._positions.move_to_end(position_key)
+            self.hits += 1
+            return position_moves[piece_position]
+
+    def put(
+        self,
+        position_key: Hashable,
+        piece_position: Tuple[int, int],
+        moves: List[Tuple[int, int]],
+    ) -> None:
+        with self._lock:
+            position_moves = self._positions.get(position_key)
+
+            if position_moves is None:
+                position_moves = self._positions[position_key] = {}
+
+                while len(self._positions) > self.maxsize:
+                    self._positions.popitem(last=False)
+                    self.evictions += 1
+            else:
+                self._positions.move_to_end(position_key)
+
+            position_moves[piece_position] = moves
+
+    def clear(self) -> None:
+        with self._lock:
+            self._positions.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "positions": len(self._positions),
+            "maxsize": self.maxsize,
+        }
+
+
 class Piece:
     def __init__(self, symbol: str, name: str, position: Tuple[int, int]):
         self.symbol: str = symbol
@@ -215,17 +478,19 @@ class Square:
         self.position = position
         self.piece = piece
         self.callback_dialog = callback_dialog
+        # only filled if Board.track_threatenings is set, see attackers_of()
         self.threatened_by: Set[Piece] = set()
 
     def __deepcopy__(self, memodict: dict = {}) -> Square:
         cls = self.__class__
         result = cls.__new__(cls)
         memodict[id(self)] = result
-        for k, v in self.__dict__.items():
-            if k == "callback_dialog":
-                setattr(result, k, None)
-            else:
-                setattr(result, k, deepcopy(v, memodict))
+        result.position = self.position
+        result.piece = deepcopy(self.piece, memodict)
+        result.callback_dialog = None
+        result.threatened_by = (
+            deepcopy(self.threatened_by, memodict) if self.threatened_by else set()
+        )
         return result
 
     def update_square(self) -> None:
@@ -240,6 +505,30 @@ class Player:
         self.display_name: Optional[str] = None
         self.pieces: List[Piece] = []
 
+        # kept up to date by Board in move(), en_passant_move() and _transform()
+        self.active_pieces: List[Piece] = []
+        self.captured_pieces: List[Piece] = []
+        self.active_pieces_by_symbol: Dict[str, List[Piece]] = defaultdict(list)
+
+    def add_piece(self, piece: Piece) -> None:
+        self.pieces.append(piece)
+
+        if piece.captured:
+            self.captured_pieces.append(piece)
+        else:
+            self.active_pieces.append(piece)
+            self.active_pieces_by_symbol[piece.symbol].append(piece)
+
+    def capture_piece(self, piece: Piece) -> None:
+        piece.captured = True
+        self.active_pieces.remove(piece)
+        self.active_pieces_by_symbol[piece.symbol].remove(piece)
+        self.captured_pieces.append(piece)
+
+    def transform_piece(self, piece: Piece, symbol: str) -> None:
+        self.active_pieces_by_symbol[piece.symbol].remove(piece)
+        self.active_pieces_by_symbol[symbol].append(piece)
+
 
 class Board:
     def __init__(self, callback_dialog: Callable):
@@ -247,14 +536,29 @@ class Board:
         w, h = 8, 8
         self._board = [[Square(position=(i, j)) for j in range(w)] for i in range(h)]
         self.player: List[Player] = []
-        self.last_moves: List[
-            Tuple[Square, Square, MoveType, str]
-        ] = ChessNotationList()
+        self.last_moves: List[Tuple[Square, Square, MoveType, str]] = (
+            ChessNotationList()
+        )
         self.kings_in_check: List[Piece] = []
+        # fill Square.threatened_by in reinitialize_threatenings()
+        self.track_threatenings = False
         self.king_black_piece = Piece(symbol="♚", name="♚_1_black", position=(0, 4))
         self.king_white_piece = Piece(symbol="♔", name="♔_1_white", position=(7, 4))
         self.next_move_color = "white"
         self.game_over = False
+        self._position_key: Optional[Tuple] = None
+
+        # notation of every ply, e.g. "e2–e4", see format_move()
+        self.move_notations: List[str] = []
+        # standard algebraic notation of every ply, kept by chess.pgn
+        self.san_notations: List[str] = []
+
+        # draw detection, updated per ply in move()
+        self.halfmove_clock = 0
+        self.position_counts: Dict[Tuple, int] = {}
+        self.material_counts: Dict[str, int] = {symbol: 0 for symbol in PIECE_CODES}
+        # material of white minus material of black, in pawns
+        self.material_balance = 0
 
         black_pieces = [
             Piece(symbol="♜", name="♜_1_black", position=(0, 0)),
@@ -300,7 +604,7 @@ class Board:
             for j in range(8):
                 piece = black_pieces[i * 8 + j]
                 self._board[i][j].piece = piece
-                self.player[0].pieces.append(piece)
+                self.player[0].add_piece(piece)
 
         # black pieces for player white
         self.player.append(Player("white"))
@@ -308,9 +612,272 @@ class Board:
             for j in range(8):
                 piece = white_pieces[i * 8 + j]
                 self._board[i + 6][j].piece = piece
-                self.player[1].pieces.append(piece)
+                self.player[1].add_piece(piece)
+
+        for player in self.player:
+            for piece in player.pieces:
+                self.material_counts[piece.symbol] += 1
 
         self.reinitialize_threatenings()
+        self.position_counts[self.position_key()] = 1
+
+    def to_bytes(self) -> bytes:
+        """Fixed size binary snapshot of the position, see SNAPSHOT_STRUCT."""
+
+        buffer = bytearray(SNAPSHOT_SIZE)
+        self.pack_into(buffer)
+        return bytes(buffer)
+
+    def pack_into(self, buffer: Union[bytearray, memoryview], offset: int = 0) -> None:
+        """Write the snapshot into a writable buffer, without copies."""
+
+        placement = bytearray(64)
+        moved_mask = 0
+
+        for i in range(8):
+            for j in range(8):
+                piece = self._board[i][j].piece
+
+                if piece is None:
+                    continue
+
+                code = PIECE_CODES[piece.symbol]
+
+                if "_T_" in piece.name:
+                    code |= PIECE_CODE_PROMOTED
+
+                placement[i * 8 + j] = code
+
+                if piece.moved_least_once:
+                    moved_mask |= 1 << (i * 8 + j)
+
+        flags = 0
+        if self.next_move_color == "black":
+            flags |= SNAPSHOT_BLACK_TO_MOVE
+        if self.game_over:
+            flags |= SNAPSHOT_GAME_OVER
+
+        two_step_from = two_step_to = 0
+        if self.last_moves:
+            last_from_square, last_to_square, _, _ = self.last_moves[-1]
+            from_i, from_j = last_from_square.position
+            to_i, to_j = last_to_square.position
+
+            if abs(from_i - to_i) == 2 and Board.is_pawn(last_to_square.piece):
+                two_step_from = from_i * 8 + from_j + 1
+                two_step_to = to_i * 8 + to_j + 1
+
+        SNAPSHOT_STRUCT.pack_into(
+            buffer,
+            offset,
+            bytes(placement),
+            moved_mask,
+            flags,
+            two_step_from,
+            two_step_to,
+            min(self.halfmove_clock, 255),
+        )
+
+    @classmethod
+    def from_bytes(
+        cls,
+        data: Union[bytes, bytearray, memoryview],
+        offset: int = 0,
+        callback_dialog: Optional[Callable] = None,
+    ) -> Board:
+        """Restore a Board from a snapshot written by to_bytes()/pack_into().
+
+        Moved pieces get a move counter of 1, which keeps the castling
+        rights. Captured pieces are derived from the missing pieces, their
+        position is unknown and set to (-1, -1). The position history for
+        repetitions starts with the restored position.
+        """
+
+        (
+            placement,
+            moved_mask,
+            flags,
+            two_step_from,
+            two_step_to,
+            halfmove_clock,
+        ) = SNAPSHOT_STRUCT.unpack_from(data, offset)
+
+        board = cls.__new__(cls)
+        board.callback_dialog = callback_dialog
+        board._board = [[Square(position=(i, j)) for j in range(8)] for i in range(8)]
+        board.player = [Player("black"), Player("white")]
+        board.last_moves = ChessNotationList()
+        board.kings_in_check = []
+        board.track_threatenings = False
+        board.next_move_color = "black" if flags & SNAPSHOT_BLACK_TO_MOVE else "white"
+        board.game_over = bool(flags & SNAPSHOT_GAME_OVER)
+        board._position_key = None
+        board.move_notations = []
+        board.san_notations = []
+        board.halfmove_clock = halfmove_clock
+        board.material_counts = {symbol: 0 for symbol in PIECE_CODES}
+        board.material_balance = 0
+
+        numbers: Dict[str, int] = defaultdict(int)
+        present: Dict[str, Dict[str, int]] = {
+            "white": defaultdict(int),
+            "black": defaultdict(int),
+        }
+        promoted = {"white": 0, "black": 0}
+
+        for index, code in enumerate(placement):
+            if not code:
+                continue
+
+            symbol = PIECE_SYMBOLS[code & ~PIECE_CODE_PROMOTED]
+            color = "black" if code & PIECE_CODE_BLACK else "white"
+
+            if code & PIECE_CODE_PROMOTED:
+                name = f"{symbol}_T_{color}"
+                promoted[color] += 1
+            else:
+                numbers[symbol] += 1
+                name = f"{symbol}_{numbers[symbol]}_{color}"
+                present[color][symbol] += 1
+
+            piece = Piece(symbol=symbol, name=name, position=divmod(index, 8))
+
+            if moved_mask >> index & 1:
+                piece.move_counter = 1
+
+            board._board[index // 8][index % 8].piece = piece
+            board.player[0 if color == "black" else 1].add_piece(piece)
+            board.material_counts[symbol] += 1
+            board.material_balance += MATERIAL_VALUES[symbol]
+
+            if symbol == "♚":
+                board.king_black_piece = piece
+            elif symbol == "♔":
+                board.king_white_piece = piece
+
+        # missing pieces are captured, promoted pieces replace a pawn
+        for player in board.player:
+            color = player.name
+
+            for symbol, initial_count in INITIAL_PIECE_COUNTS[color].items():
+                captured_count = initial_count - present[color][symbol]
+
+                if symbol in ["♙", "♟"]:
+                    captured_count -= promoted[color]
+
+                for _ in range(max(captured_count, 0)):
+                    numbers[symbol] += 1
+                    piece = Piece(
+                        symbol=symbol,
+                        name=f"{symbol}_{numbers[symbol]}_{color}",
+                        position=(-1, -1),
+                    )
+                    piece.captured = True
+                    player.add_piece(piece)
+
+        if two_step_to:
+            from_i, from_j = divmod(two_step_from - 1, 8)
+            to_i, to_j = divmod(two_step_to - 1, 8)
+
+            board.last_moves.append(
+                (
+                    board._board[from_i][from_j],
+                    board._board[to_i][to_j],
+                    MoveType.NORMAL_MOVE,
+                    None,
+                )
+            )
+
+        board.reinitialize_threatenings()
+        board.position_counts = {board.position_key(): 1}
+        return board
+
+    @classmethod
+    def from_fen(cls, fen: str, callback_dialog: Optional[Callable] = None) -> Board:
+        """Board of a position in Forsyth-Edwards Notation.
+
+        Pieces beyond the initial set are promoted pieces. The fullmove
+        number is ignored.
+        """
+
+        fields = fen.split()
+
+        if len(fields) < 4:
+            raise ValueError(f"Invalid FEN '{fen}'.")
+
+        rows = fields[0].split("/")
+
+        if len(rows) != 8:
+            raise ValueError(f"Invalid FEN placement '{fields[0]}'.")
+
+        placement = bytearray(64)
+        counts: Dict[str, int] = defaultdict(int)
+
+        for i, row in enumerate(rows):
+            j = 0
+
+            for letter in row:
+                if letter.isdigit():
+                    j += int(letter)
+                    continue
+
+                if letter not in FEN_SYMBOLS or j > 7:
+                    raise ValueError(f"Invalid FEN row '{row}'.")
+
+                symbol = FEN_SYMBOLS[letter]
+                color = "white" if letter.isupper() else "black"
+                counts[symbol] += 1
+                placement[i * 8 + j] = PIECE_CODES[symbol]
+
+                if counts[symbol] > INITIAL_PIECE_COUNTS[color][symbol]:
+                    placement[i * 8 + j] |= PIECE_CODE_PROMOTED
+
+                j += 1
+
+            if j != 8:
+                raise ValueError(f"Invalid FEN row '{row}'.")
+
+        # kings and rooks without castling right count as moved
+        moved_mask = 0
+        castling = fields[2]
+
+        for right, rook_index in FEN_CASTLING_ROOKS.items():
+            if right not in castling:
+                moved_mask |= 1 << rook_index
+
+        if "K" not in castling and "Q" not in castling:
+            moved_mask |= 1 << 60
+        if "k" not in castling and "q" not in castling:
+            moved_mask |= 1 << 4
+
+        flags = SNAPSHOT_BLACK_TO_MOVE if fields[1] == "b" else 0
+
+        # the en passant target square gives the last two step move
+        two_step_from = two_step_to = 0
+        if fields[3] != "-":
+            j = "abcdefgh".index(fields[3][0])
+            if fields[3][1] == "3":
+                two_step_from, two_step_to = 6 * 8 + j + 1, 4 * 8 + j + 1
+            else:
+                two_step_from, two_step_to = 1 * 8 + j + 1, 3 * 8 + j + 1
+
+        halfmove_clock = int(fields[4]) if len(fields) > 4 else 0
+
+        return cls.from_bytes(
+            SNAPSHOT_STRUCT.pack(
+                bytes(placement),
+                moved_mask,
+                flags,
+                two_step_from,
+                two_step_to,
+                min(halfmove_clock, 255),
+            ),
+            callback_dialog=callback_dialog,
+        )
+
+    @staticmethod
+    def is_pawn(piece: Optional[Piece]) -> bool:
+        return piece is not None and piece.symbol in ["♟", "♙"]
 
     @staticmethod
     def is_pass_only(square: Square, piece: Piece) -> bool:
@@ -319,6 +886,7 @@ class Board:
 
         return False
 
+    @instrumented(instrumentation.CLONE)
     def __deepcopy__(self, memodict: dict = {}) -> Board:
         cls = self.__class__
         result = cls.__new__(cls)
@@ -330,42 +898,137 @@ class Board:
                 setattr(result, k, deepcopy(v, memodict))
         return result
 
+    def position_key(self) -> Tuple:
+        """Hashable key of everything the legal moves depend on.
+
+        Consists of the piece placement, the next move color, the castling
+        rights and the last move if it was a two step move (en passant).
+        The key is cached until the next move.
+        """
+
+        if self._position_key is None:
+            placement = tuple(
+                None if square.piece is None else square.piece.symbol
+                for row in self._board
+                for square in row
+            )
+
+            castling_rights = tuple(
+                king.position == (i, 4)
+                and not king.moved_least_once
+                and rook is not None
+                and rook.symbol == rook_symbol
+                and not rook.moved_least_once
+                for king, i, rook_symbol in (
+                    (self.king_black_piece, 0, "♜"),
+                    (self.king_white_piece, 7, "♖"),
+                )
+                for rook in (self.get_piece(i, 0), self.get_piece(i, 7))
+            )
+
+            two_step_move = None
+            if self.last_moves:
+                last_from_square, last_to_square, _, _ = self.last_moves[-1]
+
+                if abs(
+                    last_from_square.position[0] - last_to_square.position[0]
+                ) == 2 and Board.is_pawn(last_to_square.piece):
+                    two_step_move = (last_from_square.position, last_to_square.position)
+
+            self._position_key = (
+                placement,
+                self.next_move_color,
+                castling_rights,
+                two_step_move,
+            )
+
+        return self._position_key
+
+    def position_hash(self) -> int:
+        """Signed 64 bit hash of position_key(), stable across processes."""
+
+        digest = hashlib.blake2b(
+            repr(self.position_key()).encode("utf8"), digest_size=8
+        ).digest()
+        return int.from_bytes(digest, "little", signed=True)
+
     def is_king_in_check(self, king_piece: Piece) -> bool:
-        return any(
-            [
-                king_in_check.symbol == king_piece.symbol
-                for king_in_check in self.kings_in_check
-            ]
+        return self.is_attacked(
+            king_piece.position, ENEMY_COLORS[king_piece.get_color()]
         )
 
-    def reinitialize_threatenings(self) -> None:
-        self._remove_threat_from_squares()
-        self.kings_in_check = []
-
-        for piece in [
-            player_pieces
-            for player in self.player
-            for player_pieces in player.pieces
-            if not player_pieces.captured
+    def attackers_of(self, position: Tuple[int, int], color: str) -> List[Piece]:
+        """Pieces of color attacking the square at position.
+
+        Found from the square: pawn and leaper patterns, then the rays up to
+        the first piece. Pawns attack diagonally whether the square is
+        occupied or not, pieces defend own pieces.
+        """
+
+        return list(self._iter_attackers(position, color))
+
+    def is_attacked(self, position: Tuple[int, int], color: str) -> bool:
+        return next(self._iter_attackers(position, color), None) is not None
+
+    def _iter_attackers(self, position: Tuple[int, int], color: str) -> Iterator[Piece]:
+        i, j = position
+        board = self._board
+        pawn, knight, bishop, rook, queen, king = ATTACKER_SYMBOLS[color]
+
+        # white pawns attack towards row 0, so from the row below
+        pawn_i = i + 1 if color == "white" else i - 1
+
+        if 0 <= pawn_i < 8:
+            for pawn_j in [j - 1, j + 1]:
+                if 0 <= pawn_j < 8:
+                    piece = board[pawn_i][pawn_j].piece
+
+                    if piece is not None and piece.symbol == pawn:
+                        yield piece
+
+        for symbol, leaper_squares in [(knight, KNIGHT_SQUARES), (king, KING_SQUARES)]:
+            for leaper_i, leaper_j in leaper_squares[i][j]:
+                piece = board[leaper_i][leaper_j].piece
+
+                if piece is not None and piece.symbol == symbol:
+                    yield piece
+
+        for sliders, rays in [
+            ((rook, queen), STRAIGHT_RAYS),
+            ((bishop, queen), DIAGONAL_RAYS),
         ]:
-            possible_piece_moves = self._get_possible_moves(piece)
+            for ray in rays[i][j]:
+                for ray_i, ray_j in ray:
+                    piece = board[ray_i][ray_j].piece
+
+                    if piece is not None:
+                        if piece.symbol in sliders:
+                            yield piece
 
-            for threatened_position in possible_piece_moves:
-                square = self.get_square(*threatened_position)
+                        break
+
+    @instrumented(instrumentation.REINITIALIZE_THREATENINGS)
+    def reinitialize_threatenings(self) -> None:
+        """Update kings_in_check and, with track_threatenings, the
+        threatened_by sets of all squares."""
 
-                if not Board.is_pass_only(square, piece):
-                    square.threatened_by.add(piece)
+        if self.track_threatenings:
+            self._remove_threat_from_squares()
 
-        # check kings check states
+            for piece in self.player[0].active_pieces + self.player[1].active_pieces:
+                possible_piece_moves = self._get_possible_moves(piece)
 
-        king_black_square = self.get_square(*self.king_black_piece.position)
-        king_white_square = self.get_square(*self.king_white_piece.position)
+                for threatened_position in possible_piece_moves:
+                    square = self.get_square(*threatened_position)
 
-        if self.threatened_by_enemy(king_black_square, self.king_black_piece):
-            self.kings_in_check.append(self.king_black_piece)
+                    if not Board.is_pass_only(square, piece):
+                        square.threatened_by.add(piece)
 
-        if self.threatened_by_enemy(king_white_square, self.king_white_piece):
-            self.kings_in_check.append(self.king_white_piece)
+        self.kings_in_check = [
+            king
+            for king in [self.king_black_piece, self.king_white_piece]
+            if self.is_king_in_check(king)
+        ]
 
     def _remove_threat_from_squares(self) -> None:
         for i in range(0, 8):
@@ -651,10 +1314,13 @@ class Board:
 
                     if last_move_piece:
                         is_last_pawn_enemy_move = (
-                            last_move_piece.get_color() != attacker_piece.get_color()
+                            Board.is_pawn(last_move_piece)
+                            and last_move_piece.get_color()
+                            != attacker_piece.get_color()
                         )
                         next_to_attacker = (
-                            abs(attacker_piece_j - last_move_piece.position[1]) == 1
+                            attacker_piece_i == last_move_piece.position[0]
+                            and abs(attacker_piece_j - last_move_piece.position[1]) == 1
                         )
                         behind_to_last_move_piece = (
                             abs(last_move_piece.position[0] - threatened_square_i) == 1
@@ -691,11 +1357,8 @@ class Board:
 
         return False
 
-    @staticmethod
-    def threatened_by_enemy(square: Square, piece: Piece) -> bool:
-        return any(
-            _piece.get_color() != piece.get_color() for _piece in square.threatened_by
-        )
+    def threatened_by_enemy(self, square: Square, piece: Piece) -> bool:
+        return self.is_attacked(square.position, ENEMY_COLORS[piece.get_color()])
 
     def get_square(self, i: int, j: int) -> Square:
         return self._board[i][j]
@@ -703,6 +1366,7 @@ class Board:
     def get_piece(self, i: int, j: int) -> Optional[Piece]:
         return self._board[i][j].piece
 
+    @instrumented(instrumentation.MOVE_GENERATION)
     def _get_possible_moves(self, piece: Piece) -> List[Tuple[int, int]]:
         basic_moves = piece.get_basic_moves()
 
@@ -722,7 +1386,14 @@ class Board:
         promotion_piece: Optional[str] = None,
         force_trigger=False,
     ) -> None:
-        print(self.next_move_color)
+        logger.debug(
+            "move color=%s from=%s to=%s type=%s",
+            self.next_move_color,
+            from_pos,
+            to_pos,
+            move_type.name,
+        )
+        self._position_key = None
         from_i, from_j = from_pos
         to_i, to_j = to_pos
 
@@ -734,10 +1405,14 @@ class Board:
         if from_piece is None:
             raise ValueError("Moving piece is None")
 
+        from_symbol = from_piece.symbol
+        is_capture = to_square.piece is not None
+        is_irreversible = from_piece.symbol in ["♟", "♙"]
         from_piece.position = to_pos
 
         if to_square.piece is not None:
-            to_square.piece.captured = True
+            self._capture(to_square.piece)
+            is_irreversible = True
 
         to_square.piece = from_piece
         from_square.piece = None
@@ -753,8 +1428,79 @@ class Board:
         to_square.update_square()
 
         self.last_moves.append((from_square, to_square, move_type, promotion_piece))
+
+        if move_type != MoveType.CASTLING_MOVE:
+            self.move_notations.append(
+                format_move(
+                    from_symbol,
+                    from_pos,
+                    to_pos,
+                    move_type,
+                    promotion_piece,
+                    is_capture or move_type == MoveType.EN_PASSANT,
+                )
+            )
+        elif force_trigger:  # king move of the castling
+            self.move_notations.append("0–0" if to_j > from_j else "0–0–0")
+
         self.reinitialize_threatenings()
 
+        # the king move of a castling is followed by the rook move
+        if not (force_trigger and move_type == MoveType.CASTLING_MOVE):
+            self._count_ply(is_irreversible)
+
+    def _count_ply(self, is_irreversible: bool) -> None:
+        if is_irreversible:
+            self.halfmove_clock = 0
+            # no position before a pawn move or capture can occur again
+            self.position_counts.clear()
+        else:
+            self.halfmove_clock += 1
+
+        position_key = self.position_key()
+        self.position_counts[position_key] = (
+            self.position_counts.get(position_key, 0) + 1
+        )
+
+    def is_threefold_repetition(self) -> bool:
+        return self.position_counts.get(self.position_key(), 0) >= 3
+
+    def is_fifty_move_rule(self) -> bool:
+        return self.halfmove_clock >= FIFTY_MOVE_RULE_PLIES
+
+    def is_insufficient_material(self) -> bool:
+        """King against king, king and one minor piece against king, or
+        kings and one bishop each on squares of the same color."""
+
+        counts = self.material_counts
+
+        if any(counts[symbol] for symbol in ["♙", "♟", "♖", "♜", "♕", "♛"]):
+            return False
+
+        knights = counts["♘"] + counts["♞"]
+        bishops = counts["♗"] + counts["♝"]
+
+        if knights + bishops <= 1:
+            return True
+
+        if knights == 0 and counts["♗"] == 1 and counts["♝"] == 1:
+            square_colors = {
+                sum(piece.position) % 2
+                for player in self.player
+                for symbol in ["♗", "♝"]
+                for piece in player.active_pieces_by_symbol[symbol]
+            }
+            return len(square_colors) == 1
+
+        return False
+
+    def is_draw(self) -> bool:
+        return (
+            self.is_threefold_repetition()
+            or self.is_fifty_move_rule()
+            or self.is_insufficient_material()
+        )
+
     def castling_move(self, from_pos: Tuple[int, int], to_pos: Tuple[int, int]) -> None:
         from_piece_pos_i, from_piece_pos_j = from_pos
         to_square_pos_i, to_square_pos_j = to_pos
@@ -803,8 +1549,9 @@ class Board:
         if capturing_pawn_piece is None:
             raise ValueError("En-Passant-Fail: Capturing piece is None.")
 
-        capturing_pawn_piece.captured = True
+        self._capture(capturing_pawn_piece)
         capturing_square.piece = None
+        self._position_key = None
         capturing_square.update_square()
 
         self.move(from_pos, to_pos, MoveType.EN_PASSANT)
@@ -833,9 +1580,97 @@ class Board:
             result = self.callback_dialog(current_transformable_piece_symbols)
             return result
 
+    def get_player(self, color: str) -> Player:
+        return self.player[0] if color == "black" else self.player[1]
+
+    def _capture(self, piece: Piece) -> None:
+        self.get_player(piece.get_color()).capture_piece(piece)
+        self.material_counts[piece.symbol] -= 1
+        self.material_balance -= MATERIAL_VALUES[piece.symbol]
+
     def _transform(
         self, transforming_piece: Piece, to_transforming_symbol: str
     ) -> None:
         to_name = f"{to_transforming_symbol}_T_{transforming_piece.get_color()}"
+        self.get_player(transforming_piece.get_color()).transform_piece(
+            transforming_piece, to_transforming_symbol
+        )
+        self.material_counts[transforming_piece.symbol] -= 1
+        self.material_counts[to_transforming_symbol] += 1
+        self.material_balance += (
+            MATERIAL_VALUES[to_transforming_symbol]
+            - MATERIAL_VALUES[transforming_piece.symbol]
+        )
         transforming_piece.symbol = to_transforming_symbol
         transforming_piece.name = to_name
+
+
+class Position:
+    """Immutable value of a position, e.g. for caches and worker processes.
+
+    Holds a snapshot of Board.to_bytes() without the game over flag and with
+    moved flags only for the squares relevant to castling, so equal
+    positions have equal snapshots. Equality, hashing and pickling work on
+    these bytes, which include the halfmove clock; Board.position_key()
+    ignores it.
+    """
+
+    __slots__ = ("data",)
+
+    def __init__(self, data: bytes) -> None:
+        if len(data) != SNAPSHOT_SIZE:
+            raise ValueError(f"Position needs {SNAPSHOT_SIZE} bytes, not {len(data)}.")
+
+        object.__setattr__(self, "data", bytes(data))
+
+    @classmethod
+    def from_board(cls, board: Board) -> Position:
+        (
+            placement,
+            moved_mask,
+            flags,
+            two_step_from,
+            two_step_to,
+            halfmove_clock,
+        ) = SNAPSHOT_STRUCT.unpack(board.to_bytes())
+
+        return cls(
+            SNAPSHOT_STRUCT.pack(
+                placement,
+                moved_mask & CASTLING_SQUARES_MASK,
+                flags & ~SNAPSHOT_GAME_OVER,
+                two_step_from,
+                two_step_to,
+                halfmove_clock,
+            )
+        )
+
+    def to_board(self, callback_dialog: Optional[Callable] = None) -> Board:
+        return Board.from_bytes(self.data, callback_dialog=callback_dialog)
+
+    @property
+    def next_move_color(self) -> str:
+        flags = SNAPSHOT_STRUCT.unpack(self.data)[2]
+        return "black" if flags & SNAPSHOT_BLACK_TO_MOVE else "white"
+
+    def symbol(self, i: int, j: int) -> Optional[str]:
+        """Symbol of the piece on a square, None if empty."""
+
+        code = self.data[i * 8 + j] & ~PIECE_CODE_PROMOTED
+        return PIECE_SYMBOLS[code] if code else None
+
+    def __setattr__(self, name: str, value: object) -> None:
+        raise AttributeError("Position is immutable.")
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, Position) and self.data == other.data
+
+    def __hash__(self) -> int:
+        return hash(self.data)
+
+    def __reduce__(self) -> Tuple:
+        return Position, (self.data,)
+
+    def __repr__(self) -> str:
+        rows = ["".join(self.symbol(i, j) or "." for j in range(8)) for i in range(8)]
+        return f"Position({'/'.join(rows)} {self.next_move_color})"
@@ -0,0 +1,210 @@
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from chess.my_types import Board, MoveType, square_name
+
+# from_pos, to_pos, move_type
+NotationMove = Tuple[Tuple[int, int], Tuple[int, int], MoveType]
+
+# promotion postfix -> (white symbol, black symbol)
+PROMOTION_SYMBOLS = {
+    "Q": ("♕", "♛"),
+    "R": ("♖", "♜"),
+    "B": ("♗", "♝"),
+    "N": ("♘", "♞"),
+}
+
+
+def move_name(from_pos: Tuple[int, int], to_pos: Tuple[int, int]) -> str:
+    return square_name(from_pos) + square_name(to_pos)
+
+
+def iter_games(lines: Iterable[str]) -> Iterator[List[str]]:
+    """Split notation lines into games, games are separated by empty lines."""
+
+    game: List[str] = []
+
+    for line in lines:
+        chess_notation = line.strip()
+
+        if chess_notation:
+            game.append(chess_notation)
+        elif game:
+            yield game
+            game = []
+
+    if game:
+        yield game
+
+
+def parse_notation(
+    chess_notation: str,
+) -> Tuple[List[Optional[str]], List[NotationMove]]:
+    # replace all " e.p." to"_e.p." to avoid to be splitted by split(" ")
+    while " e.p." in chess_notation:
+        chess_notation = chess_notation.replace(" e.p.", "_e.p.")
+
+    move_parts = chess_notation.split(" ")
+    move_parts = move_parts[1:]
+    return parse_move(move_parts)
+
+
+def parse_move(
+    move_notation: List[str],
+) -> Tuple[List[Optional[str]], List[NotationMove]]:
+    rows = {"1": 7, "2": 6, "3": 5, "4": 4, "5": 3, "6": 2, "7": 1, "8": 0}
+    cols = {"a": 0, "b": 1, "c": 2, "d": 3, "e": 4, "f": 5, "g": 6, "h": 7}
+
+    possible_seperators = ["–", "x", "×"]
+    possible_promotion_postfixes = ["Q", "B", "N", "R"]
+    castling_notations = ["0–0", "0–0–0"]
+
+    white_move = move_notation[0]
+    black_move = move_notation[1] if len(move_notation) > 1 else None
+
+    white_castling = False
+    black_castling = False
+
+    is_white_en_passant = False
+    is_black_en_passant = False
+
+    white_promoted_piece = None
+    black_promoted_piece = None
+
+    if white_move not in castling_notations:
+        white_from_pos, white_to_pos = white_move.split(
+            use_seperator(white_move, possible_seperators)
+        )
+        white_from_pos = remove_piece_prefix(white_from_pos)
+        white_to_pos = remove_piece_prefix(white_to_pos)
+        is_white_en_passant, white_to_pos = remove_en_passant_postfix(white_to_pos)
+
+        if any(postfix in white_to_pos for postfix in possible_promotion_postfixes):
+            white_promoted_piece = white_to_pos[-1]
+    else:
+        white_castling = True
+
+    if black_move is not None:
+        if black_move not in castling_notations:
+            black_from_pos, black_to_pos = black_move.split(
+                use_seperator(black_move, possible_seperators)
+            )
+            black_from_pos = remove_piece_prefix(black_from_pos)
+            black_to_pos = remove_piece_prefix(black_to_pos)
+            is_black_en_passant, black_to_pos = remove_en_passant_postfix(black_to_pos)
+
+            if any(postfix in black_to_pos for postfix in possible_promotion_postfixes):
+                black_promoted_piece = black_to_pos[-1]
+        else:
+            black_castling = True
+
+    moves = []
+
+    # white
+    if white_castling:
+        if white_move == "0–0":  # short castling
+            moves.append(
+                (
+                    (7, 4),  # from_pos
+                    (7, 7),  # to_pos
+                    MoveType.CASTLING_MOVE,
+                )
+            )
+        else:  # long castling
+            moves.append(
+                (
+                    (7, 4),  # from_pos
+                    (7, 0),  # to_pos
+                    MoveType.CASTLING_MOVE,
+                )
+            )
+    else:
+        moves.append(
+            (
+                (rows[white_from_pos[1]], cols[white_from_pos[0]]),  # from_pos
+                (rows[white_to_pos[1]], cols[white_to_pos[0]]),  # to_pos
+                MoveType.EN_PASSANT if is_white_en_passant else MoveType.NORMAL_MOVE,
+            )
+        )
+
+    # black
+    if black_move is not None:
+        if black_castling:
+            if black_move == "0–0":  # short castling
+                moves.append(
+                    (
+                        (0, 4),  # from_pos
+                        (0, 7),  # to_pos
+                        MoveType.CASTLING_MOVE,
+                    )
+                )
+            else:  # long castling
+                moves.append(
+                    (
+                        (0, 4),  # from_pos
+                        (0, 0),  # to_pos
+                        MoveType.CASTLING_MOVE,
+                    )
+                )
+        else:
+            moves.append(
+                (
+                    (rows[black_from_pos[1]], cols[black_from_pos[0]]),  # from_pos
+                    (rows[black_to_pos[1]], cols[black_to_pos[0]]),  # to_pos
+                    (
+                        MoveType.EN_PASSANT
+                        if is_black_en_passant
+                        else MoveType.NORMAL_MOVE
+                    ),
+                )
+            )
+
+    return [white_promoted_piece, black_promoted_piece], moves
+
+
+def remove_piece_prefix(move_notation: str) -> str:
+    return move_notation[1:] if move_notation[0].isupper() else move_notation
+
+
+def remove_en_passant_postfix(move_notation: str) -> Tuple[bool, str]:
+    en_passant_found = move_notation.endswith("_e.p.")
+    return en_passant_found, move_notation.removesuffix("_e.p.")
+
+
+def use_seperator(move_notation: str, possible_seperators: List[str]) -> str:
+    for sep in possible_seperators:
+        if sep in move_notation:
+            return sep
+
+    raise ValueError("No seperator in notation found.")
+
+
+def replay_move(
+    board: Board, notation_move: NotationMove, promotion: Optional[str] = None
+) -> None:
+    from_pos, to_pos, move_type = notation_move
+
+    if promotion in PROMOTION_SYMBOLS:
+        piece = board.get_piece(*from_pos)
+        is_black = piece is not None and piece.get_color() == "black"
+        promotion = PROMOTION_SYMBOLS[promotion][is_black]
+
+    if move_type == MoveType.NORMAL_MOVE:
+        board.move(from_pos, to_pos, move_type, promotion)
+    elif move_type == MoveType.EN_PASSANT:
+        board.en_passant_move(from_pos, to_pos)
+    elif move_type == MoveType.CASTLING_MOVE:
+        board.castling_move(from_pos, to_pos)
+    else:
+        raise TypeError("Move Type unknown.")
+
+
+def format_notation_lines(move_notations: List[str]) -> List[str]:
+    """Join the moves of Board.move_notations to lines like "1. e2–e4 e7–e5"."""
+
+    white_moves = move_notations[0::2]
+    black_moves = move_notations[1::2] + [""]
+
+    return [
+        f"{i + 1}. {white_move} {black_move}".rstrip()
+        for i, (white_move, black_move) in enumerate(zip(white_moves, black_moves))
+    ]
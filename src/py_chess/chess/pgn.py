@@ -0,0 +1,373 @@
+"""Standard Algebraic Notation (SAN) and PGN export of games.
+
+The SAN of a move depends on the position before it (disambiguation) and
+after it (check). apply_move() and replay_move() compute it while moving and
+append it to Board.san_notations, so exporting a game only joins the stored
+moves. A mate can only be the last move of a game, its "#" is set from the
+result on export instead of searching for a mate after every check.
+
+Bulk export of notation files (see chess.notation) runs in worker processes:
+
+    python headless.py pgn games.txt games.pgn
+
+iter_pgn_games() and parse_san() read PGN files back, e.g. for the import
+into a game archive.
+"""
+
+import multiprocessing
+import re
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from chess import logic, notation
+from chess.my_types import (
+    NOTATION_PIECE_LETTERS,
+    Board,
+    GameState,
+    MoveType,
+    Piece,
+    square_name,
+)
+from chess.search import parse_square
+
+RESULTS = {
+    GameState.CONTINUE: "*",
+    GameState.CHECKMATE_BLACK: "1-0",
+    GameState.CHECKMATE_WHITE: "0-1",
+    GameState.REMIS: "1/2-1/2",
+}
+
+# Seven Tag Roster, in the order of the export
+DEFAULT_HEADERS = {
+    "Event": "?",
+    "Site": "?",
+    "Date": "????.??.??",
+    "Round": "?",
+    "White": "?",
+    "Black": "?",
+    "Result": "*",
+}
+
+MAX_LINE_LENGTH = 80
+
+PGN_HEADER_PATTERN = re.compile(r'^\[(\w+)\s+"(.*)"\]$')
+# comments and escaped lines, variations are removed separately, they nest
+PGN_COMMENT_PATTERN = re.compile(r"\{[^}]*\}|;[^\n]*|^%[^\n]*", re.MULTILINE)
+PGN_VARIATION_PATTERN = re.compile(r"\([^()]*\)")
+PGN_MOVE_NUMBER_PATTERN = re.compile(r"^\d+\.*")
+SAN_PATTERN = re.compile(r"^([KQRBN])?([a-h])?([1-8])?x?([a-h][1-8])(?:=?([QRBN]))?$")
+
+
+def _disambiguation(board: Board, piece: Piece, to_pos: Tuple[int, int]) -> str:
+    # other pieces of the same kind, which can move to the same square
+    others = [
+        other
+        for other in logic.get_active_pieces(board, piece.get_color())
+        if other is not piece
+        and other.symbol == piece.symbol
+        and to_pos in board._get_possible_moves(other)
+        and to_pos in logic.iter_possible_moves(board, other)
+    ]
+
+    if not others:
+        return ""
+
+    file_name, rank_name = square_name(piece.position)
+
+    if all(other.position[1] != piece.position[1] for other in others):
+        return file_name
+
+    if all(other.position[0] != piece.position[0] for other in others):
+        return rank_name
+
+    return file_name + rank_name
+
+
+def san_move(
+    board: Board,
+    from_pos: Tuple[int, int],
+    to_pos: Tuple[int, int],
+    move_type: MoveType = MoveType.NORMAL_MOVE,
+) -> str:
+    """SAN of a move before it is played, without promotion and check."""
+
+    piece = board.get_piece(*from_pos)
+
+    if piece is None:
+        raise ValueError("Moving piece is None")
+
+    # castling moves the king to the square of the rook, see logic.apply_move()
+    is_castling_move = piece.symbol in ["♔", "♚"] and abs(from_pos[1] - to_pos[1]) > 1
+
+    if move_type == MoveType.CASTLING_MOVE or is_castling_move:
+        return "O-O" if to_pos[1] > from_pos[1] else "O-O-O"
+
+    target = square_name(to_pos)
+
+    if Board.is_pawn(piece):
+        if from_pos[1] != to_pos[1]:  # capture, also en passant
+            return f"{square_name(from_pos)[0]}x{target}"
+
+        return target
+
+    capture = "" if board.get_piece(*to_pos) is None else "x"
+
+    return (
+        NOTATION_PIECE_LETTERS[piece.symbol]
+        + _disambiguation(board, piece, to_pos)
+        + capture
+        + target
+    )
+
+
+def _append_san(board: Board, san: str, is_pawn_move: bool) -> None:
+    _, _, _, promotion_piece = board.last_moves[-1]
+
+    if is_pawn_move and promotion_piece:
+        san += "=" + NOTATION_PIECE_LETTERS[promotion_piece]
+
+    color = board.next_move_color
+    king = board.king_black_piece if color == "black" else board.king_white_piece
+
+    if board.threatened_by_enemy(board.get_square(*king.position), king):
+        san += "+"
+
+    board.san_notations.append(san)
+
+
+def apply_move(
+    board: Board, from_pos: Tuple[int, int], to_pos: Tuple[int, int]
+) -> None:
+    """logic.apply_move(), which also appends the SAN of the move."""
+
+    san = san_move(board, from_pos, to_pos)
+    is_pawn_move = Board.is_pawn(board.get_piece(*from_pos))
+    plies = len(board.last_moves)
+
+    logic.apply_move(board, from_pos, to_pos)
+
+    # a refused castling does not move
+    if len(board.last_moves) != plies:
+        _append_san(board, san, is_pawn_move)
+
+
+def replay_move(
+    board: Board,
+    notation_move: notation.NotationMove,
+    promotion: Optional[str] = None,
+) -> None:
+    """notation.replay_move(), which also appends the SAN of the move."""
+
+    from_pos, to_pos, move_type = notation_move
+    san = san_move(board, from_pos, to_pos, move_type)
+    is_pawn_move = Board.is_pawn(board.get_piece(*from_pos))
+
+    notation.replay_move(board, notation_move, promotion)
+    _append_san(board, san, is_pawn_move)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"')
+
+
+def format_pgn(
+    san_notations: List[str],
+    headers: Optional[Dict[str, str]] = None,
+    result: str = "*",
+) -> str:
+    """PGN of a game, the movetext is wrapped at MAX_LINE_LENGTH."""
+
+    headers = {**DEFAULT_HEADERS, **(headers or {}), "Result": result}
+    lines = [f'[{name} "{_escape(value)}"]' for name, value in headers.items()]
+    lines.append("")
+
+    tokens = []
+
+    # the move number stays on the line of the white move
+    for i, san in enumerate(san_notations):
+        tokens.append(f"{i // 2 + 1}. {san}" if i % 2 == 0 else san)
+
+    tokens.append(result)
+
+    line = ""
+
+    for token in tokens:
+        if line and len(line) + 1 + len(token) > MAX_LINE_LENGTH:
+            lines.append(line)
+            line = token
+        else:
+            line = f"{line} {token}" if line else token
+
+    lines.append(line)
+
+    return "\n".join(lines) + "\n"
+
+
+def export_board(board: Board, headers: Optional[Dict[str, str]] = None) -> str:
+    """PGN of the moves of board, the game state is evaluated once here."""
+
+    game_state = logic.get_game_state(board)
+    san_notations = board.san_notations
+
+    is_checkmate = game_state in [GameState.CHECKMATE_BLACK, GameState.CHECKMATE_WHITE]
+
+    if is_checkmate and san_notations:
+        san_notations = san_notations[:-1] + [san_notations[-1].rstrip("+") + "#"]
+
+    return format_pgn(san_notations, headers, RESULTS[game_state])
+
+
+def export_game(
+    chess_notations: List[str], headers: Optional[Dict[str, str]] = None
+) -> str:
+    """PGN of a game given as notation lines like "1. e2–e4 e7–e5".
+
+    A game which can not be replayed completely is exported up to the
+    failing move, with the result "*" and the error as comment.
+    """
+
+    board = Board(None)
+
+    try:
+        for chess_notation in chess_notations:
+            promotions, moves = notation.parse_notation(chess_notation)
+
+            for i, move in enumerate(moves):
+                replay_move(board, move, promotions[i])
+    except (ValueError, KeyError, IndexError, TypeError) as e:
+        pgn = format_pgn(board.san_notations, headers)
+        return pgn.removesuffix("*\n") + f"{{replay failed: {e}}} *\n"
+
+    return export_board(board, headers)
+
+
+def _export_job(job: Tuple[int, List[str], Dict[str, str]]) -> str:
+    round_number, chess_notations, headers = job
+    return export_game(chess_notations, {**headers, "Round": str(round_number)})
+
+
+def export_games(
+    games: Iterable[List[str]],
+    headers: Optional[Dict[str, str]] = None,
+    processes: Optional[int] = None,
+) -> Iterator[str]:
+    """PGN of every game, in the order of games.
+
+    The games are replayed in a process pool, processes=1 replays them in
+    the calling process.
+    """
+
+    jobs = (
+        (round_number, game, headers or {})
+        for round_number, game in enumerate(games, start=1)
+    )
+
+    if processes == 1:
+        yield from map(_export_job, jobs)
+        return
+
+    with multiprocessing.Pool(processes) as pool:
+        yield from pool.imap(_export_job, jobs, chunksize=4)
+
+
+def parse_san(board: Board, san: str) -> Tuple[notation.NotationMove, Optional[str]]:
+    """Move and promotion letter of a SAN move on board.
+
+    Superfluous disambiguation is accepted, a move matching no or more than
+    one piece raises ValueError.
+    """
+
+    text = san.rstrip("+#!?")
+    color = board.next_move_color
+    king = board.king_black_piece if color == "black" else board.king_white_piece
+
+    if text in ["O-O", "0-0", "O-O-O", "0-0-0"]:
+        rook_j = 7 if text in ["O-O", "0-0"] else 0
+        castling_move = (king.position, (king.position[0], rook_j))
+        return (*castling_move, MoveType.CASTLING_MOVE), None
+
+    match = SAN_PATTERN.match(text)
+
+    if match is None:
+        raise ValueError(f"Invalid SAN '{san}'.")
+
+    letter, from_file, from_rank, target, promotion = match.groups()
+    to_pos = parse_square(target)
+
+    candidates = [
+        piece
+        for piece in logic.get_active_pieces(board, color)
+        if NOTATION_PIECE_LETTERS.get(piece.symbol) == letter
+        and from_file in [None, square_name(piece.position)[0]]
+        and from_rank in [None, square_name(piece.position)[1]]
+        and to_pos in board._get_possible_moves(piece)
+    ]
+
+    if len(candidates) > 1:
+        candidates = [
+            piece
+            for piece in candidates
+            if to_pos in logic.iter_possible_moves(board, piece)
+        ]
+
+    if len(candidates) != 1:
+        raise ValueError(f"No unique move for SAN '{san}'.")
+
+    from_pos = candidates[0].position
+    is_en_passant = (
+        letter is None and from_pos[1] != to_pos[1] and board.get_piece(*to_pos) is None
+    )
+    move_type = MoveType.EN_PASSANT if is_en_passant else MoveType.NORMAL_MOVE
+
+    return (from_pos, to_pos, move_type), promotion
+
+
+def _movetext_sans(movetext: str) -> List[str]:
+    text = PGN_COMMENT_PATTERN.sub(" ", movetext)
+
+    while True:
+        text, removed = PGN_VARIATION_PATTERN.subn(" ", text)
+
+        if not removed:
+            break
+
+    sans = []
+
+    for token in text.split():
+        if token in RESULTS.values():
+            continue
+
+        token = PGN_MOVE_NUMBER_PATTERN.sub("", token)
+
+        if token and not token.startswith("$"):
+            sans.append(token)
+
+    return sans
+
+
+def iter_pgn_games(lines: Iterable[str]) -> Iterator[Tuple[Dict[str, str], List[str]]]:
+    """Headers and SAN moves of the games of a PGN file."""
+
+    headers: Dict[str, str] = {}
+    movetext: List[str] = []
+
+    for line in lines:
+        line = line.strip()
+        match = PGN_HEADER_PATTERN.match(line)
+
+        if match is not None:
+            if movetext:
+                yield headers, _movetext_sans("\n".join(movetext))
+                headers, movetext = {}, []
+
+            name, value = match.groups()
+            headers[name] = value.replace('\\"', '"').replace("\\\\", "\\")
+        elif line:
+            movetext.append(line)
+
+            # the result ends the movetext of a game
+            if line.split()[-1] in RESULTS.values():
+                yield headers, _movetext_sans("\n".join(movetext))
+                headers, movetext = {}, []
+
+    if headers or movetext:
+        yield headers, _movetext_sans("\n".join(movetext))
@@ -0,0 +1,185 @@
+"""Batches of positions in shared memory for worker processes.
+
+The positions are packed with Board.pack_into() at a fixed stride of
+SNAPSHOT_SIZE into one SharedMemory block, the results are written by the
+workers into a second block of RESULT_STRUCT records. A task is only the
+names of both blocks and a range of indices, so no Board is pickled.
+
+    with PositionBatch.create(boards) as batch:
+        batch.evaluate(processes=4, depth=1)
+        scores = [batch.result(i) for i in range(len(batch))]
+"""
+
+import struct
+from multiprocessing.pool import Pool
+from multiprocessing.shared_memory import SharedMemory
+from typing import List, Optional, Sequence, Tuple
+
+from chess import logic
+from chess.my_types import SNAPSHOT_SIZE, Board, GameState
+from chess.search import Search, SearchInfo, SearchLimits, evaluate
+
+# score (centipawns from the view of the side to move), legal moves, status
+RESULT_STRUCT = struct.Struct("<iHBx")
+RESULT_SIZE = RESULT_STRUCT.size
+
+# status of a result, 0: not evaluated yet
+STATUS_CODES = {
+    GameState.CONTINUE: 1,
+    GameState.CHECKMATE_BLACK: 2,
+    GameState.CHECKMATE_WHITE: 3,
+    GameState.REMIS: 4,
+}
+STATUS_ERROR = 255
+
+# positions per task, see PositionBatch.evaluate()
+DEFAULT_TASK_SIZE = 64
+
+# positions_name, results_name, start, stop, depth
+BatchTask = Tuple[str, str, int, int, int]
+# score, legal moves, status
+PositionResult = Tuple[int, int, int]
+
+
+def evaluate_position(board: Board, depth: int = 0) -> PositionResult:
+    """Score, legal move count and status code of a position.
+
+    depth 0 scores by material, a greater depth runs a Search. depth -1 only
+    scores by material and skips the legal moves and the status, e.g. to
+    measure the dispatch.
+    """
+
+    if depth < 0:
+        return evaluate(board), 0, STATUS_CODES[GameState.CONTINUE]
+
+    legal_moves = logic.count_legal_moves(board, board.next_move_color)
+    status = STATUS_CODES[logic.get_game_state(board)]
+
+    if depth:
+        infos: List[SearchInfo] = []
+        Search(board, SearchLimits(depth=depth), infos.append).run()
+        score = infos[-1].score if infos else evaluate(board)
+    else:
+        score = evaluate(board)
+
+    return score, min(legal_moves, 0xFFFF), status
+
+
+def evaluate_range(task: BatchTask) -> int:
+    """Evaluate the positions start to stop of a batch, runs in a worker."""
+
+    positions_name, results_name, start, stop, depth = task
+    positions = SharedMemory(positions_name)
+    results = SharedMemory(results_name)
+
+    try:
+        for index in range(start, stop):
+            board = Board.from_bytes(positions.buf, index * SNAPSHOT_SIZE)
+
+            try:
+                result = evaluate_position(board, depth)
+            except (ValueError, KeyError, IndexError, TypeError):
+                result = (0, 0, STATUS_ERROR)
+
+            RESULT_STRUCT.pack_into(results.buf, index * RESULT_SIZE, *result)
+    finally:
+        positions.close()
+        results.close()
+
+    return stop - start
+
+
+class PositionBatch:
+    """Positions and results of a batch in two shared memory blocks.
+
+    The creating process owns the blocks, close() releases them there.
+    """
+
+    def __init__(self, positions: SharedMemory, results: SharedMemory, count: int):
+        self.positions = positions
+        self.results = results
+        self.count = count
+
+    @classmethod
+    def create(cls, boards: Sequence[Board]) -> "PositionBatch":
+        count = len(boards)
+        blocks: List[SharedMemory] = []
+
+        try:
+            # SharedMemory needs at least one byte
+            positions = SharedMemory(create=True, size=max(count * SNAPSHOT_SIZE, 1))
+            blocks.append(positions)
+            results = SharedMemory(create=True, size=max(count * RESULT_SIZE, 1))
+            blocks.append(results)
+
+            # zeroed results are "not evaluated yet"
+            results.buf[: count * RESULT_SIZE] = bytes(count * RESULT_SIZE)
+
+            for index, board in enumerate(boards):
+                board.pack_into(positions.buf, index * SNAPSHOT_SIZE)
+        except BaseException:
+            # created blocks stay in /dev/shm unless unlinked
+            for block in blocks:
+                block.close()
+                block.unlink()
+
+            raise
+
+        return cls(positions, results, count)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def board(self, index: int) -> Board:
+        return Board.from_bytes(self.positions.buf, index * SNAPSHOT_SIZE)
+
+    def result(self, index: int) -> PositionResult:
+        return RESULT_STRUCT.unpack_from(self.results.buf, index * RESULT_SIZE)
+
+    def tasks(
+        self, task_size: int = DEFAULT_TASK_SIZE, depth: int = 0
+    ) -> List[BatchTask]:
+        return [
+            (
+                self.positions.name,
+                self.results.name,
+                start,
+                min(start + task_size, self.count),
+                depth,
+            )
+            for start in range(0, self.count, task_size)
+        ]
+
+    def evaluate(
+        self,
+        processes: Optional[int] = None,
+        depth: int = 0,
+        task_size: int = DEFAULT_TASK_SIZE,
+        pool: Optional[Pool] = None,
+    ) -> None:
+        """Fill the results in pool or in a new process pool.
+
+        A given pool should be created after the batch: its workers then
+        share the resource tracker, which already knows the blocks, instead
+        of starting their own ones, which would warn about leaked blocks.
+        """
+
+        if pool is None:
+            with Pool(processes) as new_pool:
+                self.evaluate(processes, depth, task_size, new_pool)
+
+            return
+
+        for _ in pool.imap_unordered(evaluate_range, self.tasks(task_size, depth)):
+            pass
+
+    def close(self) -> None:
+        for block in [self.positions, self.results]:
+            block.close()
+            block.unlink()
+
+    def __enter__(self) -> "PositionBatch":
+        return self
+
+    def __exit__(self, *_: object) -> None:
+        self.close()
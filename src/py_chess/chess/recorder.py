@@ -0,0 +1,199 @@
+"""Streaming game recordings in the notation of the replay manager.
+
+Every move is appended to the recording file as soon as it is played, so a
+crash loses at most the moves since the last fsync. The files are written by
+one shared background thread: recording a move only puts it into a queue and
+never blocks the caller, any number of recordings can run at once.
+
+The file holds the usual notation lines ("1. e2–e4 e7–e5"), a white move
+starts a line and the black move completes it. A line torn by a crash is
+dropped by read_notation_lines() and by the game list of the replay manager.
+"""
+
+import logging
+import os
+import queue
+import threading
+import time
+from typing import IO, Dict, Iterable, List, Optional, Tuple
+
+from chess import notation
+
+FSYNC_INTERVAL_IN_SEC = 1.0
+
+logger = logging.getLogger(__name__)
+
+# (recorder, text) appends text, (recorder, None) closes the file and
+# (None, None) syncs all files
+_Job = Tuple[Optional["GameRecorder"], Optional[str]]
+
+
+class _RecordingWriter:
+    """The background thread writing the files of all recorders."""
+
+    def __init__(self, fsync_interval_in_sec: float = FSYNC_INTERVAL_IN_SEC) -> None:
+        self.fsync_interval_in_sec = fsync_interval_in_sec
+        self.jobs: "queue.Queue[_Job]" = queue.Queue()
+        self.files: Dict[int, IO[str]] = {}
+        self.dirty: Dict[int, IO[str]] = {}
+        self.thread = threading.Thread(
+            target=self._run, name="recording-writer", daemon=True
+        )
+        self.thread.start()
+
+    def _run(self) -> None:
+        last_fsync = time.monotonic()
+
+        while True:
+            timeout = max(
+                0.0, last_fsync + self.fsync_interval_in_sec - time.monotonic()
+            )
+
+            try:
+                job: Optional[_Job] = self.jobs.get(
+                    timeout=timeout if self.dirty else None
+                )
+            except queue.Empty:
+                job = None
+
+            if job is not None and job[0] is not None:
+                recorder, text = job
+
+                try:
+                    self._handle(recorder, text)
+                except OSError:
+                    logger.exception("recording failed path=%s", recorder.path)
+
+            if (
+                job == (None, None)
+                or time.monotonic() - last_fsync >= self.fsync_interval_in_sec
+            ):
+                self._sync()
+                last_fsync = time.monotonic()
+
+            if job is not None:
+                self.jobs.task_done()
+
+    def _handle(self, recorder: "GameRecorder", text: Optional[str]) -> None:
+        key = id(recorder)
+        f = self.files.get(key)
+
+        if text is None:
+            if f is not None:
+                self._sync_file(f)
+                f.close()
+                del self.files[key]
+                self.dirty.pop(key, None)
+            return
+
+        if f is None:
+            f = self.files[key] = open(recorder.path, "a", encoding="utf8")
+
+        f.write(text)
+        self.dirty[key] = f
+
+    @staticmethod
+    def _sync_file(f: IO[str]) -> None:
+        f.flush()
+        os.fsync(f.fileno())
+
+    def _sync(self) -> None:
+        for f in self.dirty.values():
+            try:
+                self._sync_file(f)
+            except OSError:
+                logger.exception("fsync of recording failed name=%s", f.name)
+
+        self.dirty.clear()
+
+
+_writer: Optional[_RecordingWriter] = None
+_writer_lock = threading.Lock()
+
+
+def _get_writer() -> _RecordingWriter:
+    global _writer
+
+    with _writer_lock:
+        if _writer is None:
+            _writer = _RecordingWriter()
+
+        return _writer
+
+
+def flush() -> None:
+    """Wait until every queued move of all recorders is written and synced."""
+
+    if _writer is not None:
+        _writer.jobs.put((None, None))
+        _writer.jobs.join()
+
+
+class GameRecorder:
+    """Appends the moves of one game to a file, see the module docstring."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.plies = 0
+        self.closed = False
+        self._writer = _get_writer()
+
+    def __enter__(self) -> "GameRecorder":
+        return self
+
+    def __exit__(self, *_: object) -> None:
+        self.close()
+
+    def record(self, move_notations: Iterable[str]) -> None:
+        """Queue moves as given by Board.move_notations."""
+
+        if self.closed:
+            raise ValueError(f"Recording {self.path} is closed.")
+
+        text = ""
+
+        for move_notation in move_notations:
+            if self.plies % 2 == 0:
+                text += f"{self.plies // 2 + 1}. {move_notation}"
+            else:
+                text += f" {move_notation}\n"
+
+            self.plies += 1
+
+        if text:
+            self._writer.jobs.put((self, text))
+
+    def close(self) -> None:
+        """Complete the last line, fsync and close the file, without waiting."""
+
+        if self.closed:
+            return
+
+        if self.plies % 2 == 1:
+            self._writer.jobs.put((self, "\n"))
+
+        self._writer.jobs.put((self, None))
+        self.closed = True
+
+
+def read_notation_lines(path: str) -> List[str]:
+    """The notation lines of a recording or game file.
+
+    An unterminated last line is kept if it parses, else it is the torn
+    write of a crash and is dropped.
+    """
+
+    with open(path, encoding="utf8") as f:
+        lines = f.read().split("\n")
+
+    last_line = lines.pop().strip()
+
+    if last_line:
+        try:
+            notation.parse_notation(last_line)
+        except (ValueError, KeyError, IndexError):
+            logger.warning("dropped torn line path=%s line=%r", path, last_line)
+        else:
+            lines.append(last_line)
+
+    return [line.strip() for line in lines if line.strip()]
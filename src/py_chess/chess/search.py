@@ -0,0 +1,287 @@
+"""Iterative deepening alpha-beta search over chess.logic.
+
+Moves are (from_pos, to_pos, promotion) with the promotion as letter
+("Q", "R", "B", "N") or None. Castlings are given as king to rook square,
+like everywhere in chess.logic; to_uci()/from_uci() convert to and from the
+long algebraic notation of UCI ("e1g1").
+
+A search is stopped by its stop event, its node limit or its deadline and
+then returns the best move of the last completed depth.
+"""
+
+import threading
+import time
+from copy import deepcopy
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional, Tuple
+
+from chess import logic
+from chess.my_types import MATERIAL_VALUES, Board, MoveType, square_name
+from chess.notation import PROMOTION_SYMBOLS
+
+MATE_SCORE = 100000
+
+# centipawns
+PIECE_VALUES = {symbol: value * 100 for symbol, value in MATERIAL_VALUES.items()}
+
+Move = Tuple[Tuple[int, int], Tuple[int, int], Optional[str]]
+
+
+class SearchStopped(Exception):
+    pass
+
+
+@dataclass
+class SearchLimits:
+    depth: Optional[int] = None
+    nodes: Optional[int] = None
+    movetime_in_sec: Optional[float] = None
+    # search until stopped, also after a forced mate is found
+    infinite: bool = False
+
+
+@dataclass
+class SearchInfo:
+    depth: int
+    score: int
+    nodes: int
+    elapsed_in_sec: float
+    pv: List[Move] = field(default_factory=list)
+
+    @property
+    def nps(self) -> int:
+        return int(self.nodes / self.elapsed_in_sec) if self.elapsed_in_sec else 0
+
+    @property
+    def mate_in(self) -> Optional[int]:
+        """Moves to mate, negative if the side to move gets mated."""
+
+        if abs(self.score) < MATE_SCORE - 1000:
+            return None
+
+        plies = MATE_SCORE - abs(self.score)
+        moves = (plies + 1) // 2
+        return moves if self.score > 0 else -moves
+
+
+def evaluate(board: Board) -> int:
+    """Material balance from the view of the side to move."""
+
+    # the values are 100 times the ones of Board.material_balance
+    score = board.material_balance * PIECE_VALUES["♙"]
+    return score if board.next_move_color == "white" else -score
+
+
+def is_in_check(board: Board, color: Optional[str] = None) -> bool:
+    color = color or board.next_move_color
+    king = board.king_black_piece if color == "black" else board.king_white_piece
+    return board.threatened_by_enemy(board.get_square(*king.position), king)
+
+
+def is_promotion(
+    board: Board, from_pos: Tuple[int, int], to_pos: Tuple[int, int]
+) -> bool:
+    return Board.is_pawn(board.get_piece(*from_pos)) and to_pos[0] in [0, 7]
+
+
+def play_move(board: Board, move: Move) -> None:
+    from_pos, to_pos, promotion = move
+
+    if is_promotion(board, from_pos, to_pos):
+        symbols = PROMOTION_SYMBOLS[promotion or "Q"]
+        symbol = symbols[board.next_move_color == "black"]
+        board.move(from_pos, to_pos, MoveType.PROMOTION, symbol)
+    else:
+        logic.apply_move(board, from_pos, to_pos)
+
+
+def get_moves(board: Board) -> List[Move]:
+    """Legal moves, promotions to a queen only.
+
+    In check, chess.logic also lists moves which do not resolve the check
+    if no move does, see _negamax().
+    """
+
+    return [
+        (from_pos, to_pos, "Q" if is_promotion(board, from_pos, to_pos) else None)
+        for from_pos, to_pos in logic.iter_legal_moves(board, board.next_move_color)
+    ]
+
+
+def to_uci(board: Board, move: Move) -> str:
+    from_pos, to_pos, promotion = move
+    to_i, to_j = to_pos
+
+    piece = board.get_piece(*from_pos)
+
+    if piece is not None and piece.symbol in ["♔", "♚"]:
+        if abs(from_pos[1] - to_j) > 1:
+            to_j = 6 if to_j > from_pos[1] else 2
+
+    return (
+        square_name(from_pos)
+        + square_name((to_i, to_j))
+        + (promotion.lower() if promotion else "")
+    )
+
+
+def pv_to_uci(board: Board, pv: List[Move]) -> List[str]:
+    """UCI moves of a principal variation starting at board."""
+
+    uci_moves = []
+
+    for i, move in enumerate(pv):
+        uci_moves.append(to_uci(board, move))
+
+        # castlings depend on the position before the move
+        if i < len(pv) - 1:
+            board = Board.from_bytes(board.to_bytes())
+            play_move(board, move)
+
+    return uci_moves
+
+
+def parse_square(name: str) -> Tuple[int, int]:
+    if len(name) != 2 or name[0] not in "abcdefgh" or name[1] not in "12345678":
+        raise ValueError(f"Invalid square '{name}'.")
+
+    return 8 - int(name[1]), "abcdefgh".index(name[0])
+
+
+def from_uci(board: Board, text: str) -> Move:
+    from_pos = parse_square(text[0:2])
+    to_pos = parse_square(text[2:4])
+    promotion = text[4:].upper() or None
+
+    if promotion is not None and promotion not in PROMOTION_SYMBOLS:
+        raise ValueError(f"Invalid promotion '{text}'.")
+
+    piece = board.get_piece(*from_pos)
+
+    if piece is not None and piece.symbol in ["♔", "♚"]:
+        if abs(from_pos[1] - to_pos[1]) == 2:
+            to_pos = (to_pos[0], 7 if to_pos[1] > from_pos[1] else 0)
+
+    return from_pos, to_pos, promotion
+
+
+class Search:
+    def __init__(
+        self,
+        board: Board,
+        limits: Optional[SearchLimits] = None,
+        on_info: Optional[Callable[[SearchInfo], None]] = None,
+        stop_event: Optional[threading.Event] = None,
+    ) -> None:
+        self.board = board
+        self.limits = limits or SearchLimits()
+        self.on_info = on_info
+        self.stop_event = stop_event or threading.Event()
+        self.nodes = 0
+        self.deadline: Optional[float] = None
+        self.pv: List[Move] = []
+
+    def stop(self) -> None:
+        self.stop_event.set()
+
+    def _check_limits(self) -> None:
+        if (
+            self.stop_event.is_set()
+            or (self.limits.nodes is not None and self.nodes >= self.limits.nodes)
+            or (self.deadline is not None and time.perf_counter() >= self.deadline)
+        ):
+            raise SearchStopped()
+
+    def run(self) -> Optional[Move]:
+        """Search until a limit is reached, returns the best move."""
+
+        start = time.perf_counter()
+
+        if self.limits.movetime_in_sec is not None:
+            self.deadline = start + self.limits.movetime_in_sec
+
+        moves = get_moves(self.board)
+
+        if not moves:
+            return None
+
+        best_move = moves[0]
+        depth = 0
+
+        while self.limits.depth is None or depth < self.limits.depth:
+            depth += 1
+
+            try:
+                score, pv = self._negamax(self.board, depth, -MATE_SCORE, MATE_SCORE, 0)
+            except SearchStopped:
+                break
+
+            if not pv:  # checkmate or stalemate
+                return None
+
+            self.pv = pv
+            best_move = pv[0]
+
+            if self.on_info is not None:
+                self.on_info(
+                    SearchInfo(
+                        depth, score, self.nodes, time.perf_counter() - start, pv
+                    )
+                )
+
+            # a forced mate can not get better
+            if not self.limits.infinite and abs(score) >= MATE_SCORE - depth:
+                break
+
+        return best_move
+
+    def _negamax(
+        self, board: Board, depth: int, alpha: int, beta: int, ply: int
+    ) -> Tuple[int, List[Move]]:
+        self.nodes += 1
+        self._check_limits()
+
+        if depth == 0:
+            return evaluate(board), []
+
+        if ply > 0 and board.is_draw():
+            return 0, []
+
+        moves = get_moves(board)
+
+        # principal variation first, then captures of the most valuable piece
+        def order(move: Move) -> Tuple[bool, int]:
+            captured = board.get_piece(*move[1])
+            value = abs(PIECE_VALUES[captured.symbol]) if captured else 0
+            return len(self.pv) > ply and self.pv[ply] == move, value
+
+        moves.sort(key=order, reverse=True)
+
+        best_score = -MATE_SCORE - 1
+        best_pv: List[Move] = []
+
+        color = board.next_move_color
+
+        for move in moves:
+            child = deepcopy(board)
+            play_move(child, move)
+
+            if is_in_check(child, color):
+                continue
+
+            score, pv = self._negamax(child, depth - 1, -beta, -alpha, ply + 1)
+            score = -score
+
+            if score > best_score:
+                best_score = score
+                best_pv = [move, *pv]
+
+            alpha = max(alpha, score)
+
+            if alpha >= beta:
+                break
+
+        if not best_pv:  # no legal move
+            return (-MATE_SCORE + ply if is_in_check(board) else 0), []
+
+        return best_score, best_pv
@@ -0,0 +1,360 @@
+"""Statistics of large game collections, aggregated in NumPy arrays.
+
+    python -m database.game_analytics stats/ games.txt more.pgn games.pgca
+
+The games of notation files (.txt), PGN files (.pgn) and game archives
+(.pgca) are replayed in chunks in a process pool. Every chunk fills its own
+GameStatistics, whose arrays are merged into the total one, so the memory
+depends on the number of chunks in flight, not on the number of games.
+
+Squares are indexed i * 8 + j, row 0 is rank 8 (a8 = 0, h1 = 63). Written
+to the output directory:
+    lengths.npy/.csv     games per length in plies, the last bin collects
+                         MAX_PLIES and more
+    captures.npy         captures per square (2, 8, 8), white and black as
+                         capturing side, captures_white/black.csv as boards
+    survival.npy/.csv    share of the pieces per kind (PIECE_SYMBOLS) still
+                         on the board at each ply of the games reaching it
+    openings.npy/.csv    move codes (encode_move()) of the first plies and
+                         the number of games, most frequent first
+    summary.csv          games, plies, errors, checks and castlings
+"""
+
+import argparse
+import csv
+import os
+import sys
+import time
+from collections import deque
+from multiprocessing import Pool
+from typing import Any, Callable, Deque, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from chess import notation
+from chess.my_types import Board, MoveType
+from chess.search import is_in_check
+from database.game_archive import (
+    ArchiveMove,
+    GameArchive,
+    decode_move,
+    encode_move,
+    iter_file_games,
+    pgn_game_moves,
+    text_game_moves,
+)
+
+PIECE_SYMBOLS = "♙♘♗♖♕♔♟♞♝♜♛♚"
+PIECE_NAMES = [
+    f"{color} {name}"
+    for color in ["white", "black"]
+    for name in ["pawn", "knight", "bishop", "rook", "queen", "king"]
+]
+INITIAL_PIECES = np.array([8, 2, 2, 2, 1, 1] * 2, dtype=np.int64)
+
+# plies covered by the length histogram and the survival curves
+MAX_PLIES = 300
+OPENING_PLIES = 4
+CHUNK_SIZE = 64
+
+# white, black x kingside, queenside
+CASTLING_SIDES = ["kingside", "queenside"]
+
+# kind, game (lines or SAN moves) or (archive path, first, stop)
+AnalyticsJob = Tuple[str, Any]
+
+
+class GameStatistics:
+    """Counters of a set of games, merged with merge()."""
+
+    def __init__(self, opening_plies: int = OPENING_PLIES) -> None:
+        self.opening_plies = opening_plies
+        self.games = 0
+        self.errors = 0
+        self.lengths = np.zeros(MAX_PLIES + 1, dtype=np.int64)
+        self.captures = np.zeros((2, 64), dtype=np.int64)
+        # pieces on the board summed over the games reaching the ply
+        self.alive = np.zeros((len(PIECE_SYMBOLS), MAX_PLIES + 1), dtype=np.int64)
+        self.reaching = np.zeros(MAX_PLIES + 1, dtype=np.int64)
+        # per color: checks given, games with a check given
+        self.checks = np.zeros((2, 2), dtype=np.int64)
+        self.castlings = np.zeros((2, len(CASTLING_SIDES)), dtype=np.int64)
+        # distinct openings and their number of games
+        self.openings = np.zeros((0, opening_plies), dtype=np.uint16)
+        self.opening_counts = np.zeros(0, dtype=np.int64)
+
+    def add_game(self, board: Board, moves: Iterable[ArchiveMove]) -> None:
+        """Replay moves on board and count them, a move which can not be
+        replayed ends the game and counts as error."""
+
+        plies = 0
+        # change of the pieces per kind at each ply
+        delta = np.zeros((len(PIECE_SYMBOLS), MAX_PLIES + 1), dtype=np.int64)
+        opening = np.zeros(self.opening_plies, dtype=np.uint16)
+        checked = [False, False]
+
+        try:
+            for move, promotion in moves:
+                from_pos, to_pos, move_type = move
+                color = 0 if board.next_move_color == "white" else 1
+                ply = min(plies + 1, MAX_PLIES)
+                to_index = to_pos[0] * 8 + to_pos[1]
+
+                if plies < self.opening_plies:
+                    opening[plies] = encode_move(move, promotion)
+
+                if move_type == MoveType.CASTLING_MOVE:
+                    self.castlings[color, 0 if to_pos[1] == 7 else 1] += 1
+                elif move_type == MoveType.EN_PASSANT:
+                    self.captures[color, to_index] += 1
+                    delta[PIECE_SYMBOLS.index("♟♙"[color]), ply] -= 1
+                else:
+                    captured = board.get_piece(*to_pos)
+
+                    if captured is not None:
+                        self.captures[color, to_index] += 1
+                        delta[PIECE_SYMBOLS.index(captured.symbol), ply] -= 1
+
+                    if promotion:
+                        promoted = notation.PROMOTION_SYMBOLS[promotion][color]
+                        delta[PIECE_SYMBOLS.index("♙♟"[color]), ply] -= 1
+                        delta[PIECE_SYMBOLS.index(promoted), ply] += 1
+
+                notation.replay_move(board, move, promotion)
+                plies += 1
+
+                if is_in_check(board):
+                    self.checks[color, 0] += 1
+                    checked[color] = True
+        except (ValueError, KeyError, IndexError, TypeError):
+            self.errors += 1
+
+        length = min(plies, MAX_PLIES)
+        self.games += 1
+        self.lengths[length] += 1
+        self.checks[:, 1] += checked
+        self.alive[:, : length + 1] += (
+            INITIAL_PIECES[:, None] + np.cumsum(delta, axis=1)[:, : length + 1]
+        )
+        self.reaching[: length + 1] += 1
+        self._add_openings(opening[None, :], np.ones(1, dtype=np.int64))
+
+    def _add_openings(self, openings: np.ndarray, counts: np.ndarray) -> None:
+        openings = np.concatenate([self.openings, openings])
+        counts = np.concatenate([self.opening_counts, counts])
+        self.openings, inverse = np.unique(openings, axis=0, return_inverse=True)
+        self.opening_counts = np.bincount(
+            inverse.reshape(-1), weights=counts, minlength=len(self.openings)
+        ).astype(np.int64)
+
+    def merge(self, other: "GameStatistics") -> None:
+        self.games += other.games
+        self.errors += other.errors
+
+        for name in ["lengths", "captures", "alive", "reaching", "checks", "castlings"]:
+            getattr(self, name)[...] += getattr(other, name)
+
+        self._add_openings(other.openings, other.opening_counts)
+
+    def survival(self) -> np.ndarray:
+        """Share of the initial pieces per kind on the board at each ply."""
+
+        reaching = np.maximum(self.reaching, 1)
+        return self.alive / (INITIAL_PIECES[:, None] * reaching)
+
+    def save(self, directory: str) -> None:
+        os.makedirs(directory, exist_ok=True)
+
+        def path(name: str) -> str:
+            return os.path.join(directory, name)
+
+        np.save(path("lengths.npy"), self.lengths)
+        np.save(path("captures.npy"), self.captures.reshape(2, 8, 8))
+        np.save(path("survival.npy"), self.survival())
+        order = np.argsort(-self.opening_counts, kind="stable")
+        np.save(path("openings.npy"), self.openings[order])
+        np.save(path("opening_counts.npy"), self.opening_counts[order])
+
+        _write_csv(
+            path("lengths.csv"),
+            ["plies", "games"],
+            [[ply, games] for ply, games in enumerate(self.lengths.tolist())],
+        )
+
+        for color, name in enumerate(["white", "black"]):
+            _write_csv(
+                path(f"captures_{name}.csv"),
+                ["rank", *"abcdefgh"],
+                [
+                    [8 - i, *row]
+                    for i, row in enumerate(self.captures[color].reshape(8, 8).tolist())
+                ],
+            )
+
+        survival = self.survival()
+        _write_csv(
+            path("survival.csv"),
+            ["ply", "games", *PIECE_NAMES],
+            [
+                [ply, self.reaching[ply], *np.round(survival[:, ply], 4).tolist()]
+                for ply in range(MAX_PLIES + 1)
+                if self.reaching[ply]
+            ],
+        )
+        _write_csv(
+            path("openings.csv"),
+            ["opening", "games"],
+            [
+                [_opening_name(self.openings[index]), self.opening_counts[index]]
+                for index in order
+            ],
+        )
+
+        summary = [
+            ["games", self.games],
+            ["errors", self.errors],
+            ["plies", int(self.lengths @ np.arange(MAX_PLIES + 1))],
+        ]
+
+        for color, name in enumerate(["white", "black"]):
+            summary += [
+                [f"checks {name}", self.checks[color, 0]],
+                [f"games with check {name}", self.checks[color, 1]],
+            ]
+            summary += [
+                [f"castlings {name} {side}", self.castlings[color, index]]
+                for index, side in enumerate(CASTLING_SIDES)
+            ]
+
+        _write_csv(path("summary.csv"), ["statistic", "value"], summary)
+
+
+def _write_csv(path: str, header: List[str], rows: Iterable[List[Any]]) -> None:
+    with open(path, "w", encoding="utf8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+
+
+def _opening_name(codes: np.ndarray) -> str:
+    names = []
+
+    # code 0 (a8a8) pads games shorter than the opening
+    for code in codes.tolist():
+        if code:
+            (from_pos, to_pos, _), promotion = decode_move(code)
+            names.append(notation.move_name(from_pos, to_pos) + (promotion or ""))
+
+    return " ".join(names)
+
+
+def analyse_chunk(job: Tuple[List[AnalyticsJob], int]) -> GameStatistics:
+    """Statistics of a chunk of games, runs in a worker process."""
+
+    games, opening_plies = job
+    statistics = GameStatistics(opening_plies)
+
+    for kind, game in games:
+        if kind == "archive":
+            path, first, stop = game
+
+            with GameArchive(path) as archive:
+                for game_id in range(first, stop):
+                    statistics.add_game(Board(None), archive.moves(game_id))
+        elif kind == "pgn":
+            board = Board(None)
+            statistics.add_game(board, pgn_game_moves(board, game))
+        else:
+            statistics.add_game(Board(None), text_game_moves(game))
+
+    return statistics
+
+
+def _jobs(paths: Iterable[str], chunk_size: int) -> Iterator[List[AnalyticsJob]]:
+    chunk: List[AnalyticsJob] = []
+
+    for path in paths:
+        if path.lower().endswith(".pgca"):
+            with GameArchive(path) as archive:
+                games = len(archive)
+
+            # an archive chunk is only a range, the worker reads the games
+            for first in range(0, games, chunk_size):
+                yield [("archive", (path, first, min(first + chunk_size, games)))]
+
+            continue
+
+        for kind, game, _ in iter_file_games([path]):
+            chunk.append((kind, game))
+
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk = []
+
+    if chunk:
+        yield chunk
+
+
+def _bounded_imap(
+    pool: Any, function: Callable, jobs: Iterable, window: int
+) -> Iterator[Any]:
+    # Pool.imap() would read all jobs ahead, here at most window are pending
+    pending: Deque = deque()
+
+    for job in jobs:
+        pending.append(pool.apply_async(function, (job,)))
+
+        if len(pending) >= window:
+            yield pending.popleft().get()
+
+    while pending:
+        yield pending.popleft().get()
+
+
+def analyse_files(
+    paths: Iterable[str],
+    processes: Optional[int] = None,
+    chunk_size: int = CHUNK_SIZE,
+    opening_plies: int = OPENING_PLIES,
+) -> GameStatistics:
+    total = GameStatistics(opening_plies)
+    jobs = ((chunk, opening_plies) for chunk in _jobs(paths, chunk_size))
+
+    with Pool(processes) as pool:
+        window = 2 * (processes or os.cpu_count() or 1)
+
+        for statistics in _bounded_imap(pool, analyse_chunk, jobs, window):
+            total.merge(statistics)
+
+    return total
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("output", help="directory of the .npy and .csv files")
+    parser.add_argument("paths", nargs="+", help=".txt, .pgn or .pgca files")
+    parser.add_argument("--processes", type=int)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--opening-plies", type=int, default=OPENING_PLIES)
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    statistics = analyse_files(
+        args.paths, args.processes, args.chunk_size, args.opening_plies
+    )
+    elapsed = time.perf_counter() - start
+    statistics.save(args.output)
+
+    plies = int(statistics.lengths @ np.arange(MAX_PLIES + 1))
+    print(
+        f"{statistics.games} games ({statistics.errors} errors), {plies} plies "
+        f"in {elapsed:.2f} sec, {statistics.games / elapsed:.1f} games/sec, "
+        f"{plies / elapsed:.1f} plies/sec",
+        file=sys.stderr,
+    )
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,458 @@
+"""Compact binary archive of games with random access by game and ply.
+
+    python -m database.game_archive import games.pgca games.txt more.pgn
+    python -m database.game_archive show games.pgca 12 --ply 30
+
+Layout, little endian:
+    header   ARCHIVE_HEADER: magic, version, compression, checkpoint interval,
+             number of games and offset of the index
+    records  one per game, each compressed on its own
+    index    INDEX_ENTRY per game: offset and size of the record, plies
+
+A record holds RECORD_HEADER, the tags of the game as JSON, a checkpoint
+(Board.to_bytes()) every checkpoint interval plies and the moves as 16 bit
+codes, see encode_move(). The archive is read through mmap, the position at
+a ply is a lookup in the index, the decompression of one record and the
+replay from the last checkpoint before the ply.
+"""
+
+import argparse
+import json
+import lzma
+import mmap
+import struct
+import sys
+import time
+import zlib
+from array import array
+from multiprocessing import Pool
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from chess import notation, pgn
+from chess.my_types import SNAPSHOT_SIZE, Board, MoveType
+from chess.notation import NotationMove
+
+ARCHIVE_MAGIC = b"PYCA"
+ARCHIVE_VERSION = 1
+# magic, version, compression, checkpoint interval, games, index offset
+ARCHIVE_HEADER = struct.Struct("<4sBBHIQ")
+# record offset, record size, plies
+INDEX_ENTRY = struct.Struct("<QII")
+# plies, checkpoints, length of the tags
+RECORD_HEADER = struct.Struct("<IHI")
+
+COMPRESSIONS = {"none": 0, "zlib": 1, "lzma": 2}
+
+# a move code: from square | to square << 6 | flag << 12, square = i * 8 + j
+MOVE_FLAG_EN_PASSANT = 1
+MOVE_FLAG_CASTLING = 2
+# flags of the promotions, in this order from 3 on
+PROMOTION_LETTERS = ["Q", "R", "B", "N"]
+
+# (move, promotion letter) as given to notation.replay_move()
+ArchiveMove = Tuple[NotationMove, Optional[str]]
+
+
+def encode_move(move: NotationMove, promotion: Optional[str] = None) -> int:
+    (from_i, from_j), (to_i, to_j), move_type = move
+
+    if promotion:
+        flag = 3 + PROMOTION_LETTERS.index(promotion)
+    elif move_type == MoveType.EN_PASSANT:
+        flag = MOVE_FLAG_EN_PASSANT
+    elif move_type == MoveType.CASTLING_MOVE:
+        flag = MOVE_FLAG_CASTLING
+    else:
+        flag = 0
+
+    return (from_i * 8 + from_j) | (to_i * 8 + to_j) << 6 | flag << 12
+
+
+def decode_move(code: int) -> ArchiveMove:
+    from_square, to_square, flag = code & 63, code >> 6 & 63, code >> 12
+
+    if flag == MOVE_FLAG_EN_PASSANT:
+        move_type = MoveType.EN_PASSANT
+    elif flag == MOVE_FLAG_CASTLING:
+        move_type = MoveType.CASTLING_MOVE
+    else:
+        move_type = MoveType.NORMAL_MOVE
+
+    promotion = PROMOTION_LETTERS[flag - 3] if flag >= 3 else None
+    move = (divmod(from_square, 8), divmod(to_square, 8), move_type)
+
+    return move, promotion  # type: ignore
+
+
+def _compress(data: bytes, compression: int) -> bytes:
+    if compression == COMPRESSIONS["zlib"]:
+        return zlib.compress(data, 9)
+
+    if compression == COMPRESSIONS["lzma"]:
+        return lzma.compress(data, format=lzma.FORMAT_ALONE)
+
+    return data
+
+
+def _decompress(data: bytes, compression: int) -> bytes:
+    if compression == COMPRESSIONS["zlib"]:
+        return zlib.decompress(data)
+
+    if compression == COMPRESSIONS["lzma"]:
+        return lzma.decompress(data, format=lzma.FORMAT_ALONE)
+
+    return data
+
+
+def build_record(
+    moves: Iterable[ArchiveMove],
+    tags: Dict[str, str],
+    checkpoint_interval: int = 0,
+    board: Optional[Board] = None,
+) -> Tuple[bytes, int]:
+    """Uncompressed record and plies of a game, the moves are replayed on
+    board, a new one by default.
+
+    A move which can not be replayed ends the game, the error is kept in the
+    tag "Error".
+    """
+
+    board = board or Board(None)
+    codes = array("H")
+    checkpoints = bytearray()
+
+    try:
+        for move, promotion in moves:
+            code = encode_move(move, promotion)
+            notation.replay_move(board, move, promotion)
+            codes.append(code)
+
+            if checkpoint_interval and len(codes) % checkpoint_interval == 0:
+                checkpoints += board.to_bytes()
+    except (ValueError, KeyError, IndexError, TypeError) as e:
+        tags = {**tags, "Error": f"ply {len(codes)}: {e!r}"}
+
+    if sys.byteorder != "little":
+        codes.byteswap()
+
+    tags_bytes = json.dumps(tags, ensure_ascii=False).encode("utf8")
+    record = (
+        RECORD_HEADER.pack(
+            len(codes), len(checkpoints) // SNAPSHOT_SIZE, len(tags_bytes)
+        )
+        + tags_bytes
+        + bytes(checkpoints)
+        + codes.tobytes()
+    )
+
+    return record, len(codes)
+
+
+def text_game_moves(lines: List[str]) -> Iterator[ArchiveMove]:
+    """Moves of a game given as notation lines."""
+
+    for chess_notation in lines:
+        promotions, moves = notation.parse_notation(chess_notation)
+
+        for i, move in enumerate(moves):
+            yield move, promotions[i]
+
+
+def pgn_game_moves(board: Board, sans: List[str]) -> Iterator[ArchiveMove]:
+    """Moves of a game given as SAN moves, parsed on board.
+
+    board has to be the one the moves are replayed on, the next move is
+    parsed only after the last one is played.
+    """
+
+    for san in sans:
+        yield pgn.parse_san(board, san)
+
+
+def import_game(job: Tuple[str, Any, Dict[str, str], int, int]) -> Tuple[bytes, int]:
+    """Compressed record and plies of a text or PGN game, runs in a worker."""
+
+    kind, game, tags, checkpoint_interval, compression = job
+    board = Board(None)
+    moves = text_game_moves(game) if kind == "text" else pgn_game_moves(board, game)
+    record, plies = build_record(moves, tags, checkpoint_interval, board)
+
+    return _compress(record, compression), plies
+
+
+class ArchiveWriter:
+    """Appends records, the index and the header are written by close()."""
+
+    def __init__(
+        self, path: str, compression: str = "zlib", checkpoint_interval: int = 0
+    ) -> None:
+        self.compression = COMPRESSIONS[compression]
+        self.checkpoint_interval = checkpoint_interval
+        self.index = bytearray()
+        self.games = 0
+
+        self._file = open(path, "wb")
+        self._file.write(bytes(ARCHIVE_HEADER.size))
+
+    def add_record(self, compressed_record: bytes, plies: int) -> int:
+        """Append a record of import_game(), returns the game id."""
+
+        self.index += INDEX_ENTRY.pack(self._file.tell(), len(compressed_record), plies)
+        self._file.write(compressed_record)
+        self.games += 1
+
+        return self.games - 1
+
+    def add_game(self, moves: Iterable[ArchiveMove], tags: Dict[str, str]) -> int:
+        record, plies = build_record(moves, tags, self.checkpoint_interval)
+        return self.add_record(_compress(record, self.compression), plies)
+
+    def close(self) -> None:
+        index_offset = self._file.tell()
+        self._file.write(self.index)
+        self._file.seek(0)
+        self._file.write(
+            ARCHIVE_HEADER.pack(
+                ARCHIVE_MAGIC,
+                ARCHIVE_VERSION,
+                self.compression,
+                self.checkpoint_interval,
+                self.games,
+                index_offset,
+            )
+        )
+        self._file.close()
+
+    def __enter__(self) -> "ArchiveWriter":
+        return self
+
+    def __exit__(self, *_: object) -> None:
+        self.close()
+
+
+class GameArchive:
+    """Read access to an archive through mmap."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._file = open(path, "rb")
+        self.data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self.data) < ARCHIVE_HEADER.size:
+            self.close()
+            raise ValueError(f"'{path}' is too short for a game archive.")
+
+        (
+            magic,
+            version,
+            self.compression,
+            self.checkpoint_interval,
+            self.games,
+            self.index_offset,
+        ) = ARCHIVE_HEADER.unpack_from(self.data, 0)
+
+        if magic != ARCHIVE_MAGIC or version != ARCHIVE_VERSION:
+            self.close()
+            raise ValueError(
+                f"'{path}' is no game archive of version {ARCHIVE_VERSION}."
+            )
+
+    def close(self) -> None:
+        self.data.close()
+        self._file.close()
+
+    def __enter__(self) -> "GameArchive":
+        return self
+
+    def __exit__(self, *_: object) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self.games
+
+    def _index_entry(self, game_id: int) -> Tuple[int, int, int]:
+        if not 0 <= game_id < self.games:
+            raise IndexError(f"Game {game_id} not in the archive.")
+
+        return INDEX_ENTRY.unpack_from(
+            self.data, self.index_offset + game_id * INDEX_ENTRY.size
+        )
+
+    def plies(self, game_id: int) -> int:
+        return self._index_entry(game_id)[2]
+
+    def _record(self, game_id: int) -> Tuple[Dict[str, str], bytes, array]:
+        """Tags, checkpoints and move codes of a game."""
+
+        offset, size, _ = self._index_entry(game_id)
+        end = offset + size
+        record = _decompress(self.data[offset:end], self.compression)
+        plies, checkpoints, tags_size = RECORD_HEADER.unpack_from(record, 0)
+
+        tags_start = RECORD_HEADER.size
+        checkpoints_start = tags_start + tags_size
+        codes_start = checkpoints_start + checkpoints * SNAPSHOT_SIZE
+
+        codes = array("H")
+        codes.frombytes(record[codes_start:])
+
+        if sys.byteorder != "little":
+            codes.byteswap()
+
+        return (
+            json.loads(record[tags_start:checkpoints_start]),
+            record[checkpoints_start:codes_start],
+            codes,
+        )
+
+    def tags(self, game_id: int) -> Dict[str, str]:
+        return self._record(game_id)[0]
+
+    def moves(self, game_id: int) -> List[ArchiveMove]:
+        return [decode_move(code) for code in self._record(game_id)[2]]
+
+    def position(self, game_id: int, ply: int) -> Board:
+        """Board after ply moves of the game, replayed from the last
+        checkpoint before."""
+
+        plies = self.plies(game_id)
+
+        if not 0 <= ply <= plies:
+            raise IndexError(f"Game {game_id} has {plies} plies, not {ply}.")
+
+        _, checkpoints, codes = self._record(game_id)
+        checkpoint = ply // self.checkpoint_interval if self.checkpoint_interval else 0
+        checkpoint = min(checkpoint, len(checkpoints) // SNAPSHOT_SIZE)
+
+        if checkpoint:
+            board = Board.from_bytes(checkpoints, (checkpoint - 1) * SNAPSHOT_SIZE)
+            start = checkpoint * self.checkpoint_interval
+        else:
+            board = Board(None)
+            start = 0
+
+        for code in codes[start:ply]:
+            move, promotion = decode_move(code)
+            notation.replay_move(board, move, promotion)
+
+        return board
+
+    def notation_lines(self, game_id: int) -> List[str]:
+        """The game as notation lines like "1. e2–e4 e7–e5"."""
+
+        board = Board(None)
+
+        for move, promotion in self.moves(game_id):
+            notation.replay_move(board, move, promotion)
+
+        return notation.format_notation_lines(board.move_notations)
+
+
+def iter_file_games(
+    paths: Iterable[str],
+) -> Iterator[Tuple[str, Any, Dict[str, str]]]:
+    """Kind ("text" or "pgn"), game and tags of the games of notation and PGN
+    files."""
+
+    for path in paths:
+        with open(path, encoding="utf8") as f:
+            if path.lower().endswith(".pgn"):
+                for index, (headers, sans) in enumerate(pgn.iter_pgn_games(f)):
+                    yield "pgn", sans, {**headers, "Source": f"{path}#{index}"}
+            else:
+                for index, lines in enumerate(notation.iter_games(f)):
+                    yield "text", lines, {"Source": f"{path}#{index}"}
+
+
+def import_files(
+    archive_path: str,
+    paths: Iterable[str],
+    compression: str = "zlib",
+    checkpoint_interval: int = 0,
+    processes: Optional[int] = None,
+) -> int:
+    """Import the games of notation files (.txt) and PGN files (.pgn).
+
+    The games are replayed and compressed in a process pool, the records are
+    written in the order of the files.
+    """
+
+    with ArchiveWriter(archive_path, compression, checkpoint_interval) as writer:
+        jobs = (
+            (kind, game, tags, checkpoint_interval, writer.compression)
+            for kind, game, tags in iter_file_games(paths)
+        )
+
+        with Pool(processes) as pool:
+            for compressed_record, plies in pool.imap(import_game, jobs, chunksize=16):
+                writer.add_record(compressed_record, plies)
+
+        return writer.games
+
+
+def board_diagram(board: Board) -> str:
+    rows = [
+        "".join(
+            "." if board.get_piece(i, j) is None else board.get_piece(i, j).symbol
+            for j in range(8)
+        )
+        for i in range(8)
+    ]
+
+    return "\n".join(rows + [f"{board.next_move_color} to move"])
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="pyChess game archive")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = subparsers.add_parser(
+        "import", help="import notation (.txt) and PGN (.pgn) files"
+    )
+    import_parser.add_argument("archive")
+    import_parser.add_argument("files", nargs="+")
+    import_parser.add_argument(
+        "--compression", choices=list(COMPRESSIONS), default="zlib"
+    )
+    import_parser.add_argument(
+        "--checkpoint-interval",
+        type=int,
+        default=0,
+        help="store the position every N plies, default: no checkpoints",
+    )
+    import_parser.add_argument("--processes", type=int)
+
+    show_parser = subparsers.add_parser("show", help="show a game or a position")
+    show_parser.add_argument("archive")
+    show_parser.add_argument("game", type=int)
+    show_parser.add_argument("--ply", type=int, help="show the position at the ply")
+
+    args = parser.parse_args(argv)
+    start = time.perf_counter()
+
+    if args.command == "import":
+        games = import_files(
+            args.archive,
+            args.files,
+            args.compression,
+            args.checkpoint_interval,
+            args.processes,
+        )
+        print(f"{games} games imported")
+    else:
+        with GameArchive(args.archive) as archive:
+            for name, value in archive.tags(args.game).items():
+                print(f"{name}: {value}")
+
+            if args.ply is None:
+                print("\n".join(archive.notation_lines(args.game)))
+            else:
+                print(board_diagram(archive.position(args.game, args.ply)))
+
+    print(f"{(time.perf_counter() - start) * 1000:.1f} ms", file=sys.stderr)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
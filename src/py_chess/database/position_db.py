@@ -0,0 +1,275 @@
+"""SQLite database of the positions of replayed games.
+
+    python -m database.position_db build positions.sqlite games.txt ...
+    python -m database.position_db games positions.sqlite "1. e2–e4 e7–e5"
+    python -m database.position_db moves positions.sqlite "1. e2–e4 e7–e5"
+    python -m database.position_db material positions.sqlite KQR/kq
+
+Game files hold the notation lines of the replay manager, games are
+separated by empty lines. The position is given as notation lines, which are
+replayed from the start position.
+
+The occurrence and material tables are clustered by their lookup column
+(WITHOUT ROWID, primary key first), so a query is one index range scan.
+"""
+
+import argparse
+import sqlite3
+import sys
+import time
+from itertools import islice
+from multiprocessing import Pool
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from chess import logic, notation
+from chess.my_types import Board
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (
+    game_id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL,
+    plies INTEGER NOT NULL,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS occurrences (
+    position_hash INTEGER NOT NULL,
+    game_id INTEGER NOT NULL,
+    ply INTEGER NOT NULL,
+    next_move TEXT,
+    PRIMARY KEY (position_hash, game_id, ply)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS materials (
+    signature TEXT NOT NULL,
+    game_id INTEGER NOT NULL,
+    ply INTEGER NOT NULL,
+    PRIMARY KEY (signature, game_id, ply)
+) WITHOUT ROWID;
+"""
+
+# position_hash, ply, next_move
+Occurrence = Tuple[int, int, Optional[str]]
+# signature, ply
+Material = Tuple[str, int]
+# plies, error, occurrences, materials
+ReplayedGame = Tuple[int, Optional[str], List[Occurrence], List[Material]]
+
+
+def replay_game(lines: List[str]) -> ReplayedGame:
+    """Replay one game and collect its positions, runs in a worker process.
+
+    A game with an unparsable or impossible move is kept up to that move.
+    """
+
+    board = Board(None)
+    occurrences: List[Occurrence] = []
+    materials: List[Material] = []
+    last_signature = None
+    ply = 0
+    error = None
+
+    def record(next_move: Optional[str]) -> None:
+        nonlocal last_signature
+
+        occurrences.append((board.position_hash(), ply, next_move))
+        signature = logic.get_material_signature(board)
+
+        # the material only changes with captures and promotions
+        if signature != last_signature:
+            materials.append((signature, ply))
+            last_signature = signature
+
+    try:
+        for chess_notation in lines:
+            promotions, moves = notation.parse_notation(chess_notation)
+
+            for i, move in enumerate(moves):
+                from_pos, to_pos, _ = move
+                record(notation.move_name(from_pos, to_pos))
+                notation.replay_move(board, move, promotions[i])
+                ply += 1
+    except (ValueError, KeyError, IndexError, TypeError) as e:
+        error = f"ply {ply}: {e!r}"
+
+    record(None)
+
+    return ply, error, occurrences, materials
+
+
+def position_hash_of(lines: Iterable[str]) -> int:
+    board = Board(None)
+
+    for chess_notation in lines:
+        promotions, moves = notation.parse_notation(chess_notation)
+
+        for i, move in enumerate(moves):
+            notation.replay_move(board, move, promotions[i])
+
+    return board.position_hash()
+
+
+def _chunks(iterable: Iterable, size: int) -> Iterator[List]:
+    iterator = iter(iterable)
+
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+class PositionDatabase:
+    def __init__(self, path: str) -> None:
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def __enter__(self) -> "PositionDatabase":
+        return self
+
+    def __exit__(self, *_: object) -> None:
+        self.close()
+
+    def ingest(
+        self,
+        paths: Iterable[str],
+        processes: Optional[int] = None,
+        batch_size: int = 1000,
+    ) -> int:
+        """Replay all games of the files in a process pool and store them.
+
+        Games are streamed from the files and replayed batch_size at a time,
+        every batch is inserted in one transaction.
+        """
+
+        def games() -> Iterator[Tuple[str, List[str]]]:
+            for path in paths:
+                with open(path, encoding="utf8") as f:
+                    for index, lines in enumerate(notation.iter_games(f)):
+                        yield f"{path}#{index}", lines
+
+        cursor = self.connection.cursor()
+        cursor.execute("PRAGMA journal_mode = WAL")
+        cursor.execute("PRAGMA synchronous = OFF")
+
+        next_game_id = (
+            cursor.execute("SELECT COALESCE(MAX(game_id), 0) FROM games").fetchone()[0]
+            + 1
+        )
+        ingested = 0
+
+        with Pool(processes) as pool:
+            for batch in _chunks(games(), batch_size):
+                replayed_games = pool.map(
+                    replay_game,
+                    [lines for _, lines in batch],
+                    chunksize=max(1, batch_size // (4 * (processes or 4))),
+                )
+
+                with self.connection:
+                    for (source, _), (plies, error, occurrences, materials) in zip(
+                        batch, replayed_games
+                    ):
+                        game_id = next_game_id
+                        next_game_id += 1
+
+                        cursor.execute(
+                            "INSERT INTO games VALUES (?, ?, ?, ?)",
+                            (game_id, source, plies, error),
+                        )
+                        cursor.executemany(
+                            "INSERT OR IGNORE INTO occurrences VALUES (?, ?, ?, ?)",
+                            [
+                                (position_hash, game_id, ply, next_move)
+                                for position_hash, ply, next_move in occurrences
+                            ],
+                        )
+                        cursor.executemany(
+                            "INSERT OR IGNORE INTO materials VALUES (?, ?, ?)",
+                            [(signature, game_id, ply) for signature, ply in materials],
+                        )
+
+                ingested += len(batch)
+
+        cursor.execute("PRAGMA synchronous = NORMAL")
+        return ingested
+
+    def games_reaching(self, position_hash: int) -> List[Tuple[int, int]]:
+        """(game_id, ply) of every occurrence of the position."""
+
+        return self.connection.execute(
+            "SELECT game_id, ply FROM occurrences WHERE position_hash = ?"
+            " ORDER BY game_id, ply",
+            (position_hash,),
+        ).fetchall()
+
+    def moves_from(self, position_hash: int) -> List[Tuple[str, int]]:
+        """Moves played from the position with their frequency."""
+
+        return self.connection.execute(
+            "SELECT next_move, COUNT(*) AS frequency FROM occurrences"
+            " WHERE position_hash = ? AND next_move IS NOT NULL"
+            " GROUP BY next_move ORDER BY frequency DESC, next_move",
+            (position_hash,),
+        ).fetchall()
+
+    def games_with_material(self, signature: str) -> List[int]:
+        """Games which reach the material signature, see
+        logic.get_material_signature()."""
+
+        return [
+            game_id
+            for (game_id,) in self.connection.execute(
+                "SELECT DISTINCT game_id FROM materials WHERE signature = ?"
+                " ORDER BY game_id",
+                (signature,),
+            )
+        ]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="pyChess position database")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = subparsers.add_parser("build", help="ingest game files")
+    build_parser.add_argument("database")
+    build_parser.add_argument("files", nargs="+")
+    build_parser.add_argument("--processes", type=int)
+    build_parser.add_argument("--batch-size", type=int, default=1000)
+
+    for command in ["games", "moves"]:
+        query_parser = subparsers.add_parser(command)
+        query_parser.add_argument("database")
+        query_parser.add_argument(
+            "notation", nargs="*", help="notation lines leading to the position"
+        )
+
+    material_parser = subparsers.add_parser("material")
+    material_parser.add_argument("database")
+    material_parser.add_argument("signature")
+
+    args = parser.parse_args(argv)
+
+    with PositionDatabase(args.database) as database:
+        start = time.perf_counter()
+
+        if args.command == "build":
+            ingested = database.ingest(args.files, args.processes, args.batch_size)
+            print(f"{ingested} games ingested")
+        elif args.command == "games":
+            for game_id, ply in database.games_reaching(
+                position_hash_of(args.notation)
+            ):
+                print(f"game {game_id} ply {ply}")
+        elif args.command == "moves":
+            for move, frequency in database.moves_from(position_hash_of(args.notation)):
+                print(f"{move} {frequency}")
+        else:
+            for game_id in database.games_with_material(args.signature):
+                print(f"game {game_id}")
+
+        print(f"{(time.perf_counter() - start) * 1000:.1f} ms", file=sys.stderr)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+from typing import Any, Dict, Optional, Tuple
+
+from chess.analysis import AnalysisWorker
+from chess.my_types import Board
+from PyQt5.QtCore import Qt, QTimer
+from PyQt5.QtWidgets import QDockWidget, QLabel, QVBoxLayout, QWidget
+
+POLL_INTERVAL_IN_MS = 100
+
+
+class AnalysisPanel(QDockWidget):
+    """Shows the continuous analysis of the current position.
+
+    The search runs in an AnalysisWorker process, the GUI thread only sends
+    snapshots of changed positions and polls the results with a timer.
+    """
+
+    def __init__(self, parent: QWidget) -> None:
+        super(AnalysisPanel, self).__init__("Analysis", parent)
+
+        self.worker: Optional[AnalysisWorker] = None
+        self.position_key: Optional[Tuple] = None
+
+        self.label_score = QLabel("-")
+        self.label_depth = QLabel("-")
+        self.label_nps = QLabel("-")
+        self.label_pv = QLabel("-")
+        self.label_pv.setWordWrap(True)
+        self.label_pv.setTextInteractionFlags(Qt.TextSelectableByMouse)
+
+        layout = QVBoxLayout()
+        for label in [
+            self.label_score,
+            self.label_depth,
+            self.label_nps,
+            self.label_pv,
+        ]:
+            layout.addWidget(label)
+        layout.addStretch()
+
+        widget = QWidget(self)
+        widget.setLayout(layout)
+        self.setWidget(widget)
+
+        self.poll_timer = QTimer(self)
+        self.poll_timer.setInterval(POLL_INTERVAL_IN_MS)
+        self.poll_timer.timeout.connect(self.poll)
+
+        self.visibilityChanged.connect(self.on_visibility_changed)
+
+    def on_visibility_changed(self, visible: bool) -> None:
+        if visible:
+            if self.worker is None:
+                self.worker = AnalysisWorker()
+
+            self.poll_timer.start()
+            self.update_board(self.parent().board, force=True)
+        else:
+            self.poll_timer.stop()
+
+            if self.worker is not None:
+                self.worker.cancel()
+
+    def update_board(self, board: Optional[Board], force: bool = False) -> None:
+        """Restart the analysis if the position has changed."""
+
+        if self.worker is None or not self.isVisible() or board is None:
+            return
+
+        position_key = board.position_key()
+
+        if position_key == self.position_key and not force:
+            return
+
+        self.position_key = position_key
+        self.worker.analyse(board)
+
+        self.label_score.setText("-")
+        self.label_depth.setText("searching...")
+        self.label_nps.setText("-")
+        self.label_pv.setText("-")
+
+    def poll(self) -> None:
+        if self.worker is None:
+            return
+
+        infos = self.worker.poll()
+
+        if infos:
+            self.show_info(infos[-1])
+
+    def show_info(self, info: Dict[str, Any]) -> None:
+        if info["mate_in"] is not None:
+            score = f"mate in {abs(info['mate_in'])}"
+            white_wins = (info["mate_in"] > 0) == (info["color"] == "white")
+            score += " for white" if white_wins else " for black"
+        else:
+            # from the view of white
+            score_in_cp = info["score"] if info["color"] == "white" else -info["score"]
+            score = f"{score_in_cp / 100:+.2f}"
+
+        self.label_score.setText(f"Score: {score}")
+        self.label_depth.setText(f"Depth: {info['depth']}")
+        self.label_nps.setText(f"Nodes: {info['nodes']} ({info['nps']} nodes/sec)")
+        self.label_pv.setText(f"PV: {' '.join(info['pv'])}")
+
+    def close_worker(self) -> None:
+        self.poll_timer.stop()
+
+        if self.worker is not None:
+            self.worker.close()
+            self.worker = None
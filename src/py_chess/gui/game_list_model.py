@@ -0,0 +1,233 @@
+import mmap
+from array import array
+from bisect import bisect_right
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+from chess import notation
+from database.game_archive import ArchiveMove, GameArchive
+from PyQt5.QtCore import QAbstractListModel, QModelIndex, Qt
+
+# decoded lines kept around, about a few screens full
+LINE_CACHE_SIZE = 4096
+
+
+class LineIndex:
+    """Start and end offsets of the non empty lines of a memory mapped file.
+
+    Only the offsets are held in memory, a line is decoded on request.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._file = open(path, "rb")
+        self.starts = array("Q")
+        self.ends = array("Q")
+
+        try:
+            self.data: Any = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # empty file
+            self.data = b""
+
+        self._build()
+
+    def _build(self) -> None:
+        data = self.data
+        start = 0
+        size = len(data)
+
+        while start < size:
+            end = data.find(b"\n", start)
+
+            if end == -1:
+                # an unterminated last line may be torn by a crash while
+                # recording, see chess.recorder
+                if not self._parses(data[start:size]):
+                    break
+
+                end = size
+
+            if data[start:end].strip():
+                self.starts.append(start)
+                self.ends.append(end)
+
+            start = end + 1
+
+    @staticmethod
+    def _parses(line: bytes) -> bool:
+        try:
+            notation.parse_notation(line.decode("utf8").strip())
+        except (ValueError, KeyError, IndexError, UnicodeDecodeError):
+            return False
+
+        return True
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def line(self, row: int) -> str:
+        start, end = self.starts[row], self.ends[row]
+        return self.data[start:end].decode("utf8").strip()
+
+    def find_rows(self, text: str) -> List[int]:
+        """Rows containing text, searched in the mapped bytes."""
+
+        pattern = text.encode("utf8")
+        rows = []
+        position = self.data.find(pattern)
+
+        while position != -1:
+            row = bisect_right(self.starts, position) - 1
+
+            if row >= 0 and position + len(pattern) <= self.ends[row]:
+                rows.append(row)
+                # continue with the next line
+                position = self.data.find(pattern, self.ends[row])
+            else:
+                position = self.data.find(pattern, position + 1)
+
+        return rows
+
+    def close(self) -> None:
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+
+        self._file.close()
+
+
+class GameListModel(QAbstractListModel):
+    """Notation lines of a file for a list view, optionally filtered."""
+
+    def __init__(self, parent: Optional[Any] = None) -> None:
+        super(GameListModel, self).__init__(parent)
+
+        self.index_: Optional[LineIndex] = None
+        # rows of the index shown, None: all
+        self.filtered_rows: Optional[List[int]] = None
+        self._line = lru_cache(maxsize=LINE_CACHE_SIZE)(self._read_line)
+
+    def load(self, path: str) -> None:
+        self.beginResetModel()
+
+        if self.index_ is not None:
+            self.index_.close()
+
+        self._line.cache_clear()
+        self.index_ = LineIndex(path)
+        self.filtered_rows = None
+
+        self.endResetModel()
+
+    def set_filter(self, text: str) -> None:
+        self.beginResetModel()
+
+        if text and self.index_ is not None:
+            self.filtered_rows = self.index_.find_rows(text)
+        else:
+            self.filtered_rows = None
+
+        self.endResetModel()
+
+    def _read_line(self, row: int) -> str:
+        assert self.index_ is not None
+        return self.index_.line(row)
+
+    def line(self, row: int) -> str:
+        """The notation line of a row of the model."""
+
+        if self.filtered_rows is not None:
+            row = self.filtered_rows[row]
+
+        return self._line(row)
+
+    def moves(self, row: int) -> List[ArchiveMove]:
+        promotions, moves = notation.parse_notation(self.line(row))
+        return list(zip(moves, promotions))
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        if parent.isValid() or self.index_ is None:
+            return 0
+
+        if self.filtered_rows is not None:
+            return len(self.filtered_rows)
+
+        return len(self.index_)
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole) -> Any:
+        if not index.isValid() or role != Qt.DisplayRole:
+            return None
+
+        return self.line(index.row())
+
+
+class ArchiveListModel(QAbstractListModel):
+    """Games of a game archive for a list view, optionally filtered."""
+
+    def __init__(self, parent: Optional[Any] = None) -> None:
+        super(ArchiveListModel, self).__init__(parent)
+
+        self.archive: Optional[GameArchive] = None
+        # game ids shown, None: all
+        self.filtered_rows: Optional[List[int]] = None
+        self._title = lru_cache(maxsize=LINE_CACHE_SIZE)(self._read_title)
+
+    def load(self, path: str) -> None:
+        archive = GameArchive(path)
+
+        self.beginResetModel()
+
+        if self.archive is not None:
+            self.archive.close()
+
+        self._title.cache_clear()
+        self.archive = archive
+        self.filtered_rows = None
+
+        self.endResetModel()
+
+    def set_filter(self, text: str) -> None:
+        self.beginResetModel()
+
+        if text and self.archive is not None:
+            # the tags are read from the records, one decompression per game
+            self.filtered_rows = [
+                game_id
+                for game_id in range(len(self.archive))
+                if text in self._title(game_id)
+            ]
+        else:
+            self.filtered_rows = None
+
+        self.endResetModel()
+
+    def game_id(self, row: int) -> int:
+        return row if self.filtered_rows is None else self.filtered_rows[row]
+
+    def _read_title(self, game_id: int) -> str:
+        assert self.archive is not None
+        tags: Dict[str, str] = self.archive.tags(game_id)
+        players = f"{tags.get('White', '?')} – {tags.get('Black', '?')}"
+
+        return (
+            f"{game_id}: {players} {tags.get('Result', '')} "
+            f"({self.archive.plies(game_id)} plies) {tags.get('Source', '')}"
+        )
+
+    def moves(self, row: int) -> List[ArchiveMove]:
+        assert self.archive is not None
+        return self.archive.moves(self.game_id(row))
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        if parent.isValid() or self.archive is None:
+            return 0
+
+        if self.filtered_rows is not None:
+            return len(self.filtered_rows)
+
+        return len(self.archive)
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole) -> Any:
+        if not index.isValid() or role != Qt.DisplayRole:
+            return None
+
+        return self._title(self.game_id(index.row()))
@@ -1,33 +1,154 @@
 import time
 from functools import partial
-from pathlib import Path
-from typing import Dict, Tuple
+from typing import Dict, List, Optional, Tuple
 
-from chess import logic
-from chess.my_types import Board, GameState
-from gui.replay_manager import ReplayManager
+from chess import logic, pgn, recorder
+from chess.my_types import Board, GameState, Piece
+from gui.analysis_panel import AnalysisPanel
+from gui.move_hints import MoveHints, MoveHintsWorker
 from gui.my_widgets import BlackButton, States, WhiteButton
 from gui.promotion_piece_dialog import PromotionPieceDialog
-from PyQt5 import uic
-from PyQt5.QtCore import QCoreApplication, Qt  # , QTimer
-from PyQt5.QtWidgets import QLabel, QLayout, QMainWindow, QPushButton, QMessageBox
+from gui.ui_loader import load_ui
+from PyQt5.QtCore import QCoreApplication, QDir, Qt, QThreadPool  # , QTimer
+from PyQt5.QtGui import QCloseEvent
+from PyQt5.QtWidgets import (
+    QAction,
+    QFileDialog,
+    QLabel,
+    QLayout,
+    QMainWindow,
+    QMessageBox,
+    QPushButton,
+)
 
 
 class MainWindow(QMainWindow):
     def __init__(self) -> None:
         super(MainWindow, self).__init__()
 
-        self.ui = uic.loadUi(Path(__file__).parent / "ui" / "main_window.ui", self)
+        self.ui = load_ui("main_window", self)
         self.board = None
-        self.initialize_game()
 
-        self.replay_manager = ReplayManager(self)
-        self.replay_manager.show()
+        # legal moves and game state are computed off the GUI thread,
+        # see schedule_move_hints()
+        self.move_hints: Optional[MoveHints] = None
+        self.move_hints_generation = 0
+        self.move_hints_pool = QThreadPool(self)
+        self.move_hints_pool.setMaxThreadCount(1)
+
+        # created on first use, see open_replay_manager()
+        self.replay_manager = None
+
+        # searches in its own process while it is shown
+        self.analysis_panel = AnalysisPanel(self)
+        self.addDockWidget(Qt.RightDockWidgetArea, self.analysis_panel)
+        self.analysis_panel.hide()
+
+        analysis_action = self.analysis_panel.toggleViewAction()
+        analysis_action.setShortcut("Ctrl+A")
+        self.menuWindow.addAction(analysis_action)
+
+        export_pgn_action = QAction("Export PGN...", self)
+        export_pgn_action.setShortcut("Ctrl+E")
+        export_pgn_action.triggered.connect(self.export_pgn)
+        self.menuWindow.addAction(export_pgn_action)
+
+        self.initialize_game()
 
         # connections
         self.pushButton_reset_game.clicked.connect(self.initialize_game)
+        self.actionReplayManager.triggered.connect(self.open_replay_manager)
+
+    def closeEvent(self, event: QCloseEvent) -> None:
+        self.analysis_panel.close_worker()
+
+        # the recording writer is a daemon thread, write queued moves out
+        if self.replay_manager is not None and self.replay_manager.recording:
+            self.replay_manager.record(False)
+
+        recorder.flush()
+        super(MainWindow, self).closeEvent(event)
+
+    def export_pgn(self) -> None:
+        if self.board is None:
+            return
+
+        filename, _ = QFileDialog.getSaveFileName(
+            self, "Export PGN", QDir.currentPath(), "PGN (*.pgn)"
+        )
+
+        if not filename:
+            return
+
+        headers = {"Site": "pyChess", "Date": time.strftime("%Y.%m.%d")}
+
+        with open(filename, "w", encoding="utf8") as f:
+            f.write(pgn.export_board(self.board, headers))
+
+    def open_replay_manager(self) -> None:
+        if self.replay_manager is None:
+            # imported lazily, the replay window is not needed to play a game
+            from gui.replay_manager import ReplayManager
+
+            self.replay_manager = ReplayManager(self)
+
+        self.replay_manager.show()
+        self.replay_manager.raise_()
+
+    def schedule_move_hints(self) -> None:
+        """Compute the hints of the current position in the background.
+
+        Has to be called after every change of the board. Hints of older
+        positions, which are still queued or running, become stale.
+        """
+
+        self.move_hints = None
+        self.move_hints_generation += 1
+
+        if self.board is None:
+            return
+
+        worker = MoveHintsWorker(self.board, self.move_hints_generation)
+        worker.signals.finished.connect(self.on_move_hints_finished)
+
+        # drop queued workers of superseded positions, they never started
+        self.move_hints_pool.clear()
+        self.move_hints_pool.start(worker)
+
+    def on_move_hints_finished(self, move_hints: MoveHints) -> None:
+        if (
+            self.board is None
+            or move_hints.generation != self.move_hints_generation
+            or move_hints.position_key != self.board.position_key()
+        ):
+            return  # stale
+
+        self.move_hints = move_hints
+
+        if move_hints.game_state != GameState.CONTINUE and not self.board.game_over:
+            self.show_game_over(move_hints.game_state)
+
+    def get_possible_moves(self, piece: Optional[Piece]) -> List[Tuple[int, int]]:
+        if piece is None or self.board is None:
+            return []
+
+        move_hints = self.move_hints
+
+        if (
+            move_hints is not None
+            and piece.get_color() == self.board.next_move_color
+            and move_hints.position_key == self.board.position_key()
+        ):
+            return move_hints.get_possible_moves(piece.position)
+
+        # hints not ready (yet), compute in place
+        return logic.get_possible_moves(self.board, piece)
 
     def initialize_game(self) -> None:
+        # a recording covers one game
+        if self.replay_manager is not None and self.replay_manager.recording:
+            self.replay_manager.record(False)
+
         self.initialize_new_board()
         self.activated_square = None
         self.pushButton_reset_game.setVisible(False)
@@ -108,6 +229,8 @@ class MainWindow(QMainWindow):
             label = self.gridLayout_white.itemAtPosition(i, 0).widget()
             label.setText(piece.symbol)
 
+        self.analysis_panel.update_board(self.board)
+
     def on_clicked(self, _: bool, piece_button: QPushButton) -> None:
         if self.board is None or self.board.game_over:
             return
@@ -119,20 +242,23 @@ class MainWindow(QMainWindow):
 
         # avoid focusing empty squares and pieces with no move possibilities
         if self.activated_square is None:
-            possible_moves = logic.get_possible_moves(self.board, piece)
-
-            if not possible_moves:
+            if piece is None:
                 return
 
-            # piece is not none, so the color can be requested here
+            # only the moves of the next move color are highlighted
             if self.board.next_move_color != piece.get_color():
                 print("Not your turn! Next move:", self.board.next_move_color)
                 return
 
+            possible_moves = self.get_possible_moves(piece)
+
+            if not possible_moves:
+                return
+
             # no square focused yet
             self.activated_square = piece_button.square
 
-            for i, j in logic.get_possible_moves(self.board, piece_button.square.piece):
+            for i, j in possible_moves:
                 button = self.gridLayout_board.itemAtPosition(i + 1, j + 1).widget()
                 button.state = States.POSSIBLE_MOVE
 
@@ -141,9 +267,7 @@ class MainWindow(QMainWindow):
             self.reset_highlights()
             self.activated_square = None
         else:
-            possible_moves = logic.get_possible_moves(
-                self.board, self.activated_square.piece
-            )
+            possible_moves = self.get_possible_moves(self.activated_square.piece)
 
             if piece_button.square.position in possible_moves:
                 self.move_piece(
@@ -292,34 +416,41 @@ class MainWindow(QMainWindow):
         self.reset_highlights()
         self.setFixedSize(self.sizeHint())
 
+        self.schedule_move_hints()
+
     def move_piece(self, from_pos: Tuple[int, int], to_pos: Tuple[int, int]) -> None:
-        move_result = logic.move(self.board, from_pos, to_pos)
-
-        if move_result != GameState.CONTINUE:
-            msg_box = QMessageBox(self)
-            msg_box_title = "Game Over"
-
-            if move_result == GameState.CHECKMATE_BLACK:
-                msg_box_text = "WHITE won"
-                print("White won")
-            elif move_result == GameState.CHECKMATE_WHITE:
-                msg_box_text = "BLACK won"
-                print("Black won")
-            elif move_result == GameState.REMIS:
-                msg_box_text = "Remis."
-                print("Remis")
-            else:
-                raise TypeError(f"Move Return Type '{move_result}' is unknown")
+        # the game state is evaluated by the move hints worker
+        pgn.apply_move(self.board, from_pos, to_pos)
 
-            self.reset_highlights()
+        if self.replay_manager is not None:
+            self.replay_manager.record_moves(self.board)
 
-            msg_box.setText(msg_box_text)
-            msg_box.setStyleSheet("width: 100px; height: 30px;")
-            msg_box.setWindowTitle(msg_box_title)
-            msg_box.exec()
+        self.schedule_move_hints()
+        self.reset_highlights()
 
-            if self.board is not None:
-                self.board.game_over = True
-                self.pushButton_reset_game.setVisible(self.board.game_over)
+    def show_game_over(self, move_result: GameState) -> None:
+        msg_box = QMessageBox(self)
+        msg_box_title = "Game Over"
+
+        if move_result == GameState.CHECKMATE_BLACK:
+            msg_box_text = "WHITE won"
+            print("White won")
+        elif move_result == GameState.CHECKMATE_WHITE:
+            msg_box_text = "BLACK won"
+            print("Black won")
+        elif move_result == GameState.REMIS:
+            msg_box_text = "Remis."
+            print("Remis")
         else:
-            self.reset_highlights()
+            raise TypeError(f"Move Return Type '{move_result}' is unknown")
+
+        self.reset_highlights()
+
+        msg_box.setText(msg_box_text)
+        msg_box.setStyleSheet("width: 100px; height: 30px;")
+        msg_box.setWindowTitle(msg_box_title)
+        msg_box.exec()
+
+        if self.board is not None:
+            self.board.game_over = True
+            self.pushButton_reset_game.setVisible(self.board.game_over)
@@ -0,0 +1,59 @@
+from copy import deepcopy
+from typing import Dict, List, Tuple
+
+from chess import logic
+from chess.my_types import Board, GameState
+from PyQt5.QtCore import QObject, QRunnable, pyqtSignal
+
+
+class MoveHints:
+    """Legal moves and game state of one position for the next move color."""
+
+    def __init__(
+        self,
+        generation: int,
+        position_key: Tuple,
+        legal_moves: Dict[Tuple[int, int], List[Tuple[int, int]]],
+        game_state: GameState,
+    ) -> None:
+        self.generation = generation
+        self.position_key = position_key
+        self.legal_moves = legal_moves
+        self.game_state = game_state
+
+    def get_possible_moves(self, position: Tuple[int, int]) -> List[Tuple[int, int]]:
+        return list(self.legal_moves.get(position, []))
+
+
+class MoveHintsSignals(QObject):
+    finished = pyqtSignal(object)
+
+
+class MoveHintsWorker(QRunnable):
+    """Computes MoveHints on a snapshot of the board in a QThreadPool thread.
+
+    The result is delivered through signals.finished, which Qt queues to the
+    GUI thread. The receiver compares generation and position key with the
+    current board to discard results of superseded positions.
+    """
+
+    def __init__(self, board: Board, generation: int) -> None:
+        super(MoveHintsWorker, self).__init__()
+
+        # snapshot in the GUI thread, the worker must never touch the live board
+        self.board = deepcopy(board)
+        self.generation = generation
+        self.signals = MoveHintsSignals()
+
+    def run(self) -> None:
+        legal_moves = logic.get_legal_moves(self.board, self.board.next_move_color)
+        game_state = logic.get_game_state(self.board)
+
+        self.signals.finished.emit(
+            MoveHints(
+                self.generation,
+                self.board.position_key(),
+                legal_moves,
+                game_state,
+            )
+        )
@@ -1,8 +1,7 @@
-from pathlib import Path
 from typing import Dict
 from functools import partial
 
-from PyQt5 import uic
+from gui.ui_loader import load_ui
 from PyQt5.QtCore import Qt
 from PyQt5.QtWidgets import QDialog, QWidget
 
@@ -15,7 +14,7 @@ class PromotionPieceDialog(QDialog):
     ) -> None:
         super(PromotionPieceDialog, self).__init__(parent=parent)
 
-        uic.loadUi(Path(__file__).parent / "ui" / "promotion_piece_dialog.ui", self)
+        load_ui("promotion_piece_dialog", self)
 
         self.setWindowFlag(Qt.FramelessWindowHint)
         self.setStyleSheet("QDialog{border: 2px outset grey; background-color: white}")
@@ -1,14 +1,18 @@
 import random
 import time
+from datetime import datetime
 from functools import partial
 from pathlib import Path
-from typing import List, Tuple
-
-from chess.my_types import MoveType
-from PyQt5 import uic
+from typing import List, Optional, Tuple, Union
+
+from chess import notation, pgn
+from chess.my_types import Board
+from chess.notation import NotationMove
+from chess.recorder import GameRecorder
+from gui.game_list_model import ArchiveListModel, GameListModel
+from gui.ui_loader import load_ui
 from PyQt5.QtCore import QCoreApplication, QDir, QRegExp, Qt
 from PyQt5.QtGui import QRegExpValidator
-from PyQt5.QtMultimedia import QSound
 from PyQt5.QtWidgets import QFileDialog, QMainWindow, QWidget
 
 
@@ -19,8 +23,9 @@ class ReplayManager(QMainWindow):
         self.game_window = parent
         self.on_simulating = False
         self.recording = False
+        self.recorder: Optional[GameRecorder] = None
 
-        self.ui = uic.loadUi(Path(__file__).parent / "ui" / "replay_manager.ui", self)
+        self.ui = load_ui("replay_manager", self)
         self.setWindowFlag(Qt.WindowCloseButtonHint, False)
         self.setWindowFlag(Qt.WindowMinimizeButtonHint, False)
         self.lineEdit_delay_in_sec.setAlignment(Qt.AlignCenter)
@@ -38,11 +43,18 @@ class ReplayManager(QMainWindow):
         )
         self.lineEdit_delay_in_sec.setValidator(delay_in_sec_validator)
 
+        # the lines of a file (or the games of an archive) are read from it
+        # only when shown or replayed
+        self.game_list_model = GameListModel(self)
+        self.archive_list_model = ArchiveListModel(self)
+        self.listView.setModel(self.game_list_model)
+
         # connection
         self.pushButton_reset_game.clicked.connect(self.reset_game)
         self.pushButton_replay.clicked.connect(self.simulate_game)
         self.pushButton_load_file.clicked.connect(self.open_txt_file)
-        self.listWidget.itemDoubleClicked.connect(lambda _: self.select_all())
+        self.listView.doubleClicked.connect(lambda _: self.select_all())
+        self.lineEdit_filter.textChanged.connect(self.filter_lines)
         self.pushButton_start_recording.clicked.connect(partial(self.record, True))
         self.pushButton_stop_recording.clicked.connect(partial(self.record, False))
 
@@ -55,17 +67,33 @@ class ReplayManager(QMainWindow):
 
         if recording:
             self._disable_recording_start()
-            print("Start recording game...")
-            self.recording = True
 
-            import pprint
+            recordings_dir = Path(QDir.currentPath()) / "recordings"
+            recordings_dir.mkdir(exist_ok=True)
+            path = recordings_dir / f"game_{datetime.now():%Y%m%d_%H%M%S_%f}.txt"
+
+            print(f"Start recording game to {path}...")
+            self.recording = True
+            self.recorder = GameRecorder(str(path))
 
-            pprint.pprint(self.game_window.board.last_moves.chess_notation_format())
+            # moves played before the recording started
+            self.record_moves(self.game_window.board)
         else:
             self._enable_recording_start()
             print("Stop recording game...")
             self.recording = False
 
+            if self.recorder is not None:
+                self.recorder.close()
+                self.recorder = None
+
+    def record_moves(self, board: Board) -> None:
+        """Stream the moves of board, which are not recorded yet."""
+
+        if self.recorder is not None:
+            recorded_plies = self.recorder.plies
+            self.recorder.record(board.move_notations[recorded_plies:])
+
     def _enable_recording_start(self):
         self.pushButton_start_recording.setEnabled(True)
         self.pushButton_stop_recording.setEnabled(False)
@@ -75,29 +103,46 @@ class ReplayManager(QMainWindow):
         self.pushButton_stop_recording.setEnabled(True)
 
     def open_txt_file(self) -> None:
-        self.listWidget.clear()
-
         filename = QFileDialog.getOpenFileName(
-            self, "Open Document", QDir.currentPath(), "text files (*.txt)"
+            self,
+            "Open Document",
+            QDir.currentPath(),
+            "text files (*.txt);;game archives (*.pgca)",
         )[0]
 
         if not filename:
             return
 
-        self.lineEdit.setText(filename)
+        if filename.endswith(".pgca"):
+            model = self.archive_list_model
+        else:
+            model = self.game_list_model
 
-        with open(filename, encoding="utf8") as f:
-            lines = f.read().split("\n")
+        try:
+            model.load(filename)
+        except ValueError as e:  # no game archive
+            print(e)
+            return
 
-        for line in lines:
-            self.listWidget.addItem(line)
+        self.listView.setModel(model)
+        self.lineEdit.setText(filename)
+        self.lineEdit_filter.clear()
+        self.listView.selectAll()
 
-        self.listWidget.selectAll()
+    def filter_lines(self, text: str) -> None:
+        self.listView.model().set_filter(text)
+        self.listView.selectAll()
 
     def reset_game(self):
+        # a recording covers one game, initialize_game() stops it, the new
+        # game is recorded to a new file
+        recording = self.recording
         self.game_window.initialize_game()
         self.game_window.update_ui()
 
+        if recording:
+            self.record(True)
+
     def disable_ui_elements(self):
         self.groupBox_load_file.setEnabled(False)
         self.groupBox_move_steps.setEnabled(False)
@@ -121,190 +166,67 @@ class ReplayManager(QMainWindow):
 
             self.reset_game()
 
-            board = self.game_window.board
             delay = float(self.lineEdit_delay_in_sec.text())
             print(f"Delay: {delay} sec")
 
-            items = self.listWidget.selectedItems()
-            chess_notations = [item.text() for item in items]
+            rows = sorted(
+                index.row() for index in self.listView.selectionModel().selectedRows()
+            )
+            model = self.listView.model()
 
-            print(chess_notations)
+            print(f"{len(rows)} lines selected")
 
-            for chess_notation in chess_notations:
-                # replace all " e.p." to"_e.p." to avoid to be splitted in
-                #  parse_notation(..) -> string.split(" ")
-                while " e.p." in chess_notation:
-                    chess_notation = chess_notation.replace(" e.p.", "_e.p.")
+            try:
+                self._replay_rows(model, rows, delay)
+            except ValueError as e:  # move not possible on the board
+                print("Replay stopped:", e)
 
-                print("Move:", chess_notation)
-                promotions, moves = self.parse_notation(chess_notation)
+            self.game_window.schedule_move_hints()
+            self.on_simulating = False
+            self.enable_ui_elements()
+            self.update()
 
-                for i, move in enumerate(moves):
-                    time.sleep(delay)
+    def _replay_rows(
+        self,
+        model: Union[GameListModel, ArchiveListModel],
+        rows: List[int],
+        delay: float,
+    ) -> None:
+        for row in rows:
+            print("Move:", model.data(model.index(row)))
 
-                    from_pos, to_pos, move_type = move
-                    promotion = promotions[i]
+            # every row of an archive is a whole game
+            if model is self.archive_list_model and row != rows[0]:
+                self.reset_game()
 
-                    if move_type == MoveType.NORMAL_MOVE:
-                        board.move(from_pos, to_pos, move_type, promotion)
-                    elif move_type == MoveType.EN_PASSANT:
-                        board.en_passant_move(from_pos, to_pos)
-                    elif move_type == MoveType.CASTLING_MOVE:
-                        board.castling_move(from_pos, to_pos)
-                    else:
-                        raise TypeError("Move Type unknown.")
+            board = self.game_window.board
 
-                    self.game_window.update_ui()
-                    QCoreApplication.processEvents()
+            for move, promotion in model.moves(row):
+                time.sleep(delay)
+                pgn.replay_move(board, move, promotion)
+                self.record_moves(board)
 
-            self.on_simulating = False
-            self.enable_ui_elements()
-            self.update()
+                self.game_window.update_ui()
+                QCoreApplication.processEvents()
 
     def parse_notation(
         self, chess_notation: str
-    ) -> Tuple[List[str], List[Tuple[Tuple[int, int], Tuple[int, int]]]]:
-        move_parts = chess_notation.split(" ")
-        move_parts = move_parts[1:]
-        return self._parse_move(move_parts)
+    ) -> Tuple[List[Optional[str]], List[NotationMove]]:
+        return notation.parse_notation(chess_notation)
 
     def _parse_move(
         self, move_notation: List[str]
-    ) -> Tuple[List[str], List[Tuple[Tuple[int, int], Tuple[int, int]]]]:
-        rows = {"1": 7, "2": 6, "3": 5, "4": 4, "5": 3, "6": 2, "7": 1, "8": 0}
-        cols = {"a": 0, "b": 1, "c": 2, "d": 3, "e": 4, "f": 5, "g": 6, "h": 7}
-
-        possible_seperators = ["–", "x", "×"]
-        possible_promotion_postfixes = ["Q", "B", "N", "R"]
-        castling_notations = ["0–0", "0–0–0"]
-
-        white_move = move_notation[0]
-        black_move = move_notation[1] if len(move_notation) > 1 else None
-
-        white_castling = False
-        black_castling = False
-
-        is_white_en_passant = False
-        is_black_en_passant = False
-
-        white_promoted_piece = None
-        black_promoted_piece = None
-
-        if white_move not in castling_notations:
-            white_from_pos, white_to_pos = white_move.split(
-                self.use_seperator(white_move, possible_seperators)
-            )
-            white_from_pos = self.remove_piece_prefix(white_from_pos)
-            white_to_pos = self.remove_piece_prefix(white_to_pos)
-            is_white_en_passant, white_to_pos = self.remove_en_passant_postfix(
-                white_to_pos
-            )
-
-            if any(postfix in white_to_pos for postfix in possible_promotion_postfixes):
-                white_promoted_piece = white_to_pos[-1]
-        else:
-            white_castling = True
-
-        if black_move is not None:
-            if black_move not in castling_notations:
-                black_from_pos, black_to_pos = black_move.split(
-                    self.use_seperator(black_move, possible_seperators)
-                )
-                black_from_pos = self.remove_piece_prefix(black_from_pos)
-                black_to_pos = self.remove_piece_prefix(black_to_pos)
-                is_black_en_passant, black_to_pos = self.remove_en_passant_postfix(
-                    black_to_pos
-                )
-
-                if any(
-                    postfix in black_to_pos for postfix in possible_promotion_postfixes
-                ):
-                    black_promoted_piece = black_to_pos[-1]
-            else:
-                black_castling = True
-
-        moves = []
-
-        # white
-        if white_castling:
-            if white_move == "0–0":  # short castling
-                moves.append(
-                    (
-                        (7, 4),  # from_pos
-                        (7, 7),  # to_pos
-                        MoveType.CASTLING_MOVE,
-                    )
-                )
-            else:  # long castling
-                moves.append(
-                    (
-                        (7, 4),  # from_pos
-                        (7, 0),  # to_pos
-                        MoveType.CASTLING_MOVE,
-                    )
-                )
-        else:
-            moves.append(
-                (
-                    (rows[white_from_pos[1]], cols[white_from_pos[0]]),  # from_pos
-                    (rows[white_to_pos[1]], cols[white_to_pos[0]]),  # to_pos
-                    MoveType.EN_PASSANT
-                    if is_white_en_passant
-                    else MoveType.NORMAL_MOVE,
-                )
-            )
-
-        # black
-        if black_move is not None:
-            if black_castling:
-                if black_move == "0–0":  # short castling
-                    moves.append(
-                        (
-                            (0, 4),  # from_pos
-                            (0, 7),  # to_pos
-                            MoveType.CASTLING_MOVE,
-                        )
-                    )
-                else:  # long castling
-                    moves.append(
-                        (
-                            (0, 4),  # from_pos
-                            (0, 0),  # to_pos
-                            MoveType.CASTLING_MOVE,
-                        )
-                    )
-            else:
-                moves.append(
-                    (
-                        (rows[black_from_pos[1]], cols[black_from_pos[0]]),  # from_pos
-                        (rows[black_to_pos[1]], cols[black_to_pos[0]]),  # to_pos
-                        MoveType.EN_PASSANT
-                        if is_black_en_passant
-                        else MoveType.NORMAL_MOVE,
-                    )
-                )
-
-        return [white_promoted_piece, black_promoted_piece], moves
-
-    def remove_piece_prefix(self, move_notation: str) -> str:
-        return move_notation[1:] if move_notation[0].isupper() else move_notation
-
-    def remove_en_passant_postfix(self, move_notation: str) -> Tuple[bool, str]:
-        en_passant_found = move_notation.endswith("_e.p.")
-        return en_passant_found, move_notation.removesuffix("_e.p.")
-
-    def use_seperator(self, move_notation: str, possible_seperators: List[str]) -> str:
-        for sep in possible_seperators:
-            if sep in move_notation:
-                return sep
-
-        raise ValueError("No seperator in notation found.")
+    ) -> Tuple[List[Optional[str]], List[NotationMove]]:
+        return notation.parse_move(move_notation)
 
     def select_all(self) -> None:
-        self.listWidget.selectAll()
+        self.listView.selectAll()
 
         selected_sound = random.choice(self.select_all_sounds)
         sound_path_str = str(Path(__file__).parent.parent / selected_sound)
 
+        # QtMultimedia is expensive to load, import it with the first sound only
+        from PyQt5.QtMultimedia import QSound
+
         print("play sound:", sound_path_str)
         QSound.play(sound_path_str)
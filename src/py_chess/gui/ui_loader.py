@@ -0,0 +1,58 @@
+import importlib
+from pathlib import Path
+from typing import Optional, Type
+
+from PyQt5 import uic
+from PyQt5.QtWidgets import QWidget
+
+UI_DIR = Path(__file__).parent / "ui"
+COMPILED_SUFFIX = "_ui"
+
+
+def compiled_module_path(name: str) -> Path:
+    return UI_DIR / f"{name}{COMPILED_SUFFIX}.py"
+
+
+def _compiled_form_class(name: str) -> Optional[Type]:
+    ui_path = UI_DIR / f"{name}.ui"
+    py_path = compiled_module_path(name)
+
+    # a compiled module older than its .ui file is stale -> parse the xml instead
+    if not py_path.exists() or py_path.stat().st_mtime < ui_path.stat().st_mtime:
+        return None
+
+    try:
+        module = importlib.import_module(f"gui.ui.{name}{COMPILED_SUFFIX}")
+    except ImportError:
+        return None
+
+    for attribute_name, attribute in vars(module).items():
+        if attribute_name.startswith("Ui_") and isinstance(attribute, type):
+            return attribute
+
+    return None
+
+
+def load_ui(name: str, widget: QWidget) -> QWidget:
+    """Set up widget from ui/<name>.ui.
+
+    Uses the module generated by build_ui.py if it is present and up to date,
+    otherwise the .ui file is parsed at runtime with uic.loadUi.
+
+    :param name: base name of the .ui file, e.g. "main_window".
+    :param widget: the widget which receives the child widgets as attributes.
+    """
+
+    form_class = _compiled_form_class(name)
+
+    if form_class is None:
+        return uic.loadUi(UI_DIR / f"{name}.ui", widget)
+
+    form = form_class()
+    form.setupUi(widget)
+
+    # expose child widgets on the widget itself, just like uic.loadUi does
+    for attribute_name, attribute in vars(form).items():
+        setattr(widget, attribute_name, attribute)
+
+    return widget
@@ -0,0 +1,164 @@
+"""Headless runs of the chess core, e.g. for profiling.
+
+    python headless.py perft --depth 2
+    python headless.py replay game.txt --profile replay.prof
+    python headless.py replay game.txt --flamegraph replay.folded --instrument
+    python headless.py pgn games.txt games.pgn --processes 4
+
+The profiling switches can also be given as environment variables:
+PYCHESS_PROFILE=<file>, PYCHESS_FLAMEGRAPH=<file> and PYCHESS_INSTRUMENT=1.
+"""
+
+import argparse
+import cProfile
+import os
+import sys
+import time
+from typing import Callable, List, Optional
+
+from chess import instrumentation, logic, notation, pgn
+from chess.my_types import Board
+
+PROFILE_ENV = "PYCHESS_PROFILE"
+FLAMEGRAPH_ENV = "PYCHESS_FLAMEGRAPH"
+
+
+def run_perft(depth: int) -> None:
+    board = Board(None)
+    nodes = logic.perft(board, depth)
+    print(f"perft depth={depth} nodes={nodes}")
+
+
+def run_replay(filename: str) -> None:
+    board = Board(None)
+    plies = 0
+
+    with open(filename, encoding="utf8") as f:
+        for line in f:
+            chess_notation = line.strip()
+
+            if not chess_notation:
+                continue
+
+            promotions, moves = notation.parse_notation(chess_notation)
+
+            for i, move in enumerate(moves):
+                notation.replay_move(board, move, promotions[i])
+                plies += 1
+
+    print(f"replay file={filename} plies={plies} state={logic.get_game_state(board)}")
+
+
+def run_pgn_export(
+    filename: str, output: str, processes: Optional[int], event: str
+) -> None:
+    with open(filename, encoding="utf8") as f:
+        games = list(notation.iter_games(f))
+
+    with open(output, "w", encoding="utf8") as f:
+        for i, game_pgn in enumerate(
+            pgn.export_games(games, {"Event": event}, processes)
+        ):
+            if i:
+                f.write("\n")
+
+            f.write(game_pgn)
+
+    print(f"pgn export file={filename} games={len(games)} output={output}")
+
+
+def run(
+    job: Callable[[], None],
+    profile_path: Optional[str] = None,
+    flamegraph_path: Optional[str] = None,
+) -> None:
+    start = time.perf_counter()
+
+    if profile_path:
+        profiler = cProfile.Profile()
+        profiler.runcall(job)
+        profiler.dump_stats(profile_path)
+        print(f"cProfile dump written to {profile_path}")
+    elif flamegraph_path:
+        with instrumentation.StackSampler() as sampler:
+            job()
+
+        sampler.write(flamegraph_path)
+        print(f"collapsed stacks written to {flamegraph_path}")
+    else:
+        job()
+
+    print(f"elapsed: {time.perf_counter() - start:.3f} sec")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--profile",
+        default=os.environ.get(PROFILE_ENV),
+        help="write a cProfile dump to this file",
+    )
+    parser.add_argument(
+        "--flamegraph",
+        default=os.environ.get(FLAMEGRAPH_ENV),
+        help="write sampled collapsed stacks (flamegraph input) to this file",
+    )
+    parser.add_argument(
+        "--instrument",
+        action="store_true",
+        default=instrumentation.is_enabled(),
+        help="count and time the hot paths of the chess core",
+    )
+    parser.add_argument("--log-level", help="log level of the chess core")
+
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    perft_parser = subparsers.add_parser("perft", help="count legal move paths")
+    perft_parser.add_argument("--depth", type=int, default=2)
+
+    replay_parser = subparsers.add_parser("replay", help="replay a notation file")
+    replay_parser.add_argument("filename")
+
+    pgn_parser = subparsers.add_parser(
+        "pgn", help="export the games of a notation file as PGN"
+    )
+    pgn_parser.add_argument("filename")
+    pgn_parser.add_argument("output", help="PGN file to write")
+    pgn_parser.add_argument(
+        "--processes", type=int, help="worker processes, default: CPU count"
+    )
+    pgn_parser.add_argument("--event", default="?", help="Event header of the games")
+
+    args = parser.parse_args(argv)
+
+    instrumentation.configure_logging(args.log_level)
+
+    if args.instrument:
+        instrumentation.enable()
+
+    if args.command == "perft":
+        job = lambda: run_perft(args.depth)  # noqa: E731
+    elif args.command == "pgn":
+        job = lambda: run_pgn_export(  # noqa: E731
+            args.filename, args.output, args.processes, args.event
+        )
+    else:
+        job = lambda: run_replay(args.filename)  # noqa: E731
+
+    run(job, args.profile, args.flamegraph)
+
+    if args.instrument:
+        for name, values in instrumentation.report().items():
+            print(
+                f"{name:<28} calls={values['calls']:<8} "
+                f"total={values['total_ms']:10.1f} ms "
+                f"mean={values['mean_us']:10.1f} us"
+            )
+
+    print("legal moves cache:", logic.get_legal_moves_cache_stats())
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
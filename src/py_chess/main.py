@@ -1,16 +1,48 @@
-import sys
+import time
 
-from PyQt5.QtWidgets import QApplication
+_START_TIME = time.perf_counter()
 
-from gui.main_window import MainWindow
+import os  # noqa: E402
+import sys  # noqa: E402
+
+from PyQt5.QtCore import QTimer  # noqa: E402
+from PyQt5.QtWidgets import QApplication  # noqa: E402
+
+from gui.main_window import MainWindow  # noqa: E402
+
+STARTUP_TIME_FLAG = "--startup-time"
+STARTUP_TIME_ENV = "PYCHESS_STARTUP_TIME"
+
+
+def measure_startup_time() -> bool:
+    return STARTUP_TIME_FLAG in sys.argv or bool(os.environ.get(STARTUP_TIME_ENV))
+
+
+def report_startup_time(imports_done: float, window_done: float) -> None:
+    """Print the startup phases and quit; called once the event loop is idle,
+    i.e. when the board is shown and reacts to input."""
+
+    interactive = time.perf_counter()
+
+    print(f"imports:           {(imports_done - _START_TIME) * 1000:8.1f} ms")
+    print(f"main window:       {(window_done - imports_done) * 1000:8.1f} ms")
+    print(f"first event loop:  {(interactive - window_done) * 1000:8.1f} ms")
+    print(f"interactive board: {(interactive - _START_TIME) * 1000:8.1f} ms")
+
+    QApplication.quit()
 
 
 def main() -> int:
+    imports_done = time.perf_counter()
     app = QApplication([])
 
     main_window = MainWindow()
     main_window.show()
 
+    if measure_startup_time():
+        window_done = time.perf_counter()
+        QTimer.singleShot(0, lambda: report_startup_time(imports_done, window_done))
+
     sys.exit(app.exec_() or 0)
 
 
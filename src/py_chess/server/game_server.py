@@ -0,0 +1,352 @@
+"""Asyncio server hosting many concurrent headless games.
+
+The protocol is one JSON object per line over TCP. Every request has an "op"
+and may carry an "id", which is echoed in the response. Position updates are
+pushed to all subscribers of a game as {"op": "position", ...} without id.
+
+    {"op": "new"}                                  -> {"op": "created", ...}
+    {"op": "subscribe", "game_id": 1}              -> {"op": "position", ...}
+    {"op": "unsubscribe", "game_id": 1}            -> {"op": "unsubscribed"}
+    {"op": "legal_moves", "game_id": 1}            -> {"op": "legal_moves", ...}
+    {"op": "move", "game_id": 1, "from": [6, 4], "to": [4, 4]}
+                                                   -> {"op": "moved", ...}
+    {"op": "move", ..., "promotion": "N"}         a pawn reaching the last
+                                                   rank, "Q" by default
+    {"op": "close", "game_id": 1}                  -> {"op": "closed"}
+    {"op": "stats"}                                -> {"op": "stats", ...}
+
+Errors are answered with {"op": "error", "message": ...}.
+
+    python -m server.game_server --port 8765
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import count
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from chess import logic
+from chess.my_types import Board, GameState
+from chess.notation import PROMOTION_SYMBOLS
+from chess.search import play_move as search_play_move
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+Position = Tuple[int, int]
+
+
+def deep_sizeof(obj: Any) -> int:
+    """Approximate memory of obj and everything it references, in bytes."""
+
+    seen: Set[int] = set()
+    stack = [obj]
+    size = 0
+
+    while stack:
+        current = stack.pop()
+
+        if id(current) in seen or isinstance(current, type):
+            continue
+
+        seen.add(id(current))
+        size += sys.getsizeof(current)
+
+        if isinstance(current, dict):
+            stack.extend(current.keys())
+            stack.extend(current.values())
+        elif isinstance(current, (list, tuple, set, frozenset)):
+            stack.extend(current)
+
+        if hasattr(current, "__dict__"):
+            stack.append(current.__dict__)
+
+    return size
+
+
+def play_move(
+    board: Board, from_pos: Position, to_pos: Position, promotion: str = "Q"
+) -> Tuple[Board, GameState, int]:
+    """Validate and apply a move, runs in the executor.
+
+    Returns the board (the same object for threads, a copy for processes),
+    the game state after the move and the memory of the board.
+    """
+
+    if board.game_over:
+        raise ValueError("Game is over.")
+
+    piece = board.get_piece(*from_pos)
+
+    if piece is None:
+        raise ValueError(f"No piece on {from_pos}.")
+
+    if piece.get_color() != board.next_move_color:
+        raise ValueError(f"Not your turn, next move: {board.next_move_color}.")
+
+    if to_pos not in logic.get_possible_moves(board, piece):
+        raise ValueError(f"Illegal move {from_pos} -> {to_pos}.")
+
+    search_play_move(board, (from_pos, to_pos, promotion))
+    game_state = logic.get_game_state(board)
+
+    if game_state != GameState.CONTINUE:
+        board.game_over = True
+
+    return board, game_state, deep_sizeof(board)
+
+
+def new_board() -> Tuple[Board, int]:
+    board = Board(None)
+    return board, deep_sizeof(board)
+
+
+def legal_moves(board: Board) -> List[Tuple[Position, Position]]:
+    return [
+        (from_pos, to_pos)
+        for from_pos, possible_moves in logic.get_legal_moves(
+            board, board.next_move_color
+        ).items()
+        for to_pos in possible_moves
+    ]
+
+
+class Game:
+    def __init__(self, game_id: int, board: Board, memory_bytes: int) -> None:
+        self.game_id = game_id
+        self.board = board
+        self.game_state = GameState.CONTINUE
+        self.plies = 0
+        self.memory_bytes = memory_bytes
+        self.subscribers: Set[asyncio.StreamWriter] = set()
+
+        # moves of one game are applied one after the other
+        self.lock = asyncio.Lock()
+
+    def position_message(self) -> Dict[str, Any]:
+        placement = [
+            "".join(
+                "." if piece is None else piece.symbol
+                for piece in (self.board.get_piece(i, j) for j in range(8))
+            )
+            for i in range(8)
+        ]
+
+        return {
+            "op": "position",
+            "game_id": self.game_id,
+            "placement": placement,
+            "next_move_color": self.board.next_move_color,
+            "state": self.game_state.value,
+            "plies": self.plies,
+        }
+
+
+class GameServer:
+    def __init__(self, executor: Optional[Executor] = None) -> None:
+        self.executor = executor or ThreadPoolExecutor()
+        self.games: Dict[int, Game] = {}
+        self.moves_played = 0
+        self._game_ids = count(1)
+
+    async def start(
+        self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT
+    ) -> asyncio.AbstractServer:
+        return await asyncio.start_server(self.handle_client, host, port)
+
+    def memory_usage(self) -> Dict[str, Any]:
+        total = sum(game.memory_bytes for game in self.games.values())
+
+        return {
+            "games": len(self.games),
+            "total_bytes": total,
+            "mean_bytes_per_game": total // len(self.games) if self.games else 0,
+        }
+
+    async def handle_client(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            while True:
+                line = await reader.readline()
+
+                if not line:
+                    break
+
+                request: Dict[str, Any] = {}
+
+                try:
+                    message = json.loads(line)
+
+                    if not isinstance(message, dict):
+                        raise ValueError("Request is no JSON object.")
+
+                    request = message
+                    response = await self.handle_request(request, writer)
+                except (ValueError, KeyError, TypeError) as e:
+                    response = {"op": "error", "message": str(e)}
+
+                if "id" in request:
+                    response["id"] = request["id"]
+
+                self.send(writer, response)
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            for game in self.games.values():
+                game.subscribers.discard(writer)
+
+            writer.close()
+
+    @staticmethod
+    def send(writer: asyncio.StreamWriter, message: Dict[str, Any]) -> None:
+        if not writer.is_closing():
+            writer.write(json.dumps(message).encode("utf8") + b"\n")
+
+    def broadcast(self, game: Game) -> None:
+        message = game.position_message()
+
+        for subscriber in list(game.subscribers):
+            self.send(subscriber, message)
+
+    def get_game(self, request: Dict[str, Any]) -> Game:
+        game = self.games.get(request["game_id"])
+
+        if game is None:
+            raise ValueError(f"Unknown game {request['game_id']}.")
+
+        return game
+
+    async def handle_request(
+        self, request: Dict[str, Any], writer: asyncio.StreamWriter
+    ) -> Dict[str, Any]:
+        op = request["op"]
+
+        if op == "new":
+            board, memory_bytes = await asyncio.get_running_loop().run_in_executor(
+                self.executor, new_board
+            )
+            game = Game(next(self._game_ids), board, memory_bytes)
+            self.games[game.game_id] = game
+
+            if request.get("subscribe", True):
+                game.subscribers.add(writer)
+
+            return {**game.position_message(), "op": "created"}
+        elif op == "subscribe":
+            game = self.get_game(request)
+
+            async with game.lock:
+                game.subscribers.add(writer)
+                return game.position_message()
+        elif op == "unsubscribe":
+            self.get_game(request).subscribers.discard(writer)
+            return {"op": "unsubscribed"}
+        elif op == "legal_moves":
+            game = self.get_game(request)
+
+            async with game.lock:
+                moves = await asyncio.get_running_loop().run_in_executor(
+                    self.executor, legal_moves, game.board
+                )
+
+            return {"op": "legal_moves", "game_id": game.game_id, "moves": moves}
+        elif op == "move":
+            return await self.move(request)
+        elif op == "close":
+            game = self.get_game(request)
+            del self.games[game.game_id]
+            return {"op": "closed", "game_id": game.game_id}
+        elif op == "stats":
+            return {
+                "op": "stats",
+                "moves_played": self.moves_played,
+                "legal_moves_cache": logic.get_legal_moves_cache_stats(),
+                **self.memory_usage(),
+            }
+        else:
+            raise ValueError(f"Unknown op '{op}'.")
+
+    @staticmethod
+    def get_position(request: Dict[str, Any], key: str) -> Position:
+        value = request[key]
+
+        if (
+            not isinstance(value, (list, tuple))
+            or len(value) != 2
+            or not all(type(index) is int and 0 <= index < 8 for index in value)
+        ):
+            raise ValueError(
+                f"Invalid square {key}: {value}, expected [i, j] with i and j in 0..7."
+            )
+
+        return value[0], value[1]
+
+    async def move(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        game = self.get_game(request)
+        from_pos = self.get_position(request, "from")
+        to_pos = self.get_position(request, "to")
+        promotion = request.get("promotion", "Q")
+
+        if promotion not in PROMOTION_SYMBOLS:
+            raise ValueError(f"Invalid promotion {promotion}, expected Q, R, B or N.")
+
+        async with game.lock:
+            loop = asyncio.get_running_loop()
+            board, game_state, memory_bytes = await loop.run_in_executor(
+                self.executor, play_move, game.board, from_pos, to_pos, promotion
+            )
+
+            game.board = board
+            game.game_state = game_state
+            game.memory_bytes = memory_bytes
+            game.plies += 1
+            self.moves_played += 1
+
+            self.broadcast(game)
+
+        return {
+            "op": "moved",
+            "game_id": game.game_id,
+            "state": game_state.value,
+            "plies": game.plies,
+        }
+
+
+async def serve(host: str, port: int, processes: int) -> None:
+    executor = ProcessPoolExecutor(processes) if processes else ThreadPoolExecutor()
+    game_server = GameServer(executor)
+    server = await game_server.start(host, port)
+
+    print(f"serving on {host}:{port}")
+
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="pyChess multi-game server")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument(
+        "--processes",
+        type=int,
+        default=0,
+        help="check moves in a process pool of this size instead of threads",
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        asyncio.run(serve(args.host, args.port, args.processes))
+    except KeyboardInterrupt:
+        pass
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
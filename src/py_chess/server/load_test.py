@@ -0,0 +1,166 @@
+"""Load test of the game server with N concurrent games of random moves.
+
+    python -m server.load_test --games 100 --plies 20
+    python -m server.load_test --games 1000 --host 127.0.0.1 --port 8765
+
+Without --port a server is started in this process on a free port.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+from server.game_server import DEFAULT_HOST, GameServer
+
+
+class Client:
+    def __init__(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        self.reader = reader
+        self.writer = writer
+        self._request_id = 0
+
+    @classmethod
+    async def connect(cls, host: str, port: int) -> "Client":
+        reader, writer = await asyncio.open_connection(host, port, limit=2**20)
+        return cls(reader, writer)
+
+    async def request(self, op: str, **kwargs: Any) -> Dict[str, Any]:
+        self._request_id += 1
+        request_id = self._request_id
+
+        message = {"op": op, "id": request_id, **kwargs}
+        self.writer.write(json.dumps(message).encode("utf8") + b"\n")
+        await self.writer.drain()
+
+        # skip pushed position updates until the response arrives
+        while True:
+            response = json.loads(await self.reader.readline())
+
+            if response.get("id") == request_id:
+                return response
+
+    async def close(self) -> None:
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+async def play_random_game(
+    host: str, port: int, plies: int, seed: int, latencies: List[float]
+) -> int:
+    rng = random.Random(seed)
+    client = await Client.connect(host, port)
+    played = 0
+
+    try:
+        game_id = (await client.request("new"))["game_id"]
+
+        for _ in range(plies):
+            moves = (await client.request("legal_moves", game_id=game_id))["moves"]
+
+            if not moves:
+                break
+
+            from_pos, to_pos = rng.choice(moves)
+
+            start = time.perf_counter()
+            response = await client.request(
+                "move", game_id=game_id, **{"from": from_pos, "to": to_pos}
+            )
+            latencies.append(time.perf_counter() - start)
+
+            if response["op"] == "error":
+                break
+
+            played += 1
+
+            if response["state"] != "Continue":
+                break
+    finally:
+        await client.close()
+
+    return played
+
+
+def percentile(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+async def load_test(
+    games: int, plies: int, host: str, port: Optional[int], seed: int
+) -> Dict[str, Any]:
+    server = None
+
+    if port is None:
+        server = await GameServer().start(host, 0)
+        port = server.sockets[0].getsockname()[1]
+
+    latencies: List[float] = []
+    start = time.perf_counter()
+
+    played = await asyncio.gather(
+        *(
+            play_random_game(host, port, plies, seed + i, latencies)
+            for i in range(games)
+        )
+    )
+
+    elapsed = time.perf_counter() - start
+
+    stats_client = await Client.connect(host, port)
+    stats = await stats_client.request("stats")
+    await stats_client.close()
+
+    if server is not None:
+        server.close()
+        await server.wait_closed()
+
+    moves = sum(played)
+
+    return {
+        "games": games,
+        "moves": moves,
+        "elapsed_sec": elapsed,
+        "moves_per_sec": moves / elapsed if elapsed else 0.0,
+        "latency_p50_ms": percentile(latencies, 50) * 1000,
+        "latency_p99_ms": percentile(latencies, 99) * 1000,
+        "server": stats,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="pyChess game server load test")
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--plies", type=int, default=20)
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    result = asyncio.run(
+        load_test(args.games, args.plies, args.host, args.port, args.seed)
+    )
+
+    print(
+        f"{result['games']} games, {result['moves']} moves "
+        f"in {result['elapsed_sec']:.2f} sec: "
+        f"{result['moves_per_sec']:.1f} moves/sec, "
+        f"p50 {result['latency_p50_ms']:.1f} ms, "
+        f"p99 {result['latency_p99_ms']:.1f} ms"
+    )
+    print(json.dumps(result["server"]))
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,466 @@
+"""Self-play of move selection policies, spread over a process pool.
+
+    python -m tournament.self_play --games 100 --player-a greedy --player-b random
+    python -m tournament.self_play --games 1000 --opening-plies 4 --max-plies 200
+    python -m tournament.self_play --player-a mymodule:choose_move --sprt
+
+A player is "random", "greedy" or "module:function" of a callable
+(board, rng) -> (from_pos, to_pos) or (from_pos, to_pos, promotion), which
+is called with the side to move having at least one legal move. A pawn
+reaching the last rank is promoted to promotion ("Q", "R", "B" or "N"),
+a queen by default. The players swap colors every game.
+
+Every game is reproducible from its seed. Errors of the chess core are
+reported with the seed of the game instead of stopping the run, so this is
+also a stability test of the move generation.
+"""
+
+import argparse
+import importlib
+import math
+import random
+import sys
+import time
+from dataclasses import dataclass
+from multiprocessing import Pool
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+from chess import logic, notation
+from chess.my_types import MATERIAL_VALUES, Board
+from chess.search import play_move
+
+Position = Tuple[int, int]
+PlayerMove = Union[Tuple[Position, Position], Tuple[Position, Position, Optional[str]]]
+Player = Callable[[Board, random.Random], PlayerMove]
+
+WHITE_WINS = "1-0"
+BLACK_WINS = "0-1"
+DRAW = "1/2-1/2"
+
+
+def legal_moves(board: Board) -> List[Tuple[Position, Position]]:
+    return [
+        (from_pos, to_pos)
+        for from_pos, possible_moves in logic.get_legal_moves(
+            board, board.next_move_color
+        ).items()
+        for to_pos in possible_moves
+    ]
+
+
+def random_player(board: Board, rng: random.Random) -> Tuple[Position, Position]:
+    return rng.choice(legal_moves(board))
+
+
+def greedy_player(board: Board, rng: random.Random) -> Tuple[Position, Position]:
+    """Captures the most valuable piece, else plays a random move."""
+
+    moves = legal_moves(board)
+    rng.shuffle(moves)
+
+    def captured_value(move: Tuple[Position, Position]) -> int:
+        piece = board.get_piece(*move[1])
+        return abs(MATERIAL_VALUES[piece.symbol]) if piece is not None else 0
+
+    return max(moves, key=captured_value)
+
+
+PLAYERS: Dict[str, Player] = {"random": random_player, "greedy": greedy_player}
+
+
+def get_player(name: str) -> Player:
+    if name in PLAYERS:
+        return PLAYERS[name]
+
+    module_name, _, function_name = name.partition(":")
+
+    if not function_name:
+        raise ValueError(f"Unknown player '{name}', use module:function.")
+
+    return getattr(importlib.import_module(module_name), function_name)
+
+
+def material_balance(board: Board) -> int:
+    """Material of white minus material of black, in pawns."""
+
+    return logic.get_material_balance(board)
+
+
+@dataclass
+class Limits:
+    # a game reaching max_plies is adjudicated a draw
+    max_plies: int = 300
+    # a side ahead by material_margin pawns is adjudicated the winner, 0: off
+    material_margin: int = 0
+
+
+@dataclass
+class GameJob:
+    index: int
+    seed: int
+    white: str
+    black: str
+    opening: List[str]
+    opening_plies: int
+    limits: Limits
+
+
+@dataclass
+class GameResult:
+    index: int
+    seed: int
+    white: str
+    black: str
+    result: str
+    reason: str
+    plies: int
+    elapsed_in_sec: float
+    error: Optional[str] = None
+
+
+def play_game(job: GameJob) -> GameResult:
+    """Play one game, runs in a worker process."""
+
+    start = time.perf_counter()
+    rng = random.Random(job.seed)
+    players = {"white": get_player(job.white), "black": get_player(job.black)}
+    board = Board(None)
+    plies = 0
+
+    def result(outcome: str, reason: str, error: Optional[str] = None) -> GameResult:
+        return GameResult(
+            job.index,
+            job.seed,
+            job.white,
+            job.black,
+            outcome,
+            reason,
+            plies,
+            time.perf_counter() - start,
+            error,
+        )
+
+    try:
+        for chess_notation in job.opening:
+            promotions, opening_moves = notation.parse_notation(chess_notation)
+
+            for i, opening_move in enumerate(opening_moves):
+                notation.replay_move(board, opening_move, promotions[i])
+                plies += 1
+
+        for _ in range(job.opening_plies):
+            moves = legal_moves(board)
+
+            if not moves:
+                break
+
+            from_pos, to_pos = rng.choice(moves)
+            play_move(board, (from_pos, to_pos, None))
+            plies += 1
+
+        while True:
+            color = board.next_move_color
+            king, enemy_king = (
+                (board.king_black_piece, board.king_white_piece)
+                if color == "black"
+                else (board.king_white_piece, board.king_black_piece)
+            )
+
+            # the chess core lets a side move into check, its king can then be
+            # captured, such a game is no stalemate
+            if board.get_piece(*king.position) is not king:
+                return result(DRAW, "error", f"{color} king captured")
+
+            if board.is_king_in_check(enemy_king):
+                return result(DRAW, "error", f"{enemy_king.get_color()} left in check")
+
+            if not logic.has_legal_move(board, color):
+                if board.is_king_in_check(king):
+                    winner = WHITE_WINS if color == "black" else BLACK_WINS
+                    return result(winner, "checkmate")
+
+                return result(DRAW, "stalemate")
+
+            if board.is_threefold_repetition():
+                return result(DRAW, "threefold repetition")
+
+            if board.is_fifty_move_rule():
+                return result(DRAW, "fifty-move rule")
+
+            if board.is_insufficient_material():
+                return result(DRAW, "insufficient material")
+
+            if plies >= job.limits.max_plies:
+                return result(DRAW, "adjudication: max plies")
+
+            if job.limits.material_margin:
+                balance = material_balance(board)
+
+                if abs(balance) >= job.limits.material_margin:
+                    winner = WHITE_WINS if balance > 0 else BLACK_WINS
+                    return result(winner, "adjudication: material")
+
+            player_move = players[color](board, rng)
+            promotion = player_move[2] if len(player_move) > 2 else None
+            play_move(board, (player_move[0], player_move[1], promotion))
+            plies += 1
+    except Exception as e:  # every failure of the chess core is reported
+        return result(DRAW, "error", f"{type(e).__name__}: {e}")
+
+
+def sprt_llr(
+    wins: float, draws: float, losses: float, elo0: float, elo1: float
+) -> float:
+    """Log likelihood ratio of H1 (elo1) against H0 (elo0), with the
+    normal approximation of the game scores.
+
+    Half a game is added to every outcome, so the variance of a one-sided
+    start is not zero.
+    """
+
+    if wins + draws + losses == 0:
+        return 0.0
+
+    wins, draws, losses = wins + 0.5, draws + 0.5, losses + 0.5
+    games = wins + draws + losses
+    score = (wins + draws / 2) / games
+    variance = (
+        wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score**2
+    ) / games
+
+    def expected_score(elo: float) -> float:
+        return 1 / (1 + 10 ** (-elo / 400))
+
+    score0 = expected_score(elo0)
+    score1 = expected_score(elo1)
+
+    return games * (score1 - score0) * (2 * score - score0 - score1) / (2 * variance)
+
+
+def sprt_bounds(alpha: float, beta: float) -> Tuple[float, float]:
+    return math.log(beta / (1 - alpha)), math.log((1 - beta) / alpha)
+
+
+@dataclass
+class Sprt:
+    elo0: float = 0.0
+    elo1: float = 10.0
+    alpha: float = 0.05
+    beta: float = 0.05
+
+
+class Statistics:
+    """Results from the view of player a."""
+
+    def __init__(self, player_a: str) -> None:
+        self.player_a = player_a
+        self.wins = 0
+        self.draws = 0
+        self.losses = 0
+        self.plies = 0
+        self.reasons: Dict[str, int] = {}
+        self.errors: List[GameResult] = []
+
+    def add(self, game: GameResult) -> None:
+        self.plies += game.plies
+        self.reasons[game.reason] = self.reasons.get(game.reason, 0) + 1
+
+        if game.error is not None:
+            self.errors.append(game)
+            return
+
+        if game.result == DRAW:
+            self.draws += 1
+        # player a is white in the even games, see jobs()
+        elif (game.result == WHITE_WINS) == (game.index % 2 == 0):
+            self.wins += 1
+        else:
+            self.losses += 1
+
+    @property
+    def games(self) -> int:
+        return self.wins + self.draws + self.losses
+
+    def score(self) -> float:
+        return (self.wins + self.draws / 2) / self.games if self.games else 0.0
+
+    def elo(self) -> float:
+        score = self.score()
+
+        if score <= 0 or score >= 1:
+            return math.copysign(math.inf, score - 0.5)
+
+        return -400 * math.log10(1 / score - 1)
+
+
+def sample_openings(path: Optional[str]) -> List[List[str]]:
+    if path is None:
+        return [[]]
+
+    with open(path, encoding="utf8") as f:
+        return list(notation.iter_games(f)) or [[]]
+
+
+def jobs(
+    games: int,
+    player_a: str,
+    player_b: str,
+    seed: int,
+    openings: List[List[str]],
+    opening_plies: int,
+    limits: Limits,
+) -> Iterator[GameJob]:
+    rng = random.Random(seed)
+
+    for index in range(games):
+        # both players play every opening once with each color
+        if index % 2 == 0:
+            opening = rng.choice(openings)
+            game_seed = rng.randrange(2**32)
+            white, black = player_a, player_b
+        else:
+            white, black = player_b, player_a
+
+        yield GameJob(index, game_seed, white, black, opening, opening_plies, limits)
+
+
+def run(
+    games: int,
+    player_a: str,
+    player_b: str,
+    processes: Optional[int] = None,
+    seed: int = 0,
+    openings: Optional[List[List[str]]] = None,
+    opening_plies: int = 0,
+    limits: Optional[Limits] = None,
+    sprt: Optional[Sprt] = None,
+    on_game: Optional[Callable[[GameResult, Statistics], None]] = None,
+) -> Tuple[Statistics, float]:
+    """Play the games and return the statistics and the elapsed seconds.
+
+    With sprt the run stops as soon as the log likelihood ratio leaves
+    the bounds.
+    """
+
+    # fail early, not once per worker
+    get_player(player_a)
+    get_player(player_b)
+
+    statistics = Statistics(player_a)
+    start = time.perf_counter()
+    bounds = sprt_bounds(sprt.alpha, sprt.beta) if sprt else None
+
+    with Pool(processes) as pool:
+        for game in pool.imap_unordered(
+            play_game,
+            jobs(
+                games,
+                player_a,
+                player_b,
+                seed,
+                openings or [[]],
+                opening_plies,
+                limits or Limits(),
+            ),
+        ):
+            statistics.add(game)
+
+            if on_game is not None:
+                on_game(game, statistics)
+
+            if sprt is not None and bounds is not None:
+                llr = sprt_llr(
+                    statistics.wins,
+                    statistics.draws,
+                    statistics.losses,
+                    sprt.elo0,
+                    sprt.elo1,
+                )
+
+                if not bounds[0] < llr < bounds[1]:
+                    pool.terminate()
+                    break
+
+    return statistics, time.perf_counter() - start
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--player-a", default="greedy")
+    parser.add_argument("--player-b", default="random")
+    parser.add_argument("--processes", type=int)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--openings", help="notation file, every game starts from one of its games"
+    )
+    parser.add_argument(
+        "--opening-plies",
+        type=int,
+        default=0,
+        help="random plies played after the opening",
+    )
+    parser.add_argument("--max-plies", type=int, default=Limits.max_plies)
+    parser.add_argument("--material-margin", type=int, default=Limits.material_margin)
+    parser.add_argument(
+        "--sprt", action="store_true", help="stop when the SPRT decides"
+    )
+    parser.add_argument("--elo0", type=float, default=Sprt.elo0)
+    parser.add_argument("--elo1", type=float, default=Sprt.elo1)
+    parser.add_argument("--alpha", type=float, default=Sprt.alpha)
+    parser.add_argument("--beta", type=float, default=Sprt.beta)
+    parser.add_argument("--verbose", action="store_true", help="print every game")
+    args = parser.parse_args(argv)
+
+    sprt = Sprt(args.elo0, args.elo1, args.alpha, args.beta) if args.sprt else None
+
+    def on_game(game: GameResult, statistics: Statistics) -> None:
+        if args.verbose or game.error is not None:
+            print(
+                f"game {game.index} seed {game.seed} {game.white}-{game.black} "
+                f"{game.result} ({game.reason}) plies {game.plies}"
+                + (f" error {game.error}" if game.error else "")
+            )
+
+    statistics, elapsed = run(
+        args.games,
+        args.player_a,
+        args.player_b,
+        args.processes,
+        args.seed,
+        sample_openings(args.openings),
+        args.opening_plies,
+        Limits(args.max_plies, args.material_margin),
+        sprt,
+        on_game,
+    )
+
+    played = statistics.games + len(statistics.errors)
+
+    print(
+        f"{args.player_a} vs {args.player_b}: "
+        f"+{statistics.wins} ={statistics.draws} -{statistics.losses} "
+        f"score {statistics.score():.3f} elo {statistics.elo():+.1f}"
+    )
+    print(
+        f"{played} games, {statistics.plies} plies in {elapsed:.2f} sec: "
+        f"{played / elapsed:.2f} games/sec, {statistics.plies / elapsed:.1f} plies/sec"
+    )
+    print(
+        "reasons: "
+        + ", ".join(f"{reason} {n}" for reason, n in sorted(statistics.reasons.items()))
+    )
+
+    if sprt is not None:
+        llr = sprt_llr(
+            statistics.wins, statistics.draws, statistics.losses, sprt.elo0, sprt.elo1
+        )
+        lower, upper = sprt_bounds(sprt.alpha, sprt.beta)
+        decision = "H1" if llr >= upper else "H0" if llr <= lower else "undecided"
+        print(f"sprt llr {llr:.2f} [{lower:.2f}, {upper:.2f}]: {decision}")
+
+    return 1 if statistics.errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,211 @@
+"""UCI protocol adapter of the chess core, for tournament managers and tools.
+
+    python uci.py
+
+Supported commands: uci, isready, ucinewgame, position [startpos | fen
+<fen>] [moves <move> ...], go [depth <n>] [nodes <n>] [movetime <ms>]
+[wtime <ms> btime <ms> winc <ms> binc <ms> movestogo <n>] [infinite], stop,
+quit. The search runs in its own thread and the output is written by
+another one, so reading commands and the search never wait for each other.
+"""
+
+import queue
+import sys
+import threading
+from typing import IO, List, Optional
+
+from chess import logic
+from chess.my_types import Board
+from chess.search import (
+    Search,
+    SearchInfo,
+    SearchLimits,
+    from_uci,
+    play_move,
+    pv_to_uci,
+    to_uci,
+)
+
+ENGINE_NAME = "pyChess"
+ENGINE_AUTHOR = "Tutor Exilius"
+
+# moves to go assumed by the time management without movestogo
+DEFAULT_MOVES_TO_GO = 30
+
+
+class UciEngine:
+    def __init__(self, output: IO[str] = sys.stdout) -> None:
+        self.output = output
+        self.board = Board(None)
+        self.search: Optional[Search] = None
+        self.search_thread: Optional[threading.Thread] = None
+
+        self._lines: "queue.Queue[Optional[str]]" = queue.Queue()
+        self._writer = threading.Thread(target=self._write, daemon=True)
+        self._writer.start()
+
+    def _write(self) -> None:
+        while True:
+            line = self._lines.get()
+
+            if line is None:
+                return
+
+            self.output.write(line + "\n")
+            self.output.flush()
+
+    def send(self, line: str) -> None:
+        self._lines.put(line)
+
+    def close(self) -> None:
+        self.stop()
+        self._lines.put(None)
+        self._writer.join()
+
+    def handle(self, line: str) -> bool:
+        """Handle one command line, returns False on quit."""
+
+        tokens = line.split()
+
+        if not tokens:
+            return True
+
+        command, args = tokens[0], tokens[1:]
+
+        try:
+            if command == "uci":
+                self.send(f"id name {ENGINE_NAME}")
+                self.send(f"id author {ENGINE_AUTHOR}")
+                self.send("uciok")
+            elif command == "isready":
+                self.send("readyok")
+            elif command == "ucinewgame":
+                self.stop()
+                logic.legal_moves_cache.clear()
+                self.board = Board(None)
+            elif command == "position":
+                self.stop()
+                self.board = self.parse_position(args)
+            elif command == "go":
+                self.go(args)
+            elif command == "stop":
+                self.stop()
+            elif command == "quit":
+                return False
+            else:
+                self.send(f"info string unknown command {command}")
+        except (ValueError, IndexError, KeyError) as e:
+            self.send(f"info string error {e}")
+
+        return True
+
+    @staticmethod
+    def parse_position(args: List[str]) -> Board:
+        position, _, moves_text = " ".join(args).partition("moves")
+        args, moves = position.split(), moves_text.split()
+
+        if args[0] == "startpos":
+            board = Board(None)
+        elif args[0] == "fen":
+            board = Board.from_fen(" ".join(args[1:]))
+        else:
+            raise ValueError(f"Invalid position '{' '.join(args)}'.")
+
+        for text in moves:
+            move = from_uci(board, text)
+
+            if move[1] not in logic.get_possible_moves(
+                board, board.get_piece(*move[0])
+            ):
+                raise ValueError(f"Illegal move {text}.")
+
+            play_move(board, move)
+
+        return board
+
+    def parse_limits(self, args: List[str]) -> SearchLimits:
+        values = {}
+
+        for name, value in zip(args, args[1:]):
+            if value.lstrip("-").isdigit():
+                values[name] = int(value)
+
+        limits = SearchLimits(
+            depth=values.get("depth"),
+            nodes=values.get("nodes"),
+            infinite="infinite" in args,
+        )
+
+        if "movetime" in values:
+            limits.movetime_in_sec = values["movetime"] / 1000
+        elif "infinite" not in args:
+            prefix = "w" if self.board.next_move_color == "white" else "b"
+
+            if f"{prefix}time" in values:
+                moves_to_go = values.get("movestogo", DEFAULT_MOVES_TO_GO)
+                limits.movetime_in_sec = (
+                    values[f"{prefix}time"] / max(moves_to_go, 1)
+                    + values.get(f"{prefix}inc", 0) * 0.8
+                ) / 1000
+
+        return limits
+
+    def go(self, args: List[str]) -> None:
+        self.stop()
+
+        board = self.board
+        search = Search(
+            board, self.parse_limits(args), lambda info: self.send_info(board, info)
+        )
+        self.search = search
+
+        def run() -> None:
+            best_move = search.run()
+
+            # in infinite mode bestmove may only be sent after stop
+            if search.limits.infinite:
+                search.stop_event.wait()
+
+            self.send(f"bestmove {to_uci(board, best_move) if best_move else '0000'}")
+
+        self.search_thread = threading.Thread(target=run, daemon=True)
+        self.search_thread.start()
+
+    def send_info(self, board: Board, info: SearchInfo) -> None:
+        mate_in = info.mate_in
+        score = f"mate {mate_in}" if mate_in is not None else f"cp {info.score}"
+
+        self.send(
+            f"info depth {info.depth} score {score} nodes {info.nodes} "
+            f"nps {info.nps} time {int(info.elapsed_in_sec * 1000)} "
+            f"pv {' '.join(pv_to_uci(board, info.pv))}"
+        )
+
+    def stop(self) -> None:
+        """Stop a running search, which then sends its bestmove."""
+
+        if self.search is not None:
+            self.search.stop()
+
+        if self.search_thread is not None:
+            self.search_thread.join()
+
+        self.search = None
+        self.search_thread = None
+
+
+def main() -> int:
+    engine = UciEngine()
+
+    try:
+        for line in sys.stdin:
+            if not engine.handle(line):
+                break
+    finally:
+        engine.close()
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())